@@ -0,0 +1,154 @@
+# accounts/admin_slots.py
+"""
+Места для админов из белого списка (settings.ADMIN_SEED_EMAILS).
+
+Первые ADMIN_SEED_SLOTS (по умолчанию 2) вошедших из белого списка становятся
+ADMIN с суперправами. Место — строка AdminSlot с уникальным номером: создание
+или повышение пользователя и захват места идут в одной транзакции, и два
+одновременных входа не займут одно место — второй получит IntegrityError
+и попробует следующий номер. Два одновременных первых входа с одним email
+создают одного пользователя: второй упирается в уникальный email и входит
+как существующий — с проверкой пароля.
+
+Число занятых мест кешируется: когда мест нет, вход не-админа отклоняется без
+запросов к AdminSlot. Кеш сбрасывается при любом изменении AdminSlot; место
+освобождается при снятии суперправ или удалении пользователя.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import routing
+from .models import AdminSlot, User
+
+CACHE_KEY = "accounts:admin_slots:taken"
+CACHE_TIMEOUT = 300
+
+
+class AdminSlotsExhausted(Exception):
+    """Все места админов заняты"""
+
+
+def slot_limit():
+    return getattr(settings, "ADMIN_SEED_SLOTS", 2)
+
+
+def is_whitelisted(email):
+    return (email or "").lower() in {e.lower() for e in getattr(settings, "ADMIN_SEED_EMAILS", [])}
+
+
+def taken_count():
+    count = cache.get(CACHE_KEY)
+    if count is None:
+        count = AdminSlot.objects.count()
+        cache.set(CACHE_KEY, count, CACHE_TIMEOUT)
+    return count
+
+
+def _take_slot(user):
+    taken = dict(AdminSlot.objects.values_list("number", "user_id"))
+    if user.pk in taken.values():
+        return
+    for number in range(1, slot_limit() + 1):
+        if number in taken:
+            continue
+        try:
+            with transaction.atomic():
+                AdminSlot.objects.create(number=number, user=user)
+            return
+        except IntegrityError:
+            # место заняли параллельно — пробуем следующее
+            continue
+    raise AdminSlotsExhausted
+
+
+def admin_login(email, password):
+    """
+    Вход по белому списку (email — в нижнем регистре): уже админ — только проверка
+    пароля; иначе пользователь создаётся или повышается до ADMIN, если есть место.
+    None — неверный пароль, AdminSlotsExhausted — мест нет.
+    """
+    user = User.objects.filter(email=email).first()
+    if user is not None:
+        # как ModelBackend: пароль и is_active
+        if not (user.check_password(password) and user.is_active):
+            return None
+        if user.is_superuser:
+            return user
+    if taken_count() >= slot_limit():
+        raise AdminSlotsExhausted
+
+    if user is None:
+        user = User(email=email, username=email)
+        # хешируем до транзакции, чтобы не держать её открытой
+        user.set_password(password)
+        try:
+            _promote(user)
+        except IntegrityError:
+            # параллельный первый вход с этим email создал пользователя раньше
+            if not User.objects.filter(email=email).exists():
+                raise
+            return admin_login(email, password)
+        return user
+    _promote(user)
+    return user
+
+
+async def aadmin_login(email, password):
+    """admin_login() для async-вью: пароль проверяется и хешируется вне цикла событий"""
+    user = await User.objects.filter(email=email).afirst()
+    if user is not None:
+        if not (await user.acheck_password(password) and user.is_active):
+            return None
+        if user.is_superuser:
+            return user
+    if await sync_to_async(taken_count)() >= slot_limit():
+        raise AdminSlotsExhausted
+
+    if user is None:
+        user = User(email=email, username=email)
+        await user.aset_password(password)
+        try:
+            await sync_to_async(_promote)(user)
+        except IntegrityError:
+            if not await User.objects.filter(email=email).aexists():
+                raise
+            return await aadmin_login(email, password)
+        return user
+    await sync_to_async(_promote)(user)
+    return user
+
+
+def _promote(user):
+    user.role = User.Roles.ADMIN
+    user.is_staff = True
+    user.is_superuser = True
+    with transaction.atomic():
+        user.save()
+        _take_slot(user)
+    routing.stick_user(user.pk)
+
+
+@receiver(post_save, sender=AdminSlot)
+@receiver(post_delete, sender=AdminSlot)
+def forget_taken_count(**kwargs):
+    cache.delete(CACHE_KEY)
+    # и после коммита — вдруг параллельный запрос успел закешировать старое значение
+    transaction.on_commit(lambda: cache.delete(CACHE_KEY))
+
+
+@receiver(post_save, sender=User)
+def sync_slot(sender, instance, created, **kwargs):
+    if not is_whitelisted(instance.email):
+        return
+    if not instance.is_superuser:
+        AdminSlot.objects.filter(user=instance).delete()
+    elif created:
+        # суперпользователь из белого списка, созданный в обход входа (createsuperuser)
+        try:
+            _take_slot(instance)
+        except AdminSlotsExhausted:
+            pass
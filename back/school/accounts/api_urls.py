@@ -1,5 +1,9 @@
 from django.urls import path
-from .api_views import RegisterAPI, LoginAPI, AdminLoginAPI, MeAPI, LogoutAPI
+from .api_views import (
+    RegisterAPI, LoginAPI, AdminLoginAPI, MeAPI, LogoutAPI, RefreshAPI, VerifyAPI,
+    HashingStatsAPI, ApplicantImportAPI, UserListAPI, LoginThrottleStatsAPI,
+    DatabaseStatsAPI, UserExportAPI, UserBulkUpdateAPI,
+)
 
 app_name = "accounts_api"
 
@@ -9,4 +13,13 @@ urlpatterns = [
     path("auth/admin-login/", AdminLoginAPI.as_view(), name="admin_login"),
     path("auth/me/", MeAPI.as_view(), name="me"),
     path("auth/logout/", LogoutAPI.as_view(), name="logout"),
+    path("auth/refresh/", RefreshAPI.as_view(), name="refresh"),
+    path("auth/verify/", VerifyAPI.as_view(), name="verify"),
+    path("users/", UserListAPI.as_view(), name="users"),
+    path("users/import/", ApplicantImportAPI.as_view(), name="users_import"),
+    path("users/bulk-update/", UserBulkUpdateAPI.as_view(), name="users_bulk_update"),
+    path("users/export/<str:fmt>/", UserExportAPI.as_view(), name="users_export"),
+    path("auth/hashing-stats/", HashingStatsAPI.as_view(), name="hashing_stats"),
+    path("auth/throttle-stats/", LoginThrottleStatsAPI.as_view(), name="throttle_stats"),
+    path("db-stats/", DatabaseStatsAPI.as_view(), name="db_stats"),
 ]
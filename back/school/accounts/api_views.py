@@ -1,19 +1,44 @@
+import codecs
+import os
+
 from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import parse_etags, patch_cache_control, patch_vary_headers
 from rest_framework import permissions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import ListAPIView
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 
+from . import admin_slots, audit, bulk, dbstats, exporting, hashing, routing
+from .authentication import ClaimsJWTAuthentication
+from .refresh import rotate, start_session, verify as verify_token
+from .revocation import RevocableRefreshToken
+from .tokens import add_user_claims, version_of
+from .throttling import check_login_attempt, get_login_throttle
+from .pagination import KeysetPagination
+from .permissions import IsAdminOrManager
+from .importing import FORMATS, ApplicantImporter, detect_format, iter_records
 from .serializers import (
-    RegisterSerializer, LoginSerializer, AdminLoginSerializer, MeSerializer
+    RegisterSerializer, LoginSerializer, AdminLoginSerializer, MeSerializer,
+    BulkUserUpdateSerializer,
 )
 
 User = get_user_model()
 
 def issue_tokens_for_user(user: User):
-    refresh = RefreshToken.for_user(user)
+    refresh = RevocableRefreshToken.for_user(user)
+    # поля профиля и версия токенов — чтобы MeAPI и проверки ролей обходились без БД
+    add_user_claims(refresh, user)
+    # отсюда считается предельный срок сессии при обновлениях (accounts/refresh.py)
+    start_session(refresh)
     return {
         "access": str(refresh.access_token),
         "refresh": str(refresh),
@@ -26,6 +51,8 @@ class RegisterAPI(APIView):
         ser = RegisterSerializer(data=request.data)
         ser.is_valid(raise_exception=True)
         user = ser.save()
+        routing.stick_user(user.pk)
+        audit.record(request, audit.Kinds.REGISTER, user=user)
         # По UX можно сразу логинить — но в ТЗ достаточно регистрации:
         tokens = issue_tokens_for_user(user)
         return Response({
@@ -42,9 +69,12 @@ class LoginAPI(APIView):
         ser.is_valid(raise_exception=True)
         email = ser.validated_data["email"].lower()
         password = ser.validated_data["password"]
+        check_login_attempt(request, email)
         user = authenticate(username=email, password=password)
         if not user:
+            audit.record(request, audit.Kinds.LOGIN, email=email, success=False)
             return Response({"detail": "Неверный email или пароль"}, status=400)
+        audit.record(request, audit.Kinds.LOGIN, user=user)
         tokens = issue_tokens_for_user(user)
         return Response({"user": MeSerializer(user).data, "tokens": tokens})
 
@@ -52,7 +82,8 @@ class LoginAPI(APIView):
 class AdminLoginAPI(APIView):
     """
     Спец-вход по белому списку.
-    Первые 2 из белого списка получают/повышаются до ADMIN (is_superuser/is_staff).
+    Первые 2 из белого списка получают/повышаются до ADMIN (is_superuser/is_staff),
+    см. accounts/admin_slots.py.
     """
     permission_classes = [AllowAny]
 
@@ -61,50 +92,52 @@ class AdminLoginAPI(APIView):
         ser.is_valid(raise_exception=True)
         email = ser.validated_data["email"].lower()
         password = ser.validated_data["password"]
+        check_login_attempt(request, email)
 
         whitelist = getattr(settings, "ADMIN_SEED_EMAILS", [])
         if email not in whitelist:
             return Response({"detail": "Email не разрешён для админ-входа"}, status=403)
 
-        user = User.objects.filter(email=email).first()
-        # текущих суперюзеров из белого списка
-        count_whitelist_su = User.objects.filter(email__in=whitelist, is_superuser=True).count()
-
+        try:
+            user = admin_slots.admin_login(email, password)
+        except admin_slots.AdminSlotsExhausted:
+            audit.record(request, audit.Kinds.ADMIN_LOGIN, email=email, success=False)
+            return Response({"detail": "Лимит админов исчерпан"}, status=403)
         if user is None:
-            if count_whitelist_su >= 2:
-                return Response({"detail": "Лимит админов исчерпан"}, status=403)
-            user = User.objects.create_user(
-                email=email, username=email, password=password,
-                role=User.Roles.ADMIN, is_staff=True, is_superuser=True
-            )
-        else:
-            # проверка пароля
-            auth_user = authenticate(username=email, password=password)
-            if not auth_user:
-                return Response({"detail": "Неверный пароль"}, status=400)
-            if (user.email in whitelist) and not user.is_superuser:
-                if count_whitelist_su >= 2:
-                    return Response({"detail": "Лимит админов исчерпан"}, status=403)
-                user.is_superuser = True
-                user.is_staff = True
-                user.role = User.Roles.ADMIN
-                user.save()
+            audit.record(request, audit.Kinds.ADMIN_LOGIN, email=email, success=False)
+            return Response({"detail": "Неверный пароль"}, status=400)
+        audit.record(request, audit.Kinds.ADMIN_LOGIN, user=user)
 
         tokens = issue_tokens_for_user(user)
         return Response({"user": MeSerializer(user).data, "tokens": tokens})
 
 
 class MeAPI(APIView):
+    """
+    Профиль из claims токена. ETag — id и версия токенов: клиент, опрашивающий
+    профиль с If-None-Match, получает 304 без сериализации и без запроса к БД.
+    """
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        return Response(MeSerializer(request.user).data)
+        etag = f'"me-{request.user.id}-{version_of(request.user)}-{request.accepted_renderer.format}"'
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag in if_none_match or "*" in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(MeSerializer(request.user).data)
+        response["ETag"] = etag
+        # ответ свой у каждого токена — в общие кеши не кладём, но всегда перепроверяем
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ("Authorization",))
+        return response
 
 
 class LogoutAPI(APIView):
     """
-    Чёрный список refresh-токена (если включишь simplejwt blacklist).
-    Можно и без него: на фронте просто удалить токены из хранилища.
+    Отзыв refresh-токена (accounts/revocation.py).
+    Невалидный или уже отозванный токен — тоже "ok": им и так не воспользоваться.
     """
     permission_classes = [AllowAny]
 
@@ -113,8 +146,199 @@ class LogoutAPI(APIView):
         if not refresh:
             return Response({"detail": "refresh token required"}, status=400)
         try:
-            token = RefreshToken(refresh)
-            token.blacklist()  # сработает, если rest_framework_simplejwt.token_blacklist в INSTALLED_APPS
-        except Exception:
+            token = RevocableRefreshToken(refresh)
+            token.blacklist()
+        except TokenError:
             pass
+        else:
+            audit.record(request, audit.Kinds.LOGOUT, email=token.get("email", ""),
+                         user_id=token.get(jwt_settings.USER_ID_CLAIM))
+        return Response({"detail": "ok"})
+
+
+class TokenEndpointAPI(APIView):
+    """Токен приходит в теле; access к этому моменту обычно истёк — Authorization не смотрим"""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get_authenticate_header(self, request):
+        # без этого DRF отдаёт 403 вместо 401 на InvalidToken
+        return ClaimsJWTAuthentication().authenticate_header(request)
+
+
+class RefreshAPI(TokenEndpointAPI):
+    """
+    Новая пара токенов по refresh-токену — вместо повторного входа с паролем и хешем.
+    Старый refresh отзывается (ротация), срок сессии скользящий: accounts/refresh.py.
+    """
+
+    def post(self, request):
+        raw = request.data.get("refresh")
+        if not raw:
+            return Response({"detail": "refresh token required"}, status=400)
+        try:
+            tokens, old = rotate(raw)
+        except TokenError as exc:
+            audit.record(request, audit.Kinds.REFRESH, success=False)
+            raise InvalidToken(exc.args[0])
+        audit.record(request, audit.Kinds.REFRESH, email=old.get("email", ""),
+                     user_id=old.get(jwt_settings.USER_ID_CLAIM))
+        return Response({"tokens": tokens})
+
+
+class VerifyAPI(TokenEndpointAPI):
+    """Годен ли access- или refresh-токен: 200 или 401, новых токенов не выдаёт"""
+
+    def post(self, request):
+        raw = request.data.get("token")
+        if not raw:
+            return Response({"detail": "token required"}, status=400)
+        try:
+            verify_token(raw)
+        except TokenError as exc:
+            raise InvalidToken(exc.args[0])
         return Response({"detail": "ok"})
+
+
+class HashingStatsAPI(APIView):
+    """Глубина очереди и время ожидания пула хеширования паролей"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(hashing.stats())
+
+
+class DatabaseStatsAPI(APIView):
+    """Переиспользование соединений с БД в этом воркере (accounts/dbstats.py)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({"pid": os.getpid(), "databases": dbstats.stats()})
+
+
+class ApplicantImportAPI(APIView):
+    """
+    Массовый импорт абитуриентов: multipart-поле file (.csv/.jsonl), опционально format.
+    Файл читается потоково, в ответе — число созданных и ошибки по строкам
+    (первые IMPORT_MAX_ERRORS). Хеширует общий на процесс пул импорта;
+    пока идёт другой импорт — 409. Большие файлы — manage.py import_applicants.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"detail": "file required"}, status=400)
+        fmt = request.data.get("format") or detect_format(upload.name)
+        if fmt not in FORMATS:
+            return Response({"detail": f"format must be one of: {', '.join(FORMATS)}"}, status=400)
+
+        lines = codecs.iterdecode(upload, "utf-8-sig")
+        try:
+            with hashing.shared_bulk_executor() as executor:
+                importer = ApplicantImporter(
+                    executor=executor, max_errors=getattr(settings, "IMPORT_MAX_ERRORS", 1000),
+                )
+                report = importer.run(iter_records(lines, fmt))
+        except UnicodeDecodeError:
+            return Response({"detail": "Файл должен быть в кодировке UTF-8"}, status=400)
+        return Response(report)
+
+
+class UserListAPI(ListAPIView):
+    """
+    Справочник пользователей для ADMIN/MANAGER.
+    ?role=STUDENT — фильтр по роли, ?search=ива — поиск по началу email или ФИО ученика,
+    ?cursor=... — следующая страница (ссылка приходит в поле next), ?limit= — размер страницы.
+    """
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminOrManager]
+    serializer_class = MeSerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        qs = User.objects.only(*MeSerializer.Meta.fields, "date_joined")
+        params = self.request.query_params
+
+        role = params.get("role")
+        if role:
+            if role not in User.Roles.values:
+                raise ValidationError({"role": [f"Допустимые значения: {', '.join(User.Roles.values)}"]})
+            qs = qs.filter(role=role)
+
+        search = params.get("search", "").strip()
+        if search:
+            qs = qs.filter(
+                Q(email__istartswith=search.lower()) | Q(student_full_name__istartswith=search)
+            )
+        return qs
+
+
+class UserBulkUpdateAPI(APIView):
+    """
+    Массовая смена роли/активности: {"ids": [...]} или {"filter": {"role", "joined_from", "joined_to"}}
+    и {"role": "STUDENT"} и/или {"is_active": false}. В ответе — счётчики.
+    Не трогает себя и суперпользователей; роль ADMIN назначают и снимают только суперпользователи.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        serializer = BulkUserUpdateSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        if "ids" in data:
+            qs = User.objects.filter(pk__in=data["ids"])
+        else:
+            qs = exporting.users_queryset(**data["filter"])
+        qs = qs.exclude(pk=request.user.pk).exclude(is_superuser=True)
+        if not request.user.is_superuser:
+            qs = qs.exclude(role=User.Roles.ADMIN)
+        report = bulk.update_users(qs, role=data.get("role"), is_active=data.get("is_active"))
+        return Response(report)
+
+
+class UserExportAPI(APIView):
+    """
+    Выгрузка пользователей для ADMIN/MANAGER: /api/users/export/csv/ или .../jsonl/.
+    ?role=, ?joined_from=, ?joined_to= (ГГГГ-ММ-ДД, включительно). Файл отдаётся
+    потоком по мере чтения из БД (accounts/exporting.py).
+    """
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminOrManager]
+
+    def get(self, request, fmt):
+        if fmt not in exporting.FORMATS:
+            return Response({"detail": f"format must be one of: {', '.join(exporting.FORMATS)}"}, status=400)
+        params = request.query_params
+        try:
+            qs = exporting.users_queryset(
+                role=params.get("role"),
+                joined_from=exporting.parse_day(params.get("joined_from"), "joined_from"),
+                joined_to=exporting.parse_day(params.get("joined_to"), "joined_to"),
+            )
+        except ValueError as exc:
+            raise ValidationError({"detail": str(exc)})
+
+        response = StreamingHttpResponse(
+            exporting.iter_export(exporting.iter_rows(qs), fmt),
+            content_type=exporting.CONTENT_TYPES[fmt],
+        )
+        filename = f"users-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class LoginThrottleStatsAPI(APIView):
+    """Счётчики ограничения попыток входа; ?ip=&email= — текущие значения по ключам"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        throttle = get_login_throttle()
+        return Response({
+            **throttle.stats(),
+            "current": throttle.current(
+                ip=request.query_params.get("ip"), email=request.query_params.get("email"),
+            ),
+        })
@@ -5,3 +5,10 @@ class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
     verbose_name = 'Аккаунты'
+
+    def ready(self):
+        # счётчики соединений должны подключиться к сигналам до первого запроса
+        from . import dbstats  # noqa: F401
+        # валидаторы паролей (и список частых паролей) — при старте, до fork воркеров
+        from django.contrib.auth.password_validation import get_default_password_validators
+        get_default_password_validators()
@@ -0,0 +1,14 @@
+from django.urls import path
+
+from . import async_api_views
+
+app_name = "accounts_async_api"
+
+# те же эндпоинты, что в api_urls.py, но async — для запуска под ASGI
+urlpatterns = [
+    path("auth/register/", async_api_views.register, name="register"),
+    path("auth/login/", async_api_views.login, name="login"),
+    path("auth/admin-login/", async_api_views.admin_login, name="admin_login"),
+    path("auth/me/", async_api_views.me, name="me"),
+    path("auth/logout/", async_api_views.logout, name="logout"),
+]
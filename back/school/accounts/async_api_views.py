@@ -0,0 +1,201 @@
+# accounts/async_api_views.py
+"""
+Async-варианты /api/auth/* для запуска под ASGI (school/asgi.py): /api/async/auth/...
+
+DRF 3.14 не умеет async-вью, поэтому это обычные async-функции Django с тем же
+форматом запросов и ответов, что у accounts/api_views.py: те же сериализаторы
+для валидации, обработчик исключений DRF для ошибок, те же токены. Тело
+запроса — только JSON.
+
+Пароли хешируются и проверяются в пуле accounts/hashing.py (тот же лимит
+и 503 при переполнении), а вью в это время ждёт future: цикл событий
+продолжает обслуживать другие запросы, например дешёвые /me. БД — через
+async ORM (afirst, asave); то, у чего async API нет (транзакции, кеш Django,
+список отзыва), — через sync_to_async.
+"""
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.cache import parse_etags, patch_cache_control, patch_vary_headers
+from rest_framework import exceptions, status
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import admin_slots, audit, hashing, routing
+from .api_views import issue_tokens_for_user
+from .authentication import ClaimsJWTAuthentication
+from .models import User
+from .revocation import RevocableRefreshToken
+from .serializers import (
+    AdminLoginSerializer, LoginSerializer, MeSerializer, RegisterSerializer, EMAIL_TAKEN_MESSAGE,
+)
+from .throttling import check_login_attempt
+from .tokens import version_of
+
+
+def _json(data, status=status.HTTP_200_OK):
+    # как JSONRenderer DRF: кириллица без \u-экранирования
+    return JsonResponse(data, status=status, json_dumps_params={"ensure_ascii": False})
+
+
+def _parse_body(request):
+    if not request.body:
+        return {}
+    try:
+        data = json.loads(request.body)
+    except ValueError as exc:
+        raise exceptions.ParseError(f"JSON parse error - {exc}")
+    if not isinstance(data, dict):
+        raise exceptions.ParseError("Ожидается JSON-объект")
+    return data
+
+
+def _exception_response(request, exc):
+    """Ответ обработчика исключений DRF в виде JsonResponse; None — не исключение API"""
+    response = api_settings.EXCEPTION_HANDLER(exc, {"request": request, "view": None})
+    if response is None:
+        return None
+    result = _json(response.data, status=response.status_code)
+    for header in ("WWW-Authenticate", "Retry-After"):
+        if header in response:
+            result[header] = response[header]
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        # как APIView.handle_exception: 401 с WWW-Authenticate
+        result.status_code = status.HTTP_401_UNAUTHORIZED
+        result["WWW-Authenticate"] = ClaimsJWTAuthentication().authenticate_header(request)
+    return result
+
+
+def async_api(*methods):
+    """Разрешённые методы, JSON-тело в request.data, исключения DRF -> JSON-ответ"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise exceptions.MethodNotAllowed(request.method)
+                request.data = _parse_body(request) if request.method == "POST" else {}
+                return await view(request, *args, **kwargs)
+            except Exception as exc:
+                response = _exception_response(request, exc)
+                if response is None:
+                    raise
+                return response
+
+        # как у APIView: авторизация токенами, не cookie
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+async def _authenticate(request):
+    # кеш проверенных токенов и версий — синхронный кеш Django, на промахе — ещё и БД
+    result = await sync_to_async(ClaimsJWTAuthentication().authenticate)(request)
+    if result is None:
+        raise exceptions.NotAuthenticated()
+    return result
+
+
+@async_api("POST")
+async def register(request):
+    ser = RegisterSerializer(data=request.data)
+    ser.is_valid(raise_exception=True)
+    user = RegisterSerializer.build_user(ser.validated_data)
+    await user.aset_passwords(ser.validated_data["password"], ser.validated_data["parent_password"])
+    try:
+        # insert() изолирует дубль email точкой сохранения, если уже идёт транзакция
+        await sync_to_async(user.insert)()
+    except IntegrityError:
+        raise exceptions.ValidationError({"email": [EMAIL_TAKEN_MESSAGE]})
+    await sync_to_async(routing.stick_user)(user.pk)
+    audit.record(request, audit.Kinds.REGISTER, user=user)
+    return _json({
+        "user": MeSerializer(user).data,
+        "tokens": issue_tokens_for_user(user),
+    }, status=status.HTTP_201_CREATED)
+
+
+@async_api("POST")
+async def login(request):
+    ser = LoginSerializer(data=request.data)
+    ser.is_valid(raise_exception=True)
+    email = ser.validated_data["email"].lower()
+    password = ser.validated_data["password"]
+    await sync_to_async(check_login_attempt)(request, email)
+
+    # как ModelBackend: поиск по LOWER(email), для несуществующего email хеш всё равно считаем
+    user = await User.objects.filter(email__lower=email).afirst()
+    if user is None:
+        await hashing.amake_password(password)
+    elif not (await user.acheck_password(password) and user.is_active):
+        user = None
+    if user is None:
+        audit.record(request, audit.Kinds.LOGIN, email=email, success=False)
+        return _json({"detail": "Неверный email или пароль"}, status=status.HTTP_400_BAD_REQUEST)
+    audit.record(request, audit.Kinds.LOGIN, user=user)
+    return _json({"user": MeSerializer(user).data, "tokens": issue_tokens_for_user(user)})
+
+
+@async_api("POST")
+async def admin_login(request):
+    ser = AdminLoginSerializer(data=request.data)
+    ser.is_valid(raise_exception=True)
+    email = ser.validated_data["email"].lower()
+    password = ser.validated_data["password"]
+    await sync_to_async(check_login_attempt)(request, email)
+
+    if email not in getattr(settings, "ADMIN_SEED_EMAILS", []):
+        return _json({"detail": "Email не разрешён для админ-входа"}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        user = await admin_slots.aadmin_login(email, password)
+    except admin_slots.AdminSlotsExhausted:
+        audit.record(request, audit.Kinds.ADMIN_LOGIN, email=email, success=False)
+        return _json({"detail": "Лимит админов исчерпан"}, status=status.HTTP_403_FORBIDDEN)
+    if user is None:
+        audit.record(request, audit.Kinds.ADMIN_LOGIN, email=email, success=False)
+        return _json({"detail": "Неверный пароль"}, status=status.HTTP_400_BAD_REQUEST)
+    audit.record(request, audit.Kinds.ADMIN_LOGIN, user=user)
+    return _json({"user": MeSerializer(user).data, "tokens": issue_tokens_for_user(user)})
+
+
+@async_api("GET", "HEAD")
+async def me(request):
+    """Как MeAPI: профиль из claims, ETag по версии токенов, 304 на If-None-Match"""
+    user, _ = await _authenticate(request)
+    etag = f'"me-{user.id}-{version_of(user)}-json"'
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    if etag in if_none_match or "*" in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = _json(MeSerializer(user).data)
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ("Authorization",))
+    return response
+
+
+def _revoke(raw_token):
+    token = RevocableRefreshToken(raw_token)
+    token.blacklist()
+    return token
+
+
+@async_api("POST")
+async def logout(request):
+    refresh = request.data.get("refresh")
+    if not refresh:
+        return _json({"detail": "refresh token required"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        # проверка по списку отзыва и запись в него — синхронные (фильтр Блума + БД)
+        token = await sync_to_async(_revoke)(refresh)
+    except TokenError:
+        pass
+    else:
+        audit.record(request, audit.Kinds.LOGOUT, email=token.get("email", ""),
+                     user_id=token.get(jwt_settings.USER_ID_CLAIM))
+    return _json({"detail": "ok"})
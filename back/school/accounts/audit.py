@@ -0,0 +1,233 @@
+# accounts/audit.py
+"""
+Журнал регистраций, входов и выходов (модель AuthEvent).
+
+Вью не пишут в БД сами: record() кладёт событие в очередь процесса, фоновый
+поток забирает пачки по BATCH_SIZE (или что накопилось за FLUSH_INTERVAL)
+и пишет их одним bulk_create. Очередь ограничена MAX_QUEUE — если запись
+не успевает, новые события отбрасываются и считаются в dropped, а вход
+не ждёт. При остановке процесса (atexit) остаток дописывается.
+
+Независимо от журнала record() считает события по видам (counts()) — из них
+метрики /metrics, например сколько обновлений токенов на один вход по паролю.
+
+Настройки (settings.AUDIT_LOG):
+    ENABLED        — писать ли журнал
+    BACKGROUND     — фоновый поток; False — события ждут явного flush() (тесты)
+    BATCH_SIZE     — событий в одном bulk_create
+    FLUSH_INTERVAL — секунд, после которых пишем неполную пачку
+    MAX_QUEUE      — сколько событий держать в памяти
+"""
+import atexit
+import ipaddress
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, connection
+from django.dispatch import receiver
+
+from .models import AuthEvent
+from .throttling import client_ip
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "BACKGROUND": True,
+    "BATCH_SIZE": 200,
+    "FLUSH_INTERVAL": 1.0,
+    "MAX_QUEUE": 10000,
+}
+
+Kinds = AuthEvent.Kinds
+
+
+class AuditWriter:
+    def __init__(self, batch_size=200, flush_interval=1.0, max_queue=10000, background=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.background = background
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._enqueued = 0
+        self._dropped = 0
+        self._written = 0
+        self._failed = 0
+        self._batches = 0
+
+    def add(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+        with self._lock:
+            self._enqueued += 1
+        if self.background and self._thread is None:
+            self._start()
+        return True
+
+    def _start(self):
+        with self._lock:
+            # поток запускается при первом событии — уже в воркере, после fork
+            if self._thread is None and not self._stopping.is_set():
+                self._thread = threading.Thread(target=self._run, name="auth-audit-writer", daemon=True)
+                self._thread.start()
+
+    def _take(self, block):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if block:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0.001)))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if block and time.monotonic() >= deadline:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            AuthEvent.objects.bulk_create(batch)
+        except Exception:
+            logger.exception("Не удалось записать %d событий журнала входов", len(batch))
+            with self._lock:
+                self._failed += len(batch)
+        else:
+            with self._lock:
+                self._written += len(batch)
+                self._batches += 1
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                batch = self._take(block=True)
+                if batch:
+                    # соединение потока живёт по тем же правилам CONN_MAX_AGE, что и в запросах
+                    close_old_connections()
+                    self._write(batch)
+        finally:
+            connection.close()
+
+    def flush(self):
+        """Записать всё, что в очереди, в текущем потоке"""
+        while True:
+            batch = self._take(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self, timeout=5, flush=True):
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        if flush:
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "enqueued": self._enqueued,
+                "dropped": self._dropped,
+                "written": self._written,
+                "failed": self._failed,
+                "batches": self._batches,
+            }
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "AUDIT_LOG", {})}
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                conf = get_config()
+                _writer = AuditWriter(
+                    batch_size=conf["BATCH_SIZE"],
+                    flush_interval=conf["FLUSH_INTERVAL"],
+                    max_queue=conf["MAX_QUEUE"],
+                    background=conf["BACKGROUND"],
+                )
+    return _writer
+
+
+def reset():
+    """Остановить писателя, не дописывая очередь (тесты, смена настроек)"""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop(flush=False)
+
+
+@receiver(setting_changed)
+def reset_writer(*, setting, **kwargs):
+    # настройки меняются только в тестах: недописанное не переносим в чужую БД/транзакцию
+    if setting == "AUDIT_LOG":
+        reset()
+
+
+@atexit.register
+def _flush_on_exit():
+    if _writer is not None:
+        _writer.stop()
+
+
+def _ip(request):
+    ip = client_ip(request)
+    try:
+        ipaddress.ip_address(ip)
+    except ValueError:
+        # мусор в X-Forwarded-For от прокси — берём адрес соединения
+        ip = request.META.get("REMOTE_ADDR")
+    return ip or None
+
+
+_counts = Counter()
+_counts_lock = threading.Lock()
+
+
+def record(request, kind, user=None, email="", success=True, user_id=None):
+    """Поставить событие в очередь журнала; в БД оно попадёт пачкой из фонового потока"""
+    with _counts_lock:
+        _counts[kind, success] += 1
+    if not get_config()["ENABLED"]:
+        return
+    get_writer().add(AuthEvent(
+        kind=kind,
+        success=success,
+        user_id=user.pk if user is not None else user_id,
+        email=(getattr(user, "email", None) or email or "")[:254],
+        ip=_ip(request),
+        user_agent=request.META.get("HTTP_USER_AGENT", "")[:255],
+    ))
+
+
+def stats():
+    return get_writer().stats()
+
+
+def counts():
+    """{(вид, успешно): число} событий в этом процессе с его старта"""
+    with _counts_lock:
+        return dict(_counts)
@@ -0,0 +1,99 @@
+# accounts/authentication.py
+import copy
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication, JWTStatelessUserAuthentication,
+)
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from . import routing
+from .jwt_cache import VerifiedTokenCache, get_token_cache
+from .tokens import VERSION_CLAIM, get_token_version
+
+
+def _check_token_version(user_id, validated_token):
+    if get_token_version(user_id) != validated_token[VERSION_CLAIM]:
+        raise AuthenticationFailed(_("Token is invalid or expired"), code="token_not_valid")
+
+
+class CachedTokenMixin:
+    """
+    Проверенные токены с версией и их пользователь берутся из accounts/jwt_cache.py:
+    повторный запрос с тем же токеном не проверяет подпись и не ищет пользователя,
+    остаётся только сверка версии токенов.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        token_cache = get_token_cache()
+        if token_cache is None:
+            validated_token = self.get_validated_token(raw_token)
+            return self.get_user(validated_token), validated_token
+
+        key = VerifiedTokenCache.key(raw_token, type(self).__name__)
+        cached = token_cache.get(key)
+        if cached is None:
+            validated_token = self.get_validated_token(raw_token)
+            user = self.get_user(validated_token)
+            if VERSION_CLAIM in validated_token:
+                token_cache.put(key, validated_token, user)
+            return user, validated_token
+
+        validated_token, user = cached
+        routing.pin_if_sticky(validated_token.get(api_settings.USER_ID_CLAIM))
+        try:
+            _check_token_version(user.id, validated_token)
+        except AuthenticationFailed:
+            token_cache.discard(key)
+            raise
+        return self.reuse_user(user, validated_token), validated_token
+
+    def reuse_user(self, user, validated_token):
+        # у каждого запроса свой объект: вью могут менять атрибуты пользователя
+        return copy.copy(user)
+
+
+class CachedJWTAuthentication(CachedTokenMixin, JWTAuthentication):
+    """
+    JWTAuthentication с кешем проверенных токенов (по умолчанию для API).
+    Токены с версией, выданные до смены роли/пароля/прав, не принимаются.
+    """
+
+    def get_user(self, validated_token):
+        routing.pin_if_sticky(validated_token.get(api_settings.USER_ID_CLAIM))
+        user = super().get_user(validated_token)
+        if VERSION_CLAIM in validated_token:
+            _check_token_version(user.id, validated_token)
+        return user
+
+
+class ClaimsJWTAuthentication(CachedTokenMixin, JWTStatelessUserAuthentication):
+    """
+    JWT без запроса к БД: request.user — TokenUser, поля берутся из claims токена
+    (см. issue_tokens_for_user). Отозванные сменой версии токены отклоняются.
+    Токены старого образца (без версии) проверяются обычным способом, через БД.
+
+    Подключается явно: authentication_classes = [ClaimsJWTAuthentication].
+    """
+
+    def get_user(self, validated_token):
+        # только что зарегистрированного/повышенного читаем не с реплики
+        routing.pin_if_sticky(validated_token.get(api_settings.USER_ID_CLAIM))
+        if VERSION_CLAIM not in validated_token:
+            return JWTAuthentication.get_user(self, validated_token)
+
+        user = super().get_user(validated_token)
+        _check_token_version(user.id, validated_token)
+        return user
+
+    def reuse_user(self, user, validated_token):
+        # TokenUser — обёртка над токеном, собрать заново дешевле, чем копировать
+        return JWTStatelessUserAuthentication.get_user(self, validated_token)
@@ -0,0 +1,226 @@
+# accounts/benchmarks.py
+"""
+Нагрузочный прогон эндпоинтов в процессе: несколько потоков-клиентов
+(django.test.Client) бьют в WSGI-обработчик на временной тестовой БД.
+Для сравнения с ASGI — run_scenario_async(): клиенты — задачи asyncio
+(django.test.AsyncClient) в одном цикле событий, как у одного ASGI-воркера.
+
+Для каждого сценария считаем пропускную способность, задержки (p50/p95/p99)
+и число SQL-запросов на запрос. Результаты сохраняются в JSON, чтобы сравнивать
+прогоны между коммитами (manage.py bench_auth --compare old.json).
+"""
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.db import close_old_connections, connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from . import audit, instrumentation
+
+
+class Scenario:
+    """
+    request(client, i, state) -> response; setup() -> state (готовится один раз).
+    arequest — то же для AsyncClient (async); без него сценарий только для WSGI.
+    """
+
+    def __init__(self, name, request, setup=None, arequest=None):
+        self.name = name
+        self.request = request
+        self.setup = setup
+        self.arequest = arequest
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies, queries, errors, wall, concurrency):
+    latencies = sorted(latencies)
+    ms = [value * 1000 for value in latencies]
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "mean": round(sum(ms) / len(ms), 3) if ms else 0.0,
+            "p50": round(percentile(ms, 50), 3),
+            "p95": round(percentile(ms, 95), 3),
+            "p99": round(percentile(ms, 99), 3),
+            "max": round(ms[-1], 3) if ms else 0.0,
+        },
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else 0.0,
+    }
+
+
+def run_scenario(scenario, requests, concurrency):
+    state = scenario.setup() if scenario.setup else None
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies, queries = [], []
+    errors = 0
+
+    def worker():
+        nonlocal errors
+        # исключение во view — это 500 в статистике, а не обрыв прогона
+        client = Client(raise_request_exception=False)
+        try:
+            while True:
+                i = next(counter)
+                if i >= requests:
+                    return
+                # время — вместе с открытием соединения (его делает CaptureQueriesContext)
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as captured:
+                    response = scenario.request(client, i, state)
+                elapsed = time.perf_counter() - started
+                # как request_finished у настоящего сервера (тестовый клиент это отключает):
+                # соединение закрывается, если CONN_MAX_AGE истёк или равен 0
+                close_old_connections()
+                with lock:
+                    latencies.append(elapsed)
+                    queries.append(len(captured))
+                    if response.status_code >= 400:
+                        errors += 1
+        finally:
+            # у каждого потока своё соединение с БД
+            connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(worker) for _ in range(concurrency)]
+        for future in futures:
+            future.result()
+    wall = time.perf_counter() - started
+    return summarize(latencies, queries, errors, wall, concurrency)
+
+
+def run_scenario_async(scenario, requests, concurrency):
+    """
+    Как run_scenario(), но через ASGI-обработчик: concurrency задач в одном цикле
+    событий. Каждый запрос — в своём ThreadSensitiveContext, как у ASGIHandler:
+    синхронные части (middleware, ORM) идут в поток этого запроса, и соединение
+    с БД после запроса закрывается (под ASGI Django не переиспользует соединения).
+    """
+    state = scenario.setup() if scenario.setup else None
+    counter = itertools.count()
+    latencies, queries = [], []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        client = AsyncClient(raise_request_exception=False)
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            started = time.perf_counter()
+            async with ThreadSensitiveContext():
+                # SQL считает хук instrumentation: contextvar доходит до потоков sync_to_async
+                with instrumentation.collect() as metrics:
+                    response = await scenario.arequest(client, i, state)
+                elapsed = time.perf_counter() - started
+                await sync_to_async(connections.close_all)()
+            latencies.append(elapsed)
+            queries.append(metrics.queries)
+            if response.status_code >= 400:
+                errors += 1
+
+    async def main():
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    wall = time.perf_counter() - started
+    return summarize(latencies, queries, errors, wall, concurrency)
+
+
+class BenchmarkDatabase:
+    """
+    Временная тестовая БД для прогона (как у manage.py test).
+    SQLite — в файле, а не в памяти: иначе параллельные записи ловят "table is locked".
+    """
+
+    def __enter__(self):
+        setup_test_environment()
+        self._tmpdir = None
+        if connection.vendor == "sqlite":
+            self._tmpdir = tempfile.TemporaryDirectory()
+            connection.settings_dict.setdefault("TEST", {})["NAME"] = os.path.join(
+                self._tmpdir.name, "bench.sqlite3",
+            )
+        self._old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False,
+        )
+        return self
+
+    def __exit__(self, *exc):
+        # журнал входов пишет фоновый поток — останавливаем его, пока БД ещё есть
+        audit.reset()
+        connection.creation.destroy_test_db(self._old_name, verbosity=0)
+        teardown_test_environment()
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": timezone.now().isoformat(),
+        "commit": commit,
+        "database": connection.vendor,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(old, new):
+    """Строки сравнения двух прогонов: p50/p95 и RPS, изменение в процентах"""
+    def delta(before, after):
+        return f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+
+    lines = []
+    for name, result in new["scenarios"].items():
+        previous = old.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        lines.append(
+            f"{name:<24} "
+            f"p50 {delta(previous['latency_ms']['p50'], result['latency_ms']['p50']):>8}  "
+            f"p95 {delta(previous['latency_ms']['p95'], result['latency_ms']['p95']):>8}  "
+            f"rps {delta(previous['throughput_rps'], result['throughput_rps']):>8}  "
+            f"queries {previous['queries_per_request']} -> {result['queries_per_request']}"
+        )
+    return lines
+
+
+def save(results, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,75 @@
+# accounts/bulk.py
+"""
+Массовая смена роли и активности (перевод набора абитуриентов в ученики, отключение).
+
+Пользователи обходятся пачками по id: на пачку — одна транзакция, в которой
+выбираются те, у кого что-то действительно меняется, и один UPDATE только
+изменённых столбцов с token_version = token_version + 1 (как при save(),
+но без загрузки моделей). Выданные им токены и закешированные профили
+(ETag MeAPI) перестают приниматься; новые версии сразу кладутся в кеш,
+а сами пользователи STICKY_SECONDS читаются из основной БД (accounts/routing.py).
+"""
+from django.db import router, transaction
+from django.db.models import F, Q
+
+from . import routing, tokens
+from .models import User
+
+CHUNK_SIZE = 500
+
+
+def iter_id_chunks(queryset, chunk_size=CHUNK_SIZE):
+    """id пользователей из queryset списками по chunk_size (keyset по первичному ключу)"""
+    queryset = queryset.order_by("pk").values_list("pk", flat=True)
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        ids = list(chunk[:chunk_size])
+        if ids:
+            yield ids
+        if len(ids) < chunk_size:
+            return
+        last = ids[-1]
+
+
+def _refresh_versions(changed, versions):
+    tokens.remember_token_versions(versions)
+    # отключённых в кеше не держим: get_token_version() для них вернёт None
+    tokens.forget_token_versions([pk for pk in changed if pk not in versions])
+
+
+def update_users(queryset, role=None, is_active=None, chunk_size=CHUNK_SIZE):
+    """
+    Поставить role и/или is_active всем из queryset.
+    Возвращает {"matched": найдено, "updated": изменено, "unchanged": уже были такими}.
+    """
+    changes = {field: value for field, value in (("role", role), ("is_active", is_active)) if value is not None}
+    if not changes:
+        raise ValueError("Нечего менять: укажите role и/или is_active")
+    if "role" in changes and role not in User.Roles.values:
+        raise ValueError(f"role: допустимые значения: {', '.join(User.Roles.values)}")
+
+    differs = Q()
+    for field, value in changes.items():
+        differs |= ~Q(**{field: value})
+
+    using = router.db_for_write(User)
+    matched = updated = 0
+    for ids in iter_id_chunks(queryset, chunk_size):
+        matched += len(ids)
+        with transaction.atomic(using=using):
+            rows = User.objects.using(using).filter(differs, pk__in=ids)
+            changed = list(rows.select_for_update().values_list("pk", flat=True))
+            if not changed:
+                continue
+            User.objects.using(using).filter(pk__in=changed).update(
+                **changes, token_version=F("token_version") + 1,
+            )
+            versions = dict(
+                User.objects.using(using).filter(pk__in=changed, is_active=True)
+                .values_list("pk", "token_version")
+            )
+            transaction.on_commit(lambda c=changed, v=versions: _refresh_versions(c, v), using=using)
+            routing.stick_users(changed)
+        updated += len(changed)
+    return {"matched": matched, "updated": updated, "unchanged": matched - updated}
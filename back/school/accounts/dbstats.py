@@ -0,0 +1,114 @@
+# accounts/dbstats.py
+"""
+Переиспользование соединений с БД в этом воркере.
+
+С CONN_MAX_AGE > 0 соединение живёт между запросами, и дешёвые эндпоинты
+(/api/auth/me/) не платят за TCP + авторизацию MySQL. Здесь считаем, сколько
+соединений открыто, сколько запросов обошлись уже открытым и каков возраст
+открытых сейчас — чтобы видеть, работает ли это на самом деле.
+
+Считается по сигналам Django (connection_created, request_started/finished)
+и execute_wrapper, который вешается на соединение при открытии. Статистика
+своя у каждого процесса, как и сами соединения.
+"""
+import contextvars
+import threading
+import time
+import weakref
+from collections import defaultdict
+
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+class ConnectionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._opened = defaultdict(int)
+        self._new = defaultdict(int)
+        self._reused = defaultdict(int)
+        # обёртки соединений (по одной на поток и алиас), у которых когда-либо открывалось соединение
+        self._wrappers = weakref.WeakSet()
+
+    def opened(self, wrapper):
+        with self._lock:
+            self._opened[wrapper.alias] += 1
+            self._wrappers.add(wrapper)
+
+    def finished(self, used, opened):
+        with self._lock:
+            for alias in used:
+                if alias in opened:
+                    self._new[alias] += 1
+                else:
+                    self._reused[alias] += 1
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            ages = defaultdict(list)
+            for wrapper in list(self._wrappers):
+                if wrapper.connection is not None:
+                    ages[wrapper.alias].append(now - wrapper.school_opened_at)
+            result = {}
+            for alias in connections:
+                settings_dict = connections.settings[alias]
+                new, reused = self._new[alias], self._reused[alias]
+                alias_ages = ages[alias]
+                result[alias] = {
+                    "conn_max_age": settings_dict.get("CONN_MAX_AGE", 0),
+                    "health_checks": settings_dict.get("CONN_HEALTH_CHECKS", False),
+                    "opened": self._opened[alias],
+                    "requests_new_connection": new,
+                    "requests_reused": reused,
+                    "reuse_ratio": round(reused / (new + reused), 4) if new + reused else 0.0,
+                    "open": len(alias_ages),
+                    "age_s_avg": round(sum(alias_ages) / len(alias_ages), 3) if alias_ages else 0.0,
+                    "age_s_max": round(max(alias_ages), 3) if alias_ages else 0.0,
+                }
+            return result
+
+
+STATS = ConnectionStats()
+
+# алиасы, которые текущий запрос использовал и которые открыл
+_request = contextvars.ContextVar("db_connection_usage", default=None)
+
+
+def _mark_used(execute, sql, params, many, context):
+    usage = _request.get()
+    if usage is not None:
+        usage[0].add(context["connection"].alias)
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def track_connection(sender, connection, **kwargs):
+    connection.school_opened_at = time.monotonic()
+    # обёртка переживает переподключения — вешаем хук один раз; в начало списка,
+    # чтобы не мешать временным execute_wrapper(), которые снимают последний
+    if _mark_used not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _mark_used)
+    usage = _request.get()
+    if usage is not None:
+        usage[1].add(connection.alias)
+    STATS.opened(connection)
+
+
+@receiver(request_started)
+def start_request(**kwargs):
+    _request.set((set(), set()))
+
+
+@receiver(request_finished)
+def finish_request(**kwargs):
+    usage = _request.get()
+    if usage is not None:
+        _request.set(None)
+        STATS.finished(*usage)
+
+
+def stats():
+    return STATS.stats()
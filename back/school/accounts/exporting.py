@@ -0,0 +1,122 @@
+# accounts/exporting.py
+"""
+Выгрузка пользователей в CSV/JSONL потоком.
+
+Строки читаются пачками по chunk_size через values_list (без создания моделей)
+и сразу отдаются наружу, так что память не зависит от размера выгрузки.
+Пачки выбираются по ключу (date_joined, id) > последний из прошлой пачки,
+а не одним iterator(): mysqlclient, в отличие от серверных курсоров PostgreSQL,
+всё равно загрузил бы весь результат в память. Каждый такой запрос идёт по
+индексу (date_joined, id) или (role, date_joined, id).
+"""
+import csv
+import datetime
+import json
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+User = get_user_model()
+
+FORMATS = ("csv", "jsonl")
+FIELDS = ("id", "email", "phone", "student_full_name", "parent_full_name", "role", "date_joined")
+CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson; charset=utf-8"}
+# отдаём наружу кусками примерно такого размера, а не по строке
+BUFFER_SIZE = 64 * 1024
+
+
+def parse_day(value, name):
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f"{name}: ожидается дата в формате ГГГГ-ММ-ДД")
+    return day
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def users_queryset(role=None, joined_from=None, joined_to=None):
+    """joined_from/joined_to — даты регистрации включительно"""
+    qs = User.objects.all()
+    if role:
+        if role not in User.Roles.values:
+            raise ValueError(f"role: допустимые значения: {', '.join(User.Roles.values)}")
+        qs = qs.filter(role=role)
+    if joined_from:
+        qs = qs.filter(date_joined__gte=_start_of_day(joined_from))
+    if joined_to:
+        qs = qs.filter(date_joined__lt=_start_of_day(joined_to + datetime.timedelta(days=1)))
+    return qs
+
+
+def iter_rows(queryset, chunk_size=2000):
+    """Кортежи FIELDS в порядке регистрации, пачками по chunk_size"""
+    queryset = queryset.order_by("date_joined", "id").values_list(*FIELDS)
+    date_index, id_index = FIELDS.index("date_joined"), FIELDS.index("id")
+    position = None
+    while True:
+        chunk = queryset
+        if position is not None:
+            joined, pk = position
+            # лишнее date_joined >= даёт планировщику начать с места в индексе, а не с его начала
+            chunk = chunk.filter(
+                Q(date_joined__gte=joined), Q(date_joined__gt=joined) | Q(date_joined=joined, id__gt=pk),
+            )
+        rows = list(chunk[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        position = rows[-1][date_index], rows[-1][id_index]
+
+
+class _Echo:
+    """csv.writer пишет сюда, а мы забираем строку"""
+
+    def write(self, value):
+        return value
+
+
+# с этих символов Excel/LibreOffice начинают формулу
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _plain(row):
+    return [value.isoformat() if isinstance(value, datetime.datetime) else value for value in row]
+
+
+def _csv_cell(value):
+    # ФИО, email и телефон вводят сами пользователи: "=HYPERLINK(...)" не должно стать формулой
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_lines(rows, fmt):
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(FIELDS)
+        for row in rows:
+            yield writer.writerow([_csv_cell(value) for value in _plain(row)])
+    elif fmt == "jsonl":
+        for row in rows:
+            yield json.dumps(dict(zip(FIELDS, _plain(row))), ensure_ascii=False) + "\n"
+    else:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt!r}")
+
+
+def iter_export(rows, fmt, buffer_size=BUFFER_SIZE):
+    """Текст выгрузки кусками около buffer_size символов"""
+    buffer, size = [], 0
+    for line in iter_lines(rows, fmt):
+        buffer.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
@@ -2,10 +2,30 @@
 from django import forms
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
-from django.contrib.auth.hashers import make_password
 from django.conf import settings
+from django.db import IntegrityError
+from rest_framework.exceptions import Throttled
 
 from .models import User
+from .throttling import check_login_attempt
+
+
+class LoginThrottleMixin:
+    """Ограничение попыток входа (accounts/throttling.py); без request не применяется"""
+
+    def __init__(self, *args, request=None, **kwargs):
+        self.request = request
+        super().__init__(*args, **kwargs)
+
+    def check_throttle(self, email):
+        if self.request is None:
+            return
+        try:
+            check_login_attempt(self.request, email)
+        except Throttled as exc:
+            raise forms.ValidationError(
+                f'Слишком много попыток входа. Повторите через {exc.wait} с.'
+            )
 
 class RegistrationForm(forms.ModelForm):
     password = forms.CharField(
@@ -37,10 +57,15 @@ class RegistrationForm(forms.ModelForm):
         }
 
     def clean_email(self):
-        email = self.cleaned_data['email'].lower().strip()
-        if User.objects.filter(email=email).exists():
-            raise forms.ValidationError('Пользователь с таким email уже зарегистрирован.')
-        return email
+        # занятость email проверяется в save() самим INSERT'ом
+        return self.cleaned_data['email'].lower().strip()
+
+    def _get_validation_exclusions(self):
+        # ModelForm проверил бы уникальность email (и индекс LOWER(email)) SELECT'ами —
+        # их заменяет INSERT в save()
+        exclude = super()._get_validation_exclusions()
+        exclude.add('email')
+        return exclude
 
     def clean_password(self):
         pwd = self.cleaned_data['password']
@@ -57,16 +82,19 @@ class RegistrationForm(forms.ModelForm):
             role=User.Roles.APPLICANT,  # по умолчанию абитуриент
         )
         user.username = user.email  # логинимся по email
-        user.set_password(data['password'])
-        # пароль родителя сохраняем как хеш
-        user.parent_password_hash = make_password(data['parent_password'])
+        # пароль родителя сохраняем как хеш; оба хеша считаются одновременно
+        user.set_passwords(data['password'], data['parent_password'])
 
         if commit:
-            user.save()
+            try:
+                user.insert()
+            except IntegrityError:
+                self.add_error('email', 'Пользователь с таким email уже зарегистрирован.')
+                return None
         return user
 
 
-class LoginForm(forms.Form):
+class LoginForm(LoginThrottleMixin, forms.Form):
     email = forms.EmailField(label='Email')
     password = forms.CharField(label='Пароль', widget=forms.PasswordInput)
 
@@ -76,6 +104,7 @@ class LoginForm(forms.Form):
         password = cleaned.get('password')
 
         if email and password:
+            self.check_throttle(email)
             # аутентифицируем через username=email
             user = authenticate(username=email, password=password)
             if not user:
@@ -87,7 +116,7 @@ class LoginForm(forms.Form):
         return getattr(self, 'user', None)
 
 
-class AdminLoginForm(forms.Form):
+class AdminLoginForm(LoginThrottleMixin, forms.Form):
     email = forms.EmailField(label='Email (только для вшитых админов)')
     password = forms.CharField(label='Пароль', widget=forms.PasswordInput)
 
@@ -103,7 +132,8 @@ class AdminLoginForm(forms.Form):
         password = cleaned.get('password')
 
         if email and password:
-            user = authenticate(username=email, password=password)
+            self.check_throttle(email)
+            # Пароль здесь не проверяем — это сделает view (лишний хеш не нужен).
             # Допускаем вход и для ещё не созданного пользователя из белого списка:
             # если нет — создадим в view при успешной проверке.
             # Здесь просто запоминаем введённые данные.
@@ -0,0 +1,27 @@
+# accounts/hashers.py
+"""
+Хешеры паролей с параметрами из настроек.
+
+Параметры подбираются под конкретное железо командой calibrate_hashers и задаются
+через PASSWORD_PBKDF2_ITERATIONS / PASSWORD_SCRYPT_WORK_FACTOR. Имена алгоритмов
+стандартные, поэтому старые хеши продолжают проверяться, а при смене параметров
+пароль перехешируется при следующем успешном входе (must_update).
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, ScryptPasswordHasher
+
+
+class CalibratedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+class CalibratedScryptPasswordHasher(ScryptPasswordHasher):
+    # scrypt берёт ~128 * n * r байт памяти, а лимит OpenSSL по умолчанию — 32 МБ;
+    # это только верхняя граница, выделяется столько, сколько нужно
+    maxmem = 512 * 1024 * 1024
+
+    @property
+    def work_factor(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_WORK_FACTOR', ScryptPasswordHasher.work_factor)
@@ -0,0 +1,347 @@
+# accounts/hashing.py
+"""
+Пул для хеширования и проверки паролей.
+
+PBKDF2 съедает процессор целиком, поэтому вся работа с паролями в accounts
+идёт через ограниченный пул: не больше WORKERS хешей одновременно и не больше
+QUEUE_SIZE ожидающих. Если очередь заполнена — сразу отвечаем 503 + Retry-After,
+а не копим запросы в воркерах gunicorn. Async-вью (accounts/async_api_views.py)
+ждут тот же пул через a*-функции, не блокируя цикл событий.
+
+Настройки (settings.PASSWORD_HASHING):
+    BACKEND     — "thread", "process" или "inline" (в потоке запроса, только лимит)
+    WORKERS     — число потоков/процессов пула
+    QUEUE_SIZE  — сколько задач может ждать свободного воркера
+    RETRY_AFTER — значение заголовка Retry-After (секунды) при переполнении
+    BULK_WORKERS — процессов в общем пуле импорта абитуриентов через API
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import instrumentation
+
+DEFAULTS = {
+    "BACKEND": "thread",
+    "WORKERS": 2,
+    "QUEUE_SIZE": 16,
+    "RETRY_AFTER": 2,
+    "BULK_WORKERS": 2,
+}
+
+
+class HashingPoolSaturated(APIException):
+    """Очередь на хеширование переполнена. DRF сам выставит Retry-After по .wait"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Сервер перегружен, повторите попытку позже"
+    default_code = "hashing_pool_saturated"
+
+    def __init__(self, wait, detail=None):
+        super().__init__(detail)
+        self.wait = wait
+
+
+class BulkImportBusy(APIException):
+    """Пул импорта уже занят другим импортом"""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Импорт уже выполняется, повторите попытку после его завершения"
+    default_code = "bulk_import_busy"
+
+
+# --- функции, которые выполняются в воркере (должны быть пиклуемыми) ---
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def _make_password(password):
+    return hashers.make_password(password)
+
+
+def _verify_password(password, encoded):
+    # setter не может пересечь границу процесса — просто запоминаем,
+    # что хеш нужно обновить, и делаем это уже в потоке запроса
+    upgrade = []
+    is_correct = hashers.check_password(password, encoded, setter=upgrade.append)
+    return is_correct, bool(upgrade)
+
+
+def _init_process_worker(settings_module):
+    import django
+    if settings_module:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    django.setup()
+
+
+class HashingPool:
+    def __init__(self, backend="thread", workers=2, queue_size=16, retry_after=2):
+        if backend not in ("thread", "process", "inline"):
+            raise ValueError(f"Неизвестный BACKEND пула хеширования: {backend!r}")
+        self.backend = backend
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._service_total = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.backend == "process":
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.workers,
+                            initializer=_init_process_worker,
+                            initargs=(os.environ.get("DJANGO_SETTINGS_MODULE"),),
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers,
+                            thread_name_prefix="password-hashing",
+                        )
+        return self._executor
+
+    def run(self, fn, *args):
+        return self.run_many(fn, [args])[0]
+
+    def run_many(self, fn, calls):
+        """Выполнить fn(*args) для каждого набора аргументов параллельно"""
+        calls = list(calls)
+        started = self._acquire(len(calls))
+        services = []
+        try:
+            if self.backend == "inline":
+                outcomes = [_timed(fn, *args) for args in calls]
+            else:
+                executor = self._get_executor()
+                futures = [executor.submit(_timed, fn, *args) for args in calls]
+                wait_futures(futures)
+                outcomes = [future.result() for future in futures]
+            services = [service for _, service in outcomes]
+            return [result for result, _ in outcomes]
+        finally:
+            self._release(len(calls), started, services)
+
+    async def arun(self, fn, *args):
+        return (await self.arun_many(fn, [args]))[0]
+
+    async def arun_many(self, fn, calls):
+        """run_many() для async-вью: ждём пул, не занимая ни цикл событий, ни поток"""
+        calls = list(calls)
+        started = self._acquire(len(calls))
+        services = []
+        try:
+            if self.backend == "inline":
+                # "в потоке запроса" у async-вью — это цикл событий; уводим в поток
+                outcomes = await sync_to_async(
+                    lambda: [_timed(fn, *args) for args in calls], thread_sensitive=False,
+                )()
+            else:
+                executor = self._get_executor()
+                outcomes = await asyncio.gather(*[
+                    asyncio.wrap_future(executor.submit(_timed, fn, *args)) for args in calls
+                ])
+            services = [service for _, service in outcomes]
+            return [result for result, _ in outcomes]
+        finally:
+            self._release(len(calls), started, services)
+
+    def _acquire(self, count):
+        taken = 0
+        for _ in range(count):
+            if not self._slots.acquire(blocking=False):
+                for _ in range(taken):
+                    self._slots.release()
+                with self._lock:
+                    self._rejected += 1
+                raise HashingPoolSaturated(self.retry_after)
+            taken += 1
+
+        with self._lock:
+            self._in_flight += taken
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+        return time.perf_counter()
+
+    def _release(self, count, started, services):
+        elapsed = time.perf_counter() - started
+        waits = [max(elapsed - service, 0.0) for service in services]
+        # хеширование и очередь к пулу — раздельно: рост второго значит, что не хватает воркеров
+        instrumentation.record("hash", sum(services))
+        instrumentation.record("hash_wait", sum(waits))
+        with self._lock:
+            self._in_flight -= count
+            self._completed += count
+            self._wait_total += sum(waits)
+            self._wait_max = max([self._wait_max, *waits])
+            self._service_total += sum(services)
+        for _ in range(count):
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            completed = self._completed
+            return {
+                "backend": self.backend,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self._in_flight,
+                "queue_depth": max(self._in_flight - self.workers, 0),
+                "max_in_flight": self._max_in_flight,
+                "completed": completed,
+                "rejected": self._rejected,
+                "wait_ms_avg": (self._wait_total / completed * 1000) if completed else 0.0,
+                "wait_ms_max": self._wait_max * 1000,
+                "hash_ms_avg": (self._service_total / completed * 1000) if completed else 0.0,
+            }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                conf = {**DEFAULTS, **getattr(settings, "PASSWORD_HASHING", {})}
+                _pool = HashingPool(
+                    backend=conf["BACKEND"],
+                    workers=conf["WORKERS"],
+                    queue_size=conf["QUEUE_SIZE"],
+                    retry_after=conf["RETRY_AFTER"],
+                )
+    return _pool
+
+
+@receiver(setting_changed)
+def reset_pool(*, setting, **kwargs):
+    global _pool, _shared_bulk_executor
+    if setting not in ("PASSWORD_HASHING", "PASSWORD_HASHERS"):
+        return
+    with _pool_lock:
+        pool, _pool = _pool, None
+        executor, _shared_bulk_executor = _shared_bulk_executor, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def make_password(password):
+    """Аналог django make_password, но через пул"""
+    if password is None:
+        # непригодный пароль — это просто случайная строка, хешировать нечего
+        return hashers.make_password(None)
+    return get_pool().run(_make_password, password)
+
+
+def make_passwords(*passwords):
+    """Захешировать несколько паролей параллельно (регистрация: ученик + родитель)"""
+    if any(password is None for password in passwords):
+        return [make_password(password) for password in passwords]
+    return get_pool().run_many(_make_password, [(password,) for password in passwords])
+
+
+def check_password(password, encoded, setter=None):
+    """Аналог django check_password, но через пул. setter вызывается в текущем потоке"""
+    is_correct, must_update = get_pool().run(_verify_password, password, encoded)
+    if setter and is_correct and must_update:
+        setter(password)
+    return is_correct
+
+
+async def amake_password(password):
+    """make_password() для async-вью"""
+    if password is None:
+        return hashers.make_password(None)
+    return await get_pool().arun(_make_password, password)
+
+
+async def amake_passwords(*passwords):
+    if any(password is None for password in passwords):
+        return [await amake_password(password) for password in passwords]
+    return await get_pool().arun_many(_make_password, [(password,) for password in passwords])
+
+
+async def acheck_password(password, encoded):
+    """
+    check_password() для async-вью. Вместо setter возвращает (верен ли пароль,
+    нужно ли обновить хеш) — обновляет вызывающий (User.acheck_password)
+    """
+    return await get_pool().arun(_verify_password, password, encoded)
+
+
+def bulk_executor(workers=None):
+    """
+    Отдельный пул процессов для массового хеширования (импорт абитуриентов),
+    чтобы не занимать пул, которым пользуются запросы. Для manage.py-команды:
+    процесс свой, пул создаётся на один импорт
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_process_worker,
+        initargs=(os.environ.get("DJANGO_SETTINGS_MODULE"),),
+    )
+
+
+_shared_bulk_executor = None
+_bulk_import_lock = threading.Lock()
+
+
+@contextmanager
+def shared_bulk_executor():
+    """
+    Пул импорта внутри веб-процесса: один на процесс, BULK_WORKERS процессов,
+    создаётся при первом импорте и дальше переиспользуется — воркер gunicorn
+    не форкается на каждый запрос. Импорт в процессе идёт только один:
+    пока он не закончился, следующий получает BulkImportBusy (409)
+    """
+    global _shared_bulk_executor
+    if not _bulk_import_lock.acquire(blocking=False):
+        raise BulkImportBusy()
+    try:
+        with _pool_lock:
+            if _shared_bulk_executor is None:
+                conf = {**DEFAULTS, **getattr(settings, "PASSWORD_HASHING", {})}
+                _shared_bulk_executor = bulk_executor(conf["BULK_WORKERS"])
+            executor = _shared_bulk_executor
+        yield executor
+    finally:
+        _bulk_import_lock.release()
+
+
+def bulk_make_passwords(executor, passwords):
+    return list(executor.map(_make_password, passwords, chunksize=16))
+
+
+def stats():
+    return get_pool().stats()
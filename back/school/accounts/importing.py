@@ -0,0 +1,140 @@
+# accounts/importing.py
+"""
+Массовый импорт абитуриентов из CSV/JSONL.
+
+Файл читается построчно и обрабатывается пачками по chunk_size строк:
+проверка правилами RegisterSerializer, один SELECT на пачку для занятых email,
+хеширование паролей в пуле процессов и bulk_create. В памяти держится только
+текущая пачка и первые max_errors ошибок (счётчик failed — по всем строкам).
+"""
+import csv
+import json
+from contextlib import nullcontext
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+
+from . import hashing
+from .serializers import EMAIL_TAKEN_MESSAGE, RegisterSerializer
+
+User = get_user_model()
+
+FORMATS = ("csv", "jsonl")
+
+
+def detect_format(filename):
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return None
+
+
+def iter_records(lines, fmt):
+    """
+    lines — итерируемое строк (открытый текстовый файл и т.п.).
+    Отдаёт пары (номер строки, dict); для нечитаемой строки вместо dict — None.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_no, record if isinstance(record, dict) else None
+    else:
+        raise ValueError(f"Неизвестный формат импорта: {fmt!r}")
+
+
+class ApplicantImporter:
+    def __init__(self, chunk_size=500, processes=None, executor=None, max_errors=1000):
+        """executor — готовый пул процессов (не закрывается); без него создаётся свой на processes"""
+        self.chunk_size = chunk_size
+        self.processes = processes
+        self.executor = executor
+        self.max_errors = max_errors
+        self.report = {"created": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+    def run(self, records):
+        records = iter(records)
+        if self.executor is not None:
+            executor_context = nullcontext(self.executor)
+        else:
+            executor_context = hashing.bulk_executor(self.processes)
+        with executor_context as executor:
+            while True:
+                chunk = list(islice(records, self.chunk_size))
+                if not chunk:
+                    break
+                self._import_chunk(chunk, executor)
+        return self.report
+
+    def _fail(self, line, errors):
+        self.report["failed"] += 1
+        if self.max_errors is not None and len(self.report["errors"]) >= self.max_errors:
+            self.report["errors_truncated"] = True
+            return
+        self.report["errors"].append({"line": line, "errors": errors})
+
+    def _import_chunk(self, chunk, executor):
+        valid = []
+        seen = set()
+        for line, record in chunk:
+            if record is None:
+                self._fail(line, {"non_field_errors": ["Не удалось разобрать строку"]})
+                continue
+            ser = RegisterSerializer(data=record)
+            if not ser.is_valid():
+                self._fail(line, ser.errors)
+                continue
+            email = ser.validated_data["email"].lower()
+            if email in seen:
+                self._fail(line, {"email": ["Email повторяется в файле"]})
+                continue
+            seen.add(email)
+            valid.append((line, ser.validated_data))
+
+        taken = set(User.objects.filter(email__in=seen).values_list("email", flat=True))
+        rows = []
+        for line, data in valid:
+            if data["email"].lower() in taken:
+                self._fail(line, {"email": [EMAIL_TAKEN_MESSAGE]})
+            else:
+                rows.append((line, data))
+        if not rows:
+            return
+
+        passwords = []
+        for _, data in rows:
+            passwords += [data["password"], data["parent_password"]]
+        hashes = iter(hashing.bulk_make_passwords(executor, passwords))
+
+        users = []
+        for _, data in rows:
+            user = RegisterSerializer.build_user(data)
+            user.password = next(hashes)
+            user.parent_password_hash = next(hashes)
+            users.append(user)
+
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            self.report["created"] += len(users)
+        except IntegrityError:
+            # email заняли между SELECT и INSERT — досохраняем пачку по одному
+            for (line, _), user in zip(rows, users):
+                user.pk = None
+                try:
+                    user.insert()
+                    self.report["created"] += 1
+                except IntegrityError:
+                    self._fail(line, {"email": [EMAIL_TAKEN_MESSAGE]})
@@ -0,0 +1,252 @@
+# accounts/instrumentation.py
+"""
+Метрики запросов: время и число SQL-запросов, время хеширования паролей
+(отдельно — ожидание очереди пула), сериализации — по каждому view, в виде
+гистограмм Prometheus (/metrics).
+
+Во время запроса RequestMetricsMiddleware кладёт в contextvar объект-накопитель;
+хуки (execute_wrapper на каждом соединении с БД, пул хеширования,
+TimedSerializerMixin) добавляют в него время. Если метрики выключены
+(settings.METRICS["ENABLED"] = False), middleware не подключается, а хуки
+сводятся к чтению пустого contextvar.
+
+Метрики живут в памяти процесса: при нескольких воркерах gunicorn каждый
+отдаёт свои.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULTS = {
+    "ENABLED": False,
+    "ALLOWED_IPS": ["127.0.0.1", "::1"],
+    "TOKEN": "",
+}
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "METRICS", {})}
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, label="view"):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label = label
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            if index < len(self.buckets):
+                series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, series in sorted(self._series.items()):
+                label = f'{self.label}="{_escape(label_value)}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series["count"]}')
+                lines.append(f"{self.name}_sum{{{label}}} {series['sum']}")
+                lines.append(f"{self.name}_count{{{label}}} {series['count']}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram("school_request_duration_seconds", "Время обработки запроса", TIME_BUCKETS)
+DB_SECONDS = Histogram("school_request_db_seconds", "Время SQL-запросов за запрос", TIME_BUCKETS)
+QUERIES = Histogram("school_request_queries", "Число SQL-запросов за запрос", QUERY_BUCKETS)
+HASH_SECONDS = Histogram("school_request_hash_seconds", "Время хеширования паролей за запрос", TIME_BUCKETS)
+HASH_WAIT_SECONDS = Histogram(
+    "school_request_hash_wait_seconds", "Ожидание пула хеширования за запрос", TIME_BUCKETS,
+)
+SERIALIZER_SECONDS = Histogram("school_request_serializer_seconds", "Время сериализации за запрос", TIME_BUCKETS)
+HISTOGRAMS = (REQUEST_SECONDS, DB_SECONDS, QUERIES, HASH_SECONDS, HASH_WAIT_SECONDS, SERIALIZER_SECONDS)
+
+
+class RequestMetrics:
+    __slots__ = ("db", "queries", "hash", "hash_wait", "serializer")
+
+    def __init__(self):
+        self.db = 0.0
+        self.queries = 0
+        self.hash = 0.0
+        self.hash_wait = 0.0
+        self.serializer = 0.0
+
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+@contextmanager
+def collect():
+    """Накопитель без записи в гистограммы: сколько SQL/хеширования ушло на блок кода (бенчмарки)"""
+    metrics, token = start_request()
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def finish_request(token, metrics, view, elapsed):
+    _current.reset(token)
+    REQUEST_SECONDS.observe(view, elapsed)
+    DB_SECONDS.observe(view, metrics.db)
+    QUERIES.observe(view, metrics.queries)
+    HASH_SECONDS.observe(view, metrics.hash)
+    HASH_WAIT_SECONDS.observe(view, metrics.hash_wait)
+    SERIALIZER_SECONDS.observe(view, metrics.serializer)
+
+
+def record(kind, seconds):
+    """Хук: добавить время (kind = "hash" | "hash_wait" | "serializer") к текущему запросу, если он измеряется"""
+    metrics = _current.get()
+    if metrics is not None:
+        setattr(metrics, kind, getattr(metrics, kind) + seconds)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """Время и число SQL-запросов; висит на каждом соединении (см. instrument_connection)"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db += time.perf_counter() - started
+        metrics.queries += 1
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # на соединение навсегда, а не на время запроса: async-вью выполняют ORM
+    # в других потоках, и там своё соединение — contextvar доходит и туда
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, db_execute_wrapper)
+
+
+class TimedSerializerMixin:
+    """Примешивается к сериализаторам: время to_representation/валидации идёт в метрики"""
+
+    def to_representation(self, instance):
+        if _current.get() is None:
+            return super().to_representation(instance)
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            record("serializer", time.perf_counter() - started)
+
+    def run_validation(self, data):
+        if _current.get() is None:
+            return super().run_validation(data)
+        started = time.perf_counter()
+        try:
+            return super().run_validation(data)
+        finally:
+            record("serializer", time.perf_counter() - started)
+
+
+def _gauges():
+    # состояние подсистем accounts на момент запроса /metrics
+    from . import audit, dbstats, hashing, jwt_cache, revocation, throttling
+
+    pool = hashing.stats()
+    throttle = throttling.get_login_throttle().stats()
+    revocations = revocation.get_revocation_list().stats()
+    databases = dbstats.stats()
+    audit_log = audit.stats()
+    auth_events = audit.counts()
+    token_cache = jwt_cache.stats()
+    return [
+        ("school_hashing_in_flight", "gauge", "Задач в пуле хеширования", {}, pool["in_flight"]),
+        ("school_hashing_queue_depth", "gauge", "Задач в очереди пула хеширования", {}, pool["queue_depth"]),
+        ("school_hashing_completed_total", "counter", "Выполнено хеширований", {}, pool["completed"]),
+        ("school_hashing_rejected_total", "counter", "Отказов из-за переполнения пула", {}, pool["rejected"]),
+        ("school_hashing_wait_seconds_max", "gauge", "Максимальное ожидание в очереди", {},
+         pool["wait_ms_max"] / 1000),
+        ("school_audit_queued", "gauge", "Событий журнала входов в очереди", {}, audit_log["queued"]),
+        ("school_audit_written_total", "counter", "Записано событий журнала входов", {}, audit_log["written"]),
+        ("school_audit_dropped_total", "counter", "Отброшено событий журнала (очередь полна)", {},
+         audit_log["dropped"]),
+        ("school_audit_failed_total", "counter", "Событий журнала, не записанных из-за ошибки БД", {},
+         audit_log["failed"]),
+        *[
+            ("school_auth_events_total", "counter", "Регистраций, входов, обновлений токенов и выходов",
+             {"kind": kind, "result": "ok" if success else "fail"}, count)
+            for (kind, success), count in sorted(auth_events.items())
+        ],
+        ("school_login_allowed_total", "counter", "Пропущенных попыток входа", {}, throttle["allowed"]),
+        *[
+            ("school_login_throttled_total", "counter", "Отклонённых попыток входа", {"scope": scope}, count)
+            for scope, count in throttle["rejected"].items()
+        ],
+        *[
+            ("school_token_revocation_checks_total", "counter", "Проверок отзыва токенов",
+             {"result": result}, count)
+            for result, count in revocations.items() if result in ("bloom_negative", "lru", "db")
+        ],
+        *[
+            ("school_jwt_cache_lookups_total", "counter", "Поисков в кеше проверенных токенов",
+             {"result": result}, token_cache[result])
+            for result in ("hits", "misses") if token_cache
+        ],
+        *[
+            (name, kind, help_text, {"database": alias}, db[key])
+            for name, kind, help_text, key in (
+                ("school_db_connections_opened_total", "counter", "Открыто соединений с БД", "opened"),
+                ("school_db_requests_reused_total", "counter", "Запросов на уже открытом соединении",
+                 "requests_reused"),
+                ("school_db_connection_age_seconds_max", "gauge", "Возраст самого старого соединения",
+                 "age_s_max"),
+            )
+            for alias, db in databases.items()
+        ],
+    ]
+
+
+def render_prometheus():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    described = set()
+    for name, kind, help_text, labels, value in _gauges():
+        if name not in described:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            described.add(name)
+        label = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+        lines.append(f"{name}{{{label}}} {value}" if label else f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,127 @@
+# accounts/jwt_cache.py
+"""
+Кеш уже проверенных access-токенов.
+
+Фронтенд шлёт один и тот же access-токен сотни раз за его жизнь, и каждый раз
+simplejwt заново разбирает его и проверяет подпись (а JWTAuthentication ещё и
+читает пользователя из БД). Здесь в каждом процессе держится LRU: ключ —
+SHA-256 от класса аутентификации и токена, значение — проверенный токен и пользователь, запись живёт
+до "exp" токена. Повторный запрос с тем же токеном обходится без криптографии
+и без чтения пользователя.
+
+Кешируются только токены с версией (claim "ver"): при попадании версия всё
+равно сверяется с tokens.get_token_version() (обычно — чтение из кеша), так что
+смена роли/пароля, отключение и logout-версии отзывают токен и здесь.
+
+Настройки (settings.JWT_AUTH_CACHE):
+    ENABLED — включён ли кеш
+    SIZE    — сколько токенов помнить
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULTS = {
+    "ENABLED": True,
+    "SIZE": 10_000,
+}
+
+
+class VerifiedTokenCache:
+    def __init__(self, size=10_000):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "rejected": 0}
+
+    @staticmethod
+    def key(raw_token, scope=""):
+        """
+        scope — у каждого класса аутентификации свой: один и тот же токен даёт
+        User в одном классе и TokenUser в другом, записи не должны пересекаться
+        """
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return hashlib.sha256(f"{scope}:".encode() + raw_token).digest()
+
+    def get(self, key):
+        """(validated_token, user) или None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            expires_at, validated_token, user = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return validated_token, user
+
+    def put(self, key, validated_token, user):
+        with self._lock:
+            self._entries[key] = (validated_token["exp"], validated_token, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.counters["evicted"] += 1
+
+    def discard(self, key):
+        """Токен больше не принимается (устарела версия)"""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.counters["rejected"] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                "items": len(self._entries),
+                "size": self.size,
+                **self.counters,
+                "hit_ratio": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "JWT_AUTH_CACHE", {})}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """None — кеш выключен"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                conf = get_config()
+                _cache = VerifiedTokenCache(size=conf["SIZE"]) if conf["ENABLED"] else False
+    return _cache or None
+
+
+def reset():
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+@receiver(setting_changed)
+def reset_token_cache(*, setting, **kwargs):
+    if setting == "JWT_AUTH_CACHE":
+        reset()
+
+
+def stats():
+    token_cache = get_token_cache()
+    return token_cache.stats() if token_cache is not None else {}
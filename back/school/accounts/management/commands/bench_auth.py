@@ -0,0 +1,246 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from accounts import benchmarks
+from accounts.api_views import issue_tokens_for_user
+from accounts.middleware import PagesOnlyMixin
+from accounts.models import User
+
+PASSWORD = 'Bench-Pass-2931'
+
+
+def _register_payload(email):
+    return {
+        'email': email,
+        'phone': '+70000000000',
+        'student_full_name': 'Бенчмарк Ученик',
+        'parent_full_name': 'Бенчмарк Родитель',
+        'password': PASSWORD,
+        'parent_password': PASSWORD,
+    }
+
+
+def _create_user(email):
+    return User.objects.create_user(email=email, username=email, password=PASSWORD)
+
+
+def _api_register(client, i, state):
+    return client.post(reverse('accounts_api:register'),
+                       _register_payload(f'api-reg-{i}@bench.local'), content_type='application/json')
+
+
+def _api_login(client, i, user):
+    return client.post(reverse('accounts_api:login'),
+                       {'email': user.email, 'password': PASSWORD}, content_type='application/json')
+
+
+def _api_me(client, i, auth):
+    return client.get(reverse('accounts_api:me'), HTTP_AUTHORIZATION=auth)
+
+
+def _api_refresh(client, i, user):
+    # refresh одноразовый — выдаём свой на каждый запрос (подпись токена, без БД)
+    refresh = issue_tokens_for_user(user)['refresh']
+    return client.post(reverse('accounts_api:refresh'), {'refresh': refresh}, content_type='application/json')
+
+
+async def _aapi_register(client, i, state):
+    return await client.post(reverse('accounts_async_api:register'),
+                             _register_payload(f'async-reg-{i}@bench.local'), content_type='application/json')
+
+
+async def _aapi_login(client, i, user):
+    return await client.post(reverse('accounts_async_api:login'),
+                             {'email': user.email, 'password': PASSWORD}, content_type='application/json')
+
+
+async def _aapi_me(client, i, auth):
+    # AsyncClient принимает заголовки без префикса HTTP_
+    return await client.get(reverse('accounts_async_api:me'), AUTHORIZATION=auth)
+
+
+def _mixed_state():
+    user = _create_user('api-mixed@bench.local')
+    return user, 'Bearer ' + issue_tokens_for_user(user)['access']
+
+
+# каждый MIXED_LOGIN_EVERY-й запрос — вход (полный хеш пароля), остальные — /me:
+# видно, ждут ли дешёвые запросы, пока считаются хеши
+MIXED_LOGIN_EVERY = 10
+
+
+def _api_mixed(client, i, state):
+    user, auth = state
+    if i % MIXED_LOGIN_EVERY == 0:
+        return _api_login(client, i, user)
+    return _api_me(client, i, auth)
+
+
+async def _aapi_mixed(client, i, state):
+    user, auth = state
+    if i % MIXED_LOGIN_EVERY == 0:
+        return await _aapi_login(client, i, user)
+    return await _aapi_me(client, i, auth)
+
+
+def _form_register(client, i, state):
+    client.cookies.clear()
+    return client.post(reverse('accounts:register'), _register_payload(f'form-reg-{i}@bench.local'))
+
+
+def _form_login(client, i, user):
+    client.cookies.clear()
+    return client.post(reverse('accounts:login'), {'email': user.email, 'password': PASSWORD})
+
+
+def _form_logout(client, i, state):
+    return client.get(reverse('accounts:logout'))
+
+
+def _logged_in_session():
+    # одна сессия на всех клиентов: каждый запрос — чтение сессии и пользователя
+    user = _create_user('form-session@bench.local')
+    client = Client()
+    client.force_login(user)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+def _form_authenticated_get(client, i, session):
+    client.cookies[settings.SESSION_COOKIE_NAME] = session
+    return client.get(reverse('accounts:login'))
+
+
+MESSAGE_STORAGES = {
+    'cookie': 'django.contrib.messages.storage.cookie.CookieStorage',
+    'fallback': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    'session': 'django.contrib.messages.storage.session.SessionStorage',
+}
+
+
+def _stock_middleware():
+    """MIDDLEWARE, где Page*Middleware заменены исходными классами Django — все слои на каждом запросе"""
+    result = []
+    for path in settings.MIDDLEWARE:
+        cls = import_string(path)
+        if issubclass(cls, PagesOnlyMixin):
+            cls = next(base for base in cls.__mro__ if base.__module__.startswith('django.'))
+            path = f'{cls.__module__}.{cls.__qualname__}'
+        result.append(path)
+    return result
+
+
+SCENARIOS = {
+    scenario.name: scenario for scenario in [
+        benchmarks.Scenario('api_register', _api_register, arequest=_aapi_register),
+        benchmarks.Scenario('api_login', _api_login, lambda: _create_user('api-login@bench.local'),
+                            arequest=_aapi_login),
+        benchmarks.Scenario('api_me', _api_me, lambda: 'Bearer ' + issue_tokens_for_user(
+            _create_user('api-me@bench.local'))['access'], arequest=_aapi_me),
+        benchmarks.Scenario('api_refresh', _api_refresh, lambda: _create_user('api-refresh@bench.local')),
+        benchmarks.Scenario('api_mixed', _api_mixed, _mixed_state, arequest=_aapi_mixed),
+        benchmarks.Scenario('form_register', _form_register),
+        benchmarks.Scenario('form_login', _form_login, lambda: _create_user('form-login@bench.local')),
+        benchmarks.Scenario('form_logout', _form_logout),
+        benchmarks.Scenario('form_authenticated_get', _form_authenticated_get, _logged_in_session),
+    ]
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон эндпоинтов авторизации на временной БД: RPS, p50/p95/p99, '
+        'SQL-запросов на запрос. Офлайн: SCHOOL_DB=sqlite python manage.py bench_auth'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                            help='Можно указать несколько раз; по умолчанию — все')
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на сценарий')
+        parser.add_argument('--concurrency', type=int, default=8, help='Параллельных клиентов')
+        parser.add_argument('--interface', choices=('wsgi', 'asgi'), default='wsgi',
+                            help='asgi — async-вью (/api/async/) через ASGI-обработчик в цикле событий; '
+                                 'сценарии form_* только для wsgi')
+        parser.add_argument('--fast-hashers', action='store_true',
+                            help='MD5 вместо PBKDF2 — чтобы увидеть стоимость всего, кроме хеша')
+        parser.add_argument('--session-mode', choices=sorted(settings.SESSION_ENGINES),
+                            help='Переопределить SESSION_MODE на время прогона')
+        parser.add_argument('--message-storage', choices=sorted(MESSAGE_STORAGES),
+                            help='Переопределить MESSAGE_STORAGE на время прогона')
+        parser.add_argument('--conn-max-age', type=int,
+                            help='CONN_MAX_AGE на время прогона (0 — новое соединение на каждый запрос)')
+        parser.add_argument('--stock-middleware', action='store_true',
+                            help='Сессии, CSRF, auth и сообщения и на /api/ — как без Page*Middleware')
+        parser.add_argument('--output', help='Куда сохранить JSON (по умолчанию bench_results/auth_<время>.json)')
+        parser.add_argument('--compare', help='JSON прошлого прогона для сравнения')
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    previous = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Не удалось прочитать {options["compare"]}: {exc}')
+
+        # вход много раз под одним email: ограничитель попыток меряем не здесь
+        overrides = {'LOGIN_THROTTLE': {**getattr(settings, 'LOGIN_THROTTLE', {}),
+                                        'IP_LIMIT': 10 ** 9, 'EMAIL_LIMIT': 10 ** 9}}
+        if options['fast_hashers']:
+            overrides['PASSWORD_HASHERS'] = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        if options['session_mode']:
+            overrides['SESSION_ENGINE'] = settings.SESSION_ENGINES[options['session_mode']]
+        if options['message_storage']:
+            overrides['MESSAGE_STORAGE'] = MESSAGE_STORAGES[options['message_storage']]
+        if options['stock_middleware']:
+            overrides['MIDDLEWARE'] = _stock_middleware()
+
+        results = {'environment': benchmarks.environment(), 'scenarios': {}}
+        if options['conn_max_age'] is not None:
+            for alias in connections:
+                connections.settings[alias]['CONN_MAX_AGE'] = options['conn_max_age']
+        with benchmarks.BenchmarkDatabase(), override_settings(**overrides):
+            results['environment'].update(
+                interface=options['interface'],
+                fast_hashers=options['fast_hashers'],
+                session_engine=settings.SESSION_ENGINE,
+                message_storage=settings.MESSAGE_STORAGE,
+                stock_middleware=options['stock_middleware'],
+                conn_max_age=connections.settings['default'].get('CONN_MAX_AGE', 0),
+            )
+            for name in options['scenario'] or SCENARIOS:
+                scenario = SCENARIOS[name]
+                if options['interface'] == 'asgi':
+                    if scenario.arequest is None:
+                        self.stdout.write(f"{name:<24} пропущен: нет async-варианта")
+                        continue
+                    result = benchmarks.run_scenario_async(
+                        scenario, options['requests'], options['concurrency'],
+                    )
+                else:
+                    result = benchmarks.run_scenario(scenario, options['requests'], options['concurrency'])
+                results['scenarios'][name] = result
+                latency = result['latency_ms']
+                self.stdout.write(
+                    f"{name:<24} {result['throughput_rps']:>9.1f} rps  "
+                    f"p50 {latency['p50']:>8.2f}  p95 {latency['p95']:>8.2f}  p99 {latency['p99']:>8.2f} ms  "
+                    f"{result['queries_per_request']:>5.1f} q/req  errors {result['errors']}"
+                )
+
+        output = options['output'] or os.path.join(
+            'bench_results', f"auth_{timezone.now():%Y%m%d_%H%M%S}.json",
+        )
+        benchmarks.save(results, output)
+        self.stdout.write(self.style.SUCCESS(f'Результаты: {output}'))
+
+        if previous is not None:
+            for line in benchmarks.compare(previous, results):
+                self.stdout.write(line)
@@ -0,0 +1,96 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.password_validation import get_password_validators
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+
+from accounts import password_validation
+from accounts.models import User
+
+# AUTH_PASSWORD_VALIDATORS, но со стандартными классами Django (с теми же атрибутами для сходства)
+STOCK_NAMES = {
+    'accounts.password_validation.UserAttributeSimilarityValidator':
+        'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    'accounts.password_validation.CommonPasswordValidator':
+        'django.contrib.auth.password_validation.CommonPasswordValidator',
+}
+
+SURNAMES = ['Иванов', 'Петров', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Lebedev', 'Kozlov']
+NAMES = ['Иван', 'Пётр', 'Олег', 'Анна', 'Мария', 'Dmitry', 'Sergey', 'Elena']
+
+
+def _stock(conf):
+    if conf['NAME'] not in STOCK_NAMES:
+        return conf
+    conf = {**conf, 'NAME': STOCK_NAMES[conf['NAME']]}
+    if conf['NAME'].endswith('UserAttributeSimilarityValidator'):
+        attributes = password_validation.UserAttributeSimilarityValidator.DEFAULT_USER_ATTRIBUTES
+        conf['OPTIONS'] = {'user_attributes': attributes, **conf.get('OPTIONS', {})}
+    return conf
+
+
+def _registrations(count, seed):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        surname, name = rng.choice(SURNAMES), rng.choice(NAMES)
+        email = f'{name.lower()}.{surname.lower()}{i}@example.com'
+        password = rng.choice([
+            f'{rng.getrandbits(40):x}-Pw',   # обычный
+            f'{surname.lower()}{i}',         # похож на email
+            'qwerty123',                     # частый
+        ])
+        user = User(email=email, username=email, student_full_name=f'{surname} {name}',
+                    parent_full_name=f'{surname}а {rng.choice(NAMES)}')
+        rows.append((password, user))
+    return rows
+
+
+def _validate_all(validators, rows):
+    rejected = 0
+    for password, user in rows:
+        for validator in validators:
+            try:
+                validator.validate(password, user)
+            except ValidationError:
+                rejected += 1
+    return rejected
+
+
+class Command(BaseCommand):
+    help = (
+        'Микробенчмарк проверки пароля при регистрации: AUTH_PASSWORD_VALIDATORS '
+        'против тех же правил на стандартных классах Django'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registrations', type=int, default=2000, help='Регистраций в замере')
+        parser.add_argument('--rounds', type=int, default=5, help='Замеров (берётся медиана)')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        configs = {
+            'django': [_stock(conf) for conf in settings.AUTH_PASSWORD_VALIDATORS],
+            'accounts': settings.AUTH_PASSWORD_VALIDATORS,
+        }
+        rows = _registrations(options['registrations'], options['seed'])
+        for label, config in configs.items():
+            # холодный старт: сборка валидаторов со списком частых паролей
+            password_validation.load_password_list.cache_clear()
+            started = time.perf_counter()
+            validators = get_password_validators(config)
+            load_ms = (time.perf_counter() - started) * 1000
+
+            samples, rejected = [], 0
+            for _ in range(options['rounds']):
+                started = time.perf_counter()
+                rejected = _validate_all(validators, rows)
+                samples.append(time.perf_counter() - started)
+            per_registration_us = statistics.median(samples) / len(rows) * 1e6
+            self.stdout.write(
+                f'{label:<10} загрузка {load_ms:>7.2f} мс  '
+                f'{per_registration_us:>8.1f} мкс на регистрацию  отклонено {rejected}/{len(rows)}'
+            )
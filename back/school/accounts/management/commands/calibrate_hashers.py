@@ -0,0 +1,82 @@
+import statistics
+import time
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, ScryptPasswordHasher
+from django.core.management.base import BaseCommand
+
+from accounts.hashers import CalibratedPBKDF2PasswordHasher, CalibratedScryptPasswordHasher
+
+PASSWORD = 'calibration-Pass-2931'
+
+
+def measure(encode, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        encode()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Подобрать параметры хешеров паролей под целевое время одного хеша на этом сервере. '
+        'Печатает переменные окружения для settings.py. Ниже значений Django по умолчанию '
+        'не советует: если цель при них недостижима — предупреждение и значение Django'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=250,
+                            help='Желаемое время одного хеша, мс')
+        parser.add_argument('--algorithm', choices=['pbkdf2', 'scrypt', 'all'], default='all')
+        parser.add_argument('--rounds', type=int, default=5, help='Замеров на точку')
+
+    def handle(self, *args, **options):
+        target, rounds = options['target_ms'], options['rounds']
+        env = {}
+        if options['algorithm'] in ('pbkdf2', 'all'):
+            env['PASSWORD_PBKDF2_ITERATIONS'] = self.calibrate_pbkdf2(target, rounds)
+        if options['algorithm'] in ('scrypt', 'all'):
+            env['PASSWORD_SCRYPT_WORK_FACTOR'] = self.calibrate_scrypt(target, rounds)
+
+        self.stdout.write('')
+        for name, value in env.items():
+            self.stdout.write(f'{name}={value}')
+
+    def calibrate_pbkdf2(self, target, rounds):
+        hasher = CalibratedPBKDF2PasswordHasher()
+        salt = hasher.salt()
+        probe = 100_000
+        probe_ms = measure(lambda: hasher.encode(PASSWORD, salt, probe), rounds)
+        # время PBKDF2 линейно по числу итераций
+        iterations = int(probe * target / probe_ms) // 10_000 * 10_000
+        floor = PBKDF2PasswordHasher.iterations
+        if iterations < floor:
+            self.warn_floor('pbkdf2_sha256', target, f'{floor} итераций')
+            iterations = floor
+        actual = measure(lambda: hasher.encode(PASSWORD, salt, iterations), rounds)
+        self.stdout.write(f'pbkdf2_sha256: {iterations} итераций -> {actual:.1f} мс')
+        return iterations
+
+    def calibrate_scrypt(self, target, rounds):
+        # n — степень двойки; берём наибольшую, которая укладывается в цель
+        hasher = CalibratedScryptPasswordHasher()
+        salt = hasher.salt()
+        floor = ScryptPasswordHasher.work_factor
+        best, n = floor, floor
+        while n <= 2 ** 20:
+            elapsed = measure(lambda: hasher.encode(PASSWORD, salt, n), rounds)
+            self.stdout.write(f'scrypt: n=2^{n.bit_length() - 1} -> {elapsed:.1f} мс')
+            if elapsed > target:
+                if n == floor:
+                    self.warn_floor('scrypt', target, f'n=2^{floor.bit_length() - 1}')
+                break
+            best = n
+            n *= 2
+        return best
+
+    def warn_floor(self, algorithm, target, floor):
+        self.stderr.write(self.style.WARNING(
+            f'{algorithm}: в {target:g} мс не уложиться даже при {floor} (значение Django по умолчанию); '
+            f'слабее не советуем — берём {floor}.'
+        ))
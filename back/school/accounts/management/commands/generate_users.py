@@ -0,0 +1,69 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from accounts import exporting, synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        'Создать N синтетических пользователей всех ролей для нагрузочных прогонов: '
+        'готовые хеши паролей, детерминированные данные, bulk_create пачками. '
+        'Пароли известны, поэтому без DEBUG команда работает только с --i-know'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help='Сколько пользователей создать')
+        parser.add_argument('--seed', type=int, default=0, help='Тот же seed — те же пользователи')
+        parser.add_argument('--start', type=int, default=0,
+                            help='С какого номера; чтобы добавить к прошлому прогону с тем же seed')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Строк в одной транзакции')
+        parser.add_argument('--days', type=int, default=365, help='Даты регистрации за столько дней')
+        parser.add_argument('--until', help='Последний день регистраций ГГГГ-ММ-ДД (по умолчанию — сегодня)')
+        parser.add_argument('--domain', default=synthetic.DOMAIN, help='Домен email')
+        parser.add_argument('--allow-superusers', action='store_true',
+                            help='Создавать и ADMIN (суперпользователи, без мест AdminSlot), MANAGER — с is_staff')
+        parser.add_argument('--i-know', action='store_true',
+                            help='Запустить без DEBUG: пользователи с известными паролями попадут в эту БД')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        if count < 1 or options['chunk_size'] < 1:
+            raise CommandError('count и --chunk-size должны быть положительными')
+        if options['days'] < 1:
+            raise CommandError('--days должно быть не меньше 1')
+        if not settings.DEBUG and not options['i_know']:
+            raise CommandError(
+                'DEBUG выключен — похоже на рабочую БД. У синтетических пользователей известные пароли; '
+                'если это действительно стенд для нагрузки, добавьте --i-know'
+            )
+        try:
+            until = exporting.parse_day(options['until'], '--until')
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        started = time.perf_counter()
+
+        def progress(created):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{created}/{count}  {created / elapsed:.0f} строк/с', ending='\r')
+
+        try:
+            created = synthetic.create_users(
+                count, seed=options['seed'], start=options['start'], chunk_size=options['chunk_size'],
+                progress=progress, until=until,
+                days=options['days'], domain=options['domain'], privileged=options['allow_superusers'],
+            )
+        except IntegrityError as exc:
+            raise CommandError(
+                f'Такие пользователи уже есть (seed {options["seed"]}): возьмите другой --seed '
+                f'или --start после уже созданных. {exc}'
+            )
+        elapsed = time.perf_counter() - started
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {created} за {elapsed:.1f} с; пароли: '
+            f'{synthetic.PASSWORD_TEMPLATE.format(f"<номер % {synthetic.PASSWORD_POOL}>")}'
+        ))
@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.importing import FORMATS, ApplicantImporter, detect_format, iter_records
+
+
+class Command(BaseCommand):
+    help = 'Массовый импорт абитуриентов из CSV/JSONL (поля как у /api/auth/register/)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу .csv или .jsonl')
+        parser.add_argument('--format', choices=FORMATS, help='По умолчанию — по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Процессов для хеширования (по умолчанию — число CPU)')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        if fmt is None:
+            raise CommandError('Не удалось определить формат, укажите --format')
+
+        # ошибки печатаются все: процесс свой, отвечать по сети не нужно
+        importer = ApplicantImporter(
+            chunk_size=options['chunk_size'], processes=options['processes'], max_errors=None,
+        )
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as f:
+                report = importer.run(iter_records(f, fmt))
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for error in report['errors']:
+            self.stderr.write(json.dumps(error, ensure_ascii=False))
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано: {report['created']}, с ошибками: {report['failed']}"
+        ))
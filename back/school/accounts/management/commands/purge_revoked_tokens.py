@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = 'Удалить истёкшие отозванные токены небольшими пачками, не блокируя таблицу'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.05,
+                            help='Пауза между пачками, секунды')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = RevokedToken.objects.filter(expires_at__lte=now).order_by('id')
+        deleted = 0
+        while True:
+            # сначала выбираем id, потом удаляем по первичному ключу — короткие блокировки
+            ids = list(expired.values_list('id', flat=True)[:options['chunk_size']])
+            if not ids:
+                break
+            deleted += RevokedToken.objects.filter(id__in=ids).delete()[0]
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей: {deleted}'))
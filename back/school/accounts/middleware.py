@@ -0,0 +1,157 @@
+# accounts/middleware.py
+# Все middleware умеют и sync, и async: иначе Django переводит async-вью
+# (accounts/async_api_views.py) в поток на всю цепочку.
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.deprecation import MiddlewareMixin
+
+from . import instrumentation, routing
+from .hashing import HashingPoolSaturated
+
+
+def is_api_request(request):
+    return request.path_info.startswith(tuple(getattr(settings, 'API_PATH_PREFIXES', ('/api/',))))
+
+
+class PagesOnlyMixin:
+    """
+    Слой нужен только серверным страницам (accounts/urls.py, админка): сессии,
+    CSRF форм, flash-сообщения. API авторизуется JWT, поэтому на /api/
+    (settings.API_PATH_PREFIXES) запрос сразу идёт дальше по цепочке — без
+    чтения cookie сессии, ленивого request.user и, под ASGI, без sync_to_async
+    на process_request/process_response.
+    Подклассы остаются подклассами классов Django — проверки админки их видят.
+    """
+
+    def __call__(self, request):
+        if is_api_request(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class PageSessionMiddleware(PagesOnlyMixin, SessionMiddleware):
+    pass
+
+
+class PageCsrfViewMiddleware(PagesOnlyMixin, CsrfViewMiddleware):
+    # process_view обработчик вызывает сам, мимо __call__
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_api_request(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class PageAuthenticationMiddleware(PagesOnlyMixin, AuthenticationMiddleware):
+    pass
+
+
+class PageMessageMiddleware(PagesOnlyMixin, MessageMiddleware):
+    pass
+
+
+class HashingBackpressureMiddleware(MiddlewareMixin):
+    """
+    Для серверных страниц (формы): переполненный пул хеширования -> 503 + Retry-After.
+    В API это делает обработчик исключений DRF.
+    """
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingPoolSaturated):
+            return None
+        response = HttpResponse(
+            str(exception.detail), status=exception.status_code,
+            content_type='text/plain; charset=utf-8',
+        )
+        response['Retry-After'] = str(exception.wait)
+        return response
+
+
+class RequestMetricsMiddleware:
+    """
+    Время запроса, SQL, хеширования и сериализации по каждому view (accounts/instrumentation.py).
+    При выключенных метриках (settings.METRICS["ENABLED"]) не подключается вовсе.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not instrumentation.get_config()['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = instrumentation.start_request()
+        started = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self._finish(request, metrics, token, started)
+
+    async def __acall__(self, request):
+        metrics, token = instrumentation.start_request()
+        started = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            self._finish(request, metrics, token, started)
+
+    @staticmethod
+    def _finish(request, metrics, token, started):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        instrumentation.finish_request(token, metrics, view, time.perf_counter() - started)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Границы запроса для роутера реплик (accounts/routing.py): небезопасные методы
+    сразу читают из основной БД, как и пользователи сессий с недавней записью.
+    Ставится после SessionMiddleware и до AuthenticationMiddleware; на /api/
+    сессии нет — там пользователя привязывает аутентификация JWT.
+    Без реплик (settings.DATABASE_ROUTING["REPLICAS"]) не подключается.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not routing.get_config()['REPLICAS']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _unsafe(request):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    @staticmethod
+    def _pin_session_user(request):
+        if hasattr(request, 'session') and settings.SESSION_COOKIE_NAME in request.COOKIES:
+            routing.pin_if_sticky(request.session.get(SESSION_KEY))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routing.request_scope(pinned=self._unsafe(request)):
+            self._pin_session_user(request)
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with routing.request_scope(pinned=self._unsafe(request)):
+            # чтение сессии и метки в кеше — синхронные; привязка вернётся в этот контекст
+            await sync_to_async(self._pin_session_user)(request)
+            return await self.get_response(request)
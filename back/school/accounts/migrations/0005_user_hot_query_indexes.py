@@ -0,0 +1,44 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:00
+
+import accounts.models
+from django.db import migrations, models
+import django.db.models.functions.text
+from django.db.models import F
+from django.db.models.functions import Lower
+
+
+def lowercase_emails(apps, schema_editor):
+    # перед уникальным индексом по LOWER(email) приводим старые записи к нижнему регистру
+    User = apps.get_model('accounts', 'User')
+    db_alias = schema_editor.connection.alias
+    mixed = User.objects.using(db_alias).annotate(email_lower=Lower('email')).exclude(email=F('email_lower'))
+    for user in mixed.only('id', 'email', 'username').iterator():
+        if user.username == user.email:
+            user.username = user.email.lower()
+        user.email = user.email.lower()
+        user.save(using=db_alias, update_fields=['email', 'username'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', accounts.models.UserManager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_superuser', 'email'], name='accounts_user_super_email_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='accounts_user_email_lower_uniq'),
+        ),
+    ]
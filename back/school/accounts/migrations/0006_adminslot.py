@@ -0,0 +1,45 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def assign_existing_admins(apps, schema_editor):
+    # уже повышенные админы из белого списка занимают места по порядку регистрации
+    User = apps.get_model('accounts', 'User')
+    AdminSlot = apps.get_model('accounts', 'AdminSlot')
+    db_alias = schema_editor.connection.alias
+    limit = getattr(settings, 'ADMIN_SEED_SLOTS', 2)
+    whitelist = [email.lower() for email in getattr(settings, 'ADMIN_SEED_EMAILS', [])]
+    admins = (
+        User.objects.using(db_alias)
+        .filter(email__in=whitelist, is_superuser=True)
+        .order_by('date_joined', 'id')[:limit]
+    )
+    AdminSlot.objects.using(db_alias).bulk_create(
+        AdminSlot(number=number, user=user) for number, user in enumerate(admins, 1)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_user_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdminSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField(unique=True, verbose_name='Номер места')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='admin_slot', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Место админа',
+                'verbose_name_plural': 'Места админов',
+            },
+        ),
+        migrations.RunPython(assign_existing_admins, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:17
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_adminslot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('REGISTER', 'Регистрация'), ('LOGIN', 'Вход'), ('ADMIN_LOGIN', 'Админ-вход'), ('LOGOUT', 'Выход')], max_length=20, verbose_name='Событие')),
+                ('success', models.BooleanField(default=True, verbose_name='Успешно')),
+                ('user_id', models.BigIntegerField(blank=True, db_index=True, null=True, verbose_name='ID пользователя')),
+                ('email', models.CharField(blank=True, max_length=254, verbose_name='Email')),
+                ('ip', models.GenericIPAddressField(blank=True, null=True, verbose_name='IP')),
+                ('user_agent', models.CharField(blank=True, max_length=255, verbose_name='User-Agent')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Когда')),
+            ],
+            options={
+                'verbose_name': 'Событие входа',
+                'verbose_name_plural': 'События входа',
+            },
+        ),
+    ]
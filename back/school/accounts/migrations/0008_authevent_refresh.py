@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_authevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='authevent',
+            name='kind',
+            field=models.CharField(choices=[('REGISTER', 'Регистрация'), ('LOGIN', 'Вход'), ('ADMIN_LOGIN', 'Админ-вход'), ('LOGOUT', 'Выход'), ('REFRESH', 'Обновление токенов')], max_length=20, verbose_name='Событие'),
+        ),
+    ]
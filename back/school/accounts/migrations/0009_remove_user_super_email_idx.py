@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 13:09
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_authevent_refresh'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='user',
+            name='accounts_user_super_email_idx',
+        ),
+    ]
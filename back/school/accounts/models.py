@@ -1,6 +1,20 @@
 # accounts/models.py
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
+from django.db import models, router, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from . import hashing, routing, tokens
+
+# email__lower=... -> LOWER(email) = ..., попадает в уникальный индекс по LOWER(email)
+models.EmailField.register_lookup(Lower)
+
+
+class UserManager(BaseUserManager):
+    def get_by_natural_key(self, username):
+        # username у нас всегда равен email — ищем без учёта регистра по индексу LOWER(email)
+        return self.get(email__lower=username.strip().lower())
+
 
 class User(AbstractUser):
     class Roles(models.TextChoices):
@@ -23,16 +37,183 @@ class User(AbstractUser):
         choices=Roles.choices,
         default=Roles.APPLICANT,
     )
+    # растёт при смене роли/прав/пароля — старые JWT перестают приниматься
+    token_version = models.PositiveIntegerField('Версия токенов', default=0, editable=False)
+
+    objects = UserManager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._token_snapshot = instance._token_state()
+        return instance
+
+    def _token_state(self):
+        # то, что зашито в access-токен, плюс активность
+        return tuple(self.__dict__.get(f) for f in (*tokens.CLAIM_FIELDS, 'is_active'))
 
     def save(self, *args, **kwargs):
-        # гарантируем username=email (чтобы можно было логиниться через стандартный backend)
-        if not self.username:
+        # email храним в нижнем регистре, username=email
+        # (чтобы можно было логиниться через стандартный backend)
+        if self.email:
+            self.email = self.email.strip().lower()
+        if not self.username or self.username.lower() == self.email:
             self.username = self.email
+
+        snapshot = getattr(self, '_token_snapshot', None)
+        password_changed = self._password is not None
+        claims_changed = snapshot is not None and snapshot != self._token_state()
+        bump = self.pk is not None and (password_changed or claims_changed)
+        if bump:
+            self.token_version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'token_version'}
+
         super().save(*args, **kwargs)
+        self._token_snapshot = self._token_state()
+        if bump:
+            # в кеш — после коммита: при откате там осталась бы версия, которой нет в БД,
+            # и все токены пользователя не проходили бы сверку до истечения кеша
+            user_id, version = self.pk, self.token_version
+            transaction.on_commit(
+                lambda: tokens.remember_token_version(user_id, version), using=self._state.db,
+            )
+            routing.stick_user(user_id)
+
+    # хеширование и проверка пароля идут через пул (см. accounts/hashing.py),
+    # так что authenticate()/create_user() не грузят поток запроса
+    def set_password(self, raw_password):
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        def setter(raw_password):
+            self.set_password(raw_password)
+            # обновление хеша не считается сменой пароля
+            self._password = None
+            self.save(update_fields=['password'])
+
+        return hashing.check_password(raw_password, self.password, setter)
+
+    def check_parent_password(self, raw_password):
+        """Проверка пароля родителя; устаревший хеш обновляется, как и у основного пароля"""
+        def setter(raw_password):
+            self.parent_password_hash = hashing.make_password(raw_password)
+            self.save(update_fields=['parent_password_hash'])
+
+        return hashing.check_password(raw_password, self.parent_password_hash, setter)
+
+    def set_passwords(self, raw_password, parent_password):
+        """Пароль ученика и пароль родителя хешируются одновременно"""
+        self.password, self.parent_password_hash = hashing.make_passwords(
+            raw_password, parent_password,
+        )
+        self._password = raw_password
+
+    # то же для async-вью (accounts/async_api_views.py): цикл событий не ждёт хеш
+    async def aset_password(self, raw_password):
+        self.password = await hashing.amake_password(raw_password)
+        self._password = raw_password
+
+    async def aset_passwords(self, raw_password, parent_password):
+        self.password, self.parent_password_hash = await hashing.amake_passwords(
+            raw_password, parent_password,
+        )
+        self._password = raw_password
+
+    async def acheck_password(self, raw_password):
+        is_correct, must_update = await hashing.acheck_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.password = await hashing.amake_password(raw_password)
+            await self.asave(update_fields=['password'])
+        return is_correct
+
+    def insert(self):
+        """
+        Создать нового пользователя одним INSERT.
+        Уникальность email проверяет сама БД: при дубле летит IntegrityError,
+        предварительный SELECT ... exists() не нужен.
+        """
+        using = router.db_for_write(type(self), instance=self)
+        if transaction.get_connection(using).in_atomic_block:
+            # внутри транзакции упавший INSERT сломает её — изолируем точкой сохранения
+            with transaction.atomic(using=using):
+                self.save(force_insert=True, using=using)
+        else:
+            self.save(force_insert=True, using=using)
 
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
+        indexes = [
+            # справочник пользователей: keyset-пагинация (новые сверху), фильтр по роли, поиск
+            models.Index(fields=['date_joined', 'id'], name='accounts_user_joined_idx'),
+            models.Index(fields=['role', 'date_joined', 'id'], name='accounts_user_role_joined_idx'),
+            models.Index(fields=['student_full_name'], name='accounts_user_student_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(Lower('email'), name='accounts_user_email_lower_uniq'),
+        ]
 
     def __str__(self):
         return f'{self.email} ({self.get_role_display()})'
+
+
+class RevokedToken(models.Model):
+    """Отозванный refresh-токен (logout). Проверки идут через accounts/revocation.py"""
+    jti = models.CharField('JTI', max_length=255, unique=True)
+    expires_at = models.DateTimeField('Истекает', db_index=True)
+    # по нему перечитываются недавние отзывы (accounts/revocation.py)
+    revoked_at = models.DateTimeField('Отозван', auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Отозванный токен'
+        verbose_name_plural = 'Отозванные токены'
+
+    def __str__(self):
+        return self.jti
+
+
+class AdminSlot(models.Model):
+    """
+    Место админа из белого списка (settings.ADMIN_SEED_EMAILS). Номер места
+    уникален — два одновременных входа не займут одно место (accounts/admin_slots.py).
+    """
+    number = models.PositiveSmallIntegerField('Номер места', unique=True)
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='admin_slot',
+                                verbose_name='Пользователь')
+
+    class Meta:
+        verbose_name = 'Место админа'
+        verbose_name_plural = 'Места админов'
+
+    def __str__(self):
+        return f'{self.number}: {self.user_id}'
+
+
+class AuthEvent(models.Model):
+    """
+    Журнал входов/выходов. Пишется пачками из фонового потока (accounts/audit.py),
+    поэтому user_id — просто число: пользователь мог быть удалён до записи.
+    """
+    class Kinds(models.TextChoices):
+        REGISTER = 'REGISTER', 'Регистрация'
+        LOGIN = 'LOGIN', 'Вход'
+        ADMIN_LOGIN = 'ADMIN_LOGIN', 'Админ-вход'
+        LOGOUT = 'LOGOUT', 'Выход'
+        REFRESH = 'REFRESH', 'Обновление токенов'
+
+    kind = models.CharField('Событие', max_length=20, choices=Kinds.choices)
+    success = models.BooleanField('Успешно', default=True)
+    user_id = models.BigIntegerField('ID пользователя', null=True, blank=True, db_index=True)
+    email = models.CharField('Email', max_length=254, blank=True)
+    ip = models.GenericIPAddressField('IP', null=True, blank=True)
+    user_agent = models.CharField('User-Agent', max_length=255, blank=True)
+    created_at = models.DateTimeField('Когда', default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = 'Событие входа'
+        verbose_name_plural = 'События входа'
+
+    def __str__(self):
+        return f'{self.kind} {self.email} {self.created_at:%Y-%m-%d %H:%M:%S}'
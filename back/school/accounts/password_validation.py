@@ -0,0 +1,90 @@
+# accounts/password_validation.py
+"""
+Валидаторы паролей (AUTH_PASSWORD_VALIDATORS) с теми же правилами, что
+у django.contrib.auth.password_validation, но дешевле на каждом вызове —
+их гоняют регистрация (API и форма) и импорт абитуриентов на каждой строке.
+
+CommonPasswordValidator: список из 20 000 частых паролей распаковывается один
+раз на процесс в frozenset (load_password_list кеширует по пути файла).
+AccountsConfig.ready() строит валидаторы при старте: первая регистрация не ждёт
+распаковки, а с gunicorn --preload список загружен до fork и воркеры делят его.
+
+UserAttributeSimilarityValidator: SequenceMatcher.quick_ratio — это размер
+пересечения мультимножеств символов; считаем его напрямую, без построения
+SequenceMatcher (и его индекса b2j) на каждую часть атрибута, а счётчик
+символов пароля строится один раз. Перед этим — оценка сверху по длинам
+2·min/(сумма длин): она отсеивает части ФИО и email, заведомо непохожие по
+длине. Результат совпадает с валидатором Django.
+"""
+import functools
+import gzip
+import re
+from collections import Counter
+
+from django.contrib.auth import password_validation
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.utils.translation import gettext as _
+
+
+@functools.lru_cache(maxsize=None)
+def load_password_list(path):
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return frozenset(line.strip() for line in f)
+    except OSError:
+        with open(path, encoding="utf-8") as f:
+            return frozenset(line.strip() for line in f)
+
+
+class CommonPasswordValidator(password_validation.CommonPasswordValidator):
+    """Как у Django; список паролей — общий frozenset на процесс"""
+
+    def __init__(self, password_list_path=None):
+        self.passwords = load_password_list(str(password_list_path or self.DEFAULT_PASSWORD_LIST_PATH))
+
+
+class UserAttributeSimilarityValidator(password_validation.UserAttributeSimilarityValidator):
+    """Как у Django, с отсевом по длине и без SequenceMatcher; по умолчанию сверяет и ФИО"""
+
+    DEFAULT_USER_ATTRIBUTES = ("username", "email", "student_full_name", "parent_full_name")
+
+    def __init__(self, user_attributes=DEFAULT_USER_ATTRIBUTES, max_similarity=0.7):
+        super().__init__(user_attributes, max_similarity)
+
+    def _too_similar(self, password, password_counts, part):
+        if not part or password_validation.exceeds_maximum_length_ratio(password, self.max_similarity, part):
+            return False
+        total = len(password) + len(part)
+        # оценка сверху для quick_ratio, как SequenceMatcher.real_quick_ratio
+        if 2 * min(len(password), len(part)) / total < self.max_similarity:
+            return False
+        available, matches = dict(password_counts), 0
+        for char in part:
+            count = available.get(char, 0)
+            if count:
+                available[char] = count - 1
+                matches += 1
+        return 2 * matches / total >= self.max_similarity
+
+    def validate(self, password, user=None):
+        if not user:
+            return
+        password = password.lower()
+        password_counts = dict(Counter(password))
+        for attribute_name in self.user_attributes:
+            value = getattr(user, attribute_name, None)
+            if not value or not isinstance(value, str):
+                continue
+            value = value.lower()
+            parts = re.split(r"\W+", value) + [value]
+            if not any(self._too_similar(password, password_counts, part) for part in parts):
+                continue
+            try:
+                verbose_name = str(user._meta.get_field(attribute_name).verbose_name)
+            except FieldDoesNotExist:
+                verbose_name = attribute_name
+            raise ValidationError(
+                _("The password is too similar to the %(verbose_name)s."),
+                code="password_too_similar",
+                params={"verbose_name": verbose_name},
+            )
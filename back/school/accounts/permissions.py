@@ -0,0 +1,23 @@
+# accounts/permissions.py
+from django.contrib.auth import get_user_model
+from rest_framework.permissions import BasePermission
+
+User = get_user_model()
+
+
+class HasRole(BasePermission):
+    """
+    Доступ по User.role (суперпользователю — всегда).
+    Работает и с TokenUser из ClaimsJWTAuthentication — роль берётся из токена.
+    """
+    roles = ()
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return False
+        return bool(user.is_superuser or user.role in self.roles)
+
+
+class IsAdminOrManager(HasRole):
+    roles = (User.Roles.ADMIN, User.Roles.MANAGER)
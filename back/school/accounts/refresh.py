@@ -0,0 +1,82 @@
+# accounts/refresh.py
+"""
+Обновление токенов по refresh-токену — без пароля и без хеширования.
+
+Ротация: refresh-токен одноразовый. При обновлении он отзывается
+(accounts/revocation.py) и выдаётся новый; старый больше не примут. Отзыв —
+INSERT по уникальному jti, поэтому из двух одновременных обновлений одним
+и тем же токеном проходит только одно.
+
+Скользящий срок: новый refresh живёт SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"] от
+момента обновления — активный клиент не разлогинивается, а брошенная сессия
+истекает. Но не дольше TOKEN_SESSION_MAX_LIFETIME от входа по паролю
+(claim "auth_time"), дальше — снова вход.
+
+Смена роли/пароля/прав (версия токенов, accounts/tokens.py) и отключение
+пользователя обрывают и обновление: версия сверяется по кешу, как для access.
+"""
+import datetime
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .revocation import RevocableRefreshToken, is_revoked, revoke
+from .tokens import VERSION_CLAIM, get_token_version
+
+AUTH_TIME_CLAIM = "auth_time"
+# у нового refresh свои срок и jti, остальные claims — как у старого
+NO_COPY_CLAIMS = ("exp", "iat", api_settings.JTI_CLAIM)
+
+
+def session_max_lifetime():
+    return getattr(settings, "TOKEN_SESSION_MAX_LIFETIME", datetime.timedelta(days=30))
+
+
+def start_session(refresh):
+    """Отметить в refresh-токене время входа по паролю"""
+    refresh[AUTH_TIME_CLAIM] = refresh["iat"]
+    return refresh
+
+
+def _check_version(token):
+    # None — пользователь удалён или отключён
+    version = get_token_version(token[api_settings.USER_ID_CLAIM])
+    if version is None or version != token.get(VERSION_CLAIM, version):
+        raise TokenError(_("Token is invalid or expired"))
+
+
+def rotate(raw_token):
+    """
+    Новая пара токенов взамен refresh-токена: ({"access", "refresh"}, старый токен).
+    TokenError — токен не годится (истёк, подделан, уже использован, устарел).
+    """
+    old = RevocableRefreshToken(raw_token)
+    _check_version(old)
+    now = old.current_time
+    session_ends = datetime_from_epoch(old.get(AUTH_TIME_CLAIM, old["iat"])) + session_max_lifetime()
+    if now >= session_ends:
+        raise TokenError("Сессия истекла, войдите заново")
+    if not revoke(old):
+        # токен уже обменяли (повтор или гонка двух вкладок)
+        raise TokenError(_("Token is blacklisted"))
+
+    new = RevocableRefreshToken()
+    for claim, value in old.payload.items():
+        if claim not in NO_COPY_CLAIMS:
+            new[claim] = value
+    new.set_exp(from_time=now, lifetime=min(api_settings.REFRESH_TOKEN_LIFETIME, session_ends - now))
+    return {"access": str(new.access_token), "refresh": str(new)}, old
+
+
+def verify(raw_token):
+    """Проверить access- или refresh-токен без выдачи новых; TokenError — не годится"""
+    token = UntypedToken(raw_token)
+    if (token.get(api_settings.TOKEN_TYPE_CLAIM) == RevocableRefreshToken.token_type
+            and is_revoked(token[api_settings.JTI_CLAIM])):
+        raise TokenError(_("Token is blacklisted"))
+    _check_version(token)
+    return token
@@ -0,0 +1,225 @@
+# accounts/revocation.py
+"""
+Отзыв refresh-токенов.
+
+Отозванные JTI хранятся в таблице RevokedToken, а в каждом процессе держится
+фильтр Блума по ним и LRU с точными ответами. Проверка «не отозван» для
+подавляющего большинства токенов — это пара операций в памяти; в БД идём только
+когда фильтр говорит «возможно» и ответа нет в LRU. Новые записи подгружаются
+инкрементально не чаще раза в REFRESH_INTERVAL секунд: id > последнего увиденного
+плюс всё, отозванное за последние RESCAN_SECONDS. Одного id мало — AUTO_INCREMENT
+раздаёт id при вставке, а не при коммите, и строка с меньшим id, закоммиченная
+после большей, иначе не попала бы сюда никогда.
+
+Граница: чужой отзыв виден процессу не позже чем через REFRESH_INTERVAL после
+коммита, если транзакция отзыва закоммичена в пределах RESCAN_SECONDS после
+вставки (revoke() коммитит сразу, это миллисекунды) с поправкой на расхождение
+часов серверов. Более поздний коммит процесс увидит только после пересборки фильтра.
+
+Настройки (settings.TOKEN_REVOCATION):
+    REFRESH_INTERVAL — как часто подтягивать чужие отзывы, секунды
+    RESCAN_SECONDS   — за сколько последних секунд отзывы перечитываются каждый раз
+    BLOOM_CAPACITY   — на сколько JTI рассчитан фильтр (дальше он пересобирается)
+    BLOOM_ERROR_RATE — доля ложных срабатываний фильтра
+    LRU_SIZE         — сколько точных ответов помнить
+"""
+import datetime
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import IntegrityError, router, transaction
+from django.db.models import Max, Q
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevokedToken
+
+DEFAULTS = {
+    "REFRESH_INTERVAL": 5,
+    "RESCAN_SECONDS": 60,
+    "BLOOM_CAPACITY": 100_000,
+    "BLOOM_ERROR_RATE": 0.001,
+    "LRU_SIZE": 10_000,
+}
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationList:
+    def __init__(self, refresh_interval=5, capacity=100_000, error_rate=0.001, lru_size=10_000,
+                 rescan_seconds=60):
+        self.refresh_interval = refresh_interval
+        self.rescan_seconds = rescan_seconds
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.lru_size = lru_size
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._last_id = 0
+        self._refreshed_at = 0.0
+        self._lru = OrderedDict()
+        self.hits = {"bloom_negative": 0, "lru": 0, "db": 0}
+
+    def _remember(self, jti, revoked):
+        self._lru[jti] = revoked
+        self._lru.move_to_end(jti)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _load(self):
+        live = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+        self._last_id = RevokedToken.objects.aggregate(last=Max("id"))["last"] or 0
+        self._bloom = BloomFilter(max(self.capacity, live.count() * 2), self.error_rate)
+        for jti in live.values_list("jti", flat=True).iterator(chunk_size=5000):
+            self._bloom.add(jti)
+        self._lru.clear()
+        self._refreshed_at = time.monotonic()
+
+    def _refresh(self):
+        if self._bloom is None:
+            self._load()
+            return
+        if time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        since = timezone.now() - datetime.timedelta(seconds=self.rescan_seconds)
+        fresh = RevokedToken.objects.filter(
+            Q(id__gt=self._last_id) | Q(revoked_at__gte=since),
+        ).values_list("id", "jti")
+        for pk, jti in fresh.iterator(chunk_size=5000):
+            if jti not in self._bloom:
+                self._bloom.add(jti)
+                self._remember(jti, True)
+            elif jti in self._lru:
+                # мог попасть в LRU как "не отозван", пока отзыв не был закоммичен
+                self._remember(jti, True)
+            self._last_id = max(self._last_id, pk)
+        if self._bloom.count > self._bloom.capacity:
+            # фильтр переполнен (в нём копятся и истёкшие) — пересобираем по живым
+            self._load()
+        self._refreshed_at = time.monotonic()
+
+    def is_revoked(self, jti):
+        with self._lock:
+            self._refresh()
+            if jti not in self._bloom:
+                self.hits["bloom_negative"] += 1
+                return False
+            if jti in self._lru:
+                self.hits["lru"] += 1
+                self._lru.move_to_end(jti)
+                return self._lru[jti]
+
+        revoked = RevokedToken.objects.filter(jti=jti).exists()
+        with self._lock:
+            self.hits["db"] += 1
+            self._remember(jti, revoked)
+        return revoked
+
+    def revoke(self, jti, expires_at):
+        """False — токен уже был отозван (в том числе параллельным запросом)"""
+        # сразу INSERT: при ротации токен почти всегда ещё не отозван, SELECT не нужен
+        try:
+            with transaction.atomic(using=router.db_for_write(RevokedToken)):
+                RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+            created = True
+        except IntegrityError:
+            created = False
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+            self._remember(jti, True)
+        return created
+
+    def stats(self):
+        with self._lock:
+            return {
+                "bloom_items": self._bloom.count if self._bloom else 0,
+                "bloom_capacity": self._bloom.capacity if self._bloom else 0,
+                "lru_items": len(self._lru),
+                **self.hits,
+            }
+
+
+_revocations = None
+_revocations_lock = threading.Lock()
+
+
+def get_revocation_list():
+    global _revocations
+    if _revocations is None:
+        with _revocations_lock:
+            if _revocations is None:
+                conf = {**DEFAULTS, **getattr(settings, "TOKEN_REVOCATION", {})}
+                _revocations = RevocationList(
+                    refresh_interval=conf["REFRESH_INTERVAL"],
+                    capacity=conf["BLOOM_CAPACITY"],
+                    error_rate=conf["BLOOM_ERROR_RATE"],
+                    lru_size=conf["LRU_SIZE"],
+                    rescan_seconds=conf["RESCAN_SECONDS"],
+                )
+    return _revocations
+
+
+def reset():
+    global _revocations
+    with _revocations_lock:
+        _revocations = None
+
+
+@receiver(setting_changed)
+def reset_revocation_list(*, setting, **kwargs):
+    if setting == "TOKEN_REVOCATION":
+        reset()
+
+
+def is_revoked(jti):
+    return get_revocation_list().is_revoked(jti)
+
+
+def revoke(token):
+    return get_revocation_list().revoke(
+        token[api_settings.JTI_CLAIM], datetime_from_epoch(token["exp"]),
+    )
+
+
+class RevocableRefreshToken(RefreshToken):
+    """Refresh-токен, который проверяется по списку отзыва; blacklist() — отзыв"""
+
+    def verify(self):
+        super().verify()
+        if is_revoked(self[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        return revoke(self)
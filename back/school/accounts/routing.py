@@ -0,0 +1,121 @@
+# accounts/routing.py
+"""
+Чтение — с реплик, запись — в основную БД.
+
+Реплики отстают, поэтому свои записи читаем из основной БД:
+  * запрос с небезопасным методом (POST и т.п.) или уже что-то записавший
+    до конца читает из основной БД;
+  * пользователь после регистрации, повышения до админа или смены версии
+    токенов (User.save(), accounts/bulk.py) ещё STICKY_SECONDS секунд читается
+    из основной БД — метка в кеше по id, ведь следующий его запрос может
+    попасть в другой воркер;
+  * версия токенов при промахе кеша всегда читается из основной БД
+    (accounts/tokens.py): отозванный токен не должен ожить из-за отставания.
+
+Настройки (settings.DATABASE_ROUTING):
+    PRIMARY        — алиас основной БД
+    REPLICAS       — алиасы реплик; пусто — всё идёт в PRIMARY
+    STICKY_SECONDS — сколько держать пользователя на основной БД после записи
+    PRIMARY_ONLY   — модели ("app_label" или "app_label.model"), которые всегда
+                     читаем из основной БД
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULTS = {
+    "PRIMARY": "default",
+    "REPLICAS": [],
+    "STICKY_SECONDS": 10,
+    # устаревшая сессия или список отзыва — это вход по уже закрытому доступу
+    "PRIMARY_ONLY": ["sessions", "accounts.revokedtoken"],
+}
+
+_pinned = contextvars.ContextVar("db_pinned_to_primary", default=False)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "DATABASE_ROUTING", {})}
+
+
+@contextmanager
+def request_scope(pinned=False):
+    """Границы запроса: привязка к основной БД не переживает запрос"""
+    token = _pinned.set(pinned)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def pin_to_primary():
+    """До конца запроса читать из основной БД"""
+    _pinned.set(True)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+def _sticky_key(user_id):
+    return f"accounts:db_sticky:{user_id}"
+
+
+def stick_user(user_id):
+    """Пользователь только что записан — следующие STICKY_SECONDS секунд читаем его из основной БД"""
+    conf = get_config()
+    if conf["REPLICAS"] and conf["STICKY_SECONDS"]:
+        cache.set(_sticky_key(user_id), True, conf["STICKY_SECONDS"])
+
+
+def stick_users(user_ids):
+    """stick_user() для многих пользователей одним обращением к кешу"""
+    conf = get_config()
+    if conf["REPLICAS"] and conf["STICKY_SECONDS"]:
+        cache.set_many({_sticky_key(user_id): True for user_id in user_ids}, conf["STICKY_SECONDS"])
+
+
+def pin_if_sticky(user_id):
+    if user_id is None or _pinned.get() or not get_config()["REPLICAS"]:
+        return
+    if cache.get(_sticky_key(user_id)):
+        pin_to_primary()
+
+
+def _primary_only(model, conf):
+    meta = model._meta
+    return meta.app_label in conf["PRIMARY_ONLY"] or meta.label_lower in conf["PRIMARY_ONLY"]
+
+
+class PrimaryReplicaRouter:
+    """Подключается в settings.DATABASE_ROUTERS"""
+
+    def db_for_read(self, model, **hints):
+        conf = get_config()
+        if not conf["REPLICAS"] or _pinned.get() or _primary_only(model, conf):
+            return conf["PRIMARY"]
+        # связанные объекты читаем оттуда же, откуда пришёл исходный
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db in (conf["PRIMARY"], *conf["REPLICAS"]):
+            return instance._state.db
+        return random.choice(conf["REPLICAS"])
+
+    def db_for_write(self, model, **hints):
+        conf = get_config()
+        if conf["REPLICAS"]:
+            pin_to_primary()
+        return conf["PRIMARY"]
+
+    def allow_relation(self, obj1, obj2, **hints):
+        conf = get_config()
+        databases = (conf["PRIMARY"], *conf["REPLICAS"])
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # реплики получают схему репликацией; локально их можно мигрировать явно
+        return None
@@ -1,11 +1,15 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
-from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError
 from rest_framework import serializers
 
+from .instrumentation import TimedSerializerMixin
+
 User = get_user_model()
 
-class RegisterSerializer(serializers.ModelSerializer):
+EMAIL_TAKEN_MESSAGE = "Пользователь с таким email уже зарегистрирован."
+
+class RegisterSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     parent_password = serializers.CharField(write_only=True)
 
@@ -15,13 +19,18 @@ class RegisterSerializer(serializers.ModelSerializer):
             "email", "phone", "student_full_name", "parent_full_name",
             "password", "parent_password"
         )
+        # уникальность email проверяет сама БД при INSERT (см. create),
+        # без отдельного SELECT на каждую регистрацию
+        extra_kwargs = {"email": {"validators": []}}
 
     def validate_password(self, value):
         validate_password(value)
         return value
 
-    def create(self, validated):
-        user = User(
+    @staticmethod
+    def build_user(validated):
+        """Несохранённый пользователь без паролей (общая часть для регистрации и импорта)"""
+        return User(
             email=validated["email"].lower(),
             username=validated["email"].lower(),
             phone=validated.get("phone", ""),
@@ -29,24 +38,60 @@ class RegisterSerializer(serializers.ModelSerializer):
             parent_full_name=validated.get("parent_full_name", ""),
             role=User.Roles.APPLICANT,  # по умолчанию — абитуриент
         )
-        user.set_password(validated["password"])
-        user.parent_password_hash = make_password(validated["parent_password"])
-        user.save()
+
+    def create(self, validated):
+        user = self.build_user(validated)
+        user.set_passwords(validated["password"], validated["parent_password"])
+        try:
+            user.insert()
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {"email": [EMAIL_TAKEN_MESSAGE]}
+            )
         return user
 
 
-class LoginSerializer(serializers.Serializer):
+class LoginSerializer(TimedSerializerMixin, serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
 
 
-class AdminLoginSerializer(serializers.Serializer):
+class AdminLoginSerializer(TimedSerializerMixin, serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
 
 
-class MeSerializer(serializers.ModelSerializer):
+class MeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("id", "email", "phone", "student_full_name",
                   "parent_full_name", "role", "is_staff", "is_superuser")
+
+
+class UserFilterSerializer(serializers.Serializer):
+    role = serializers.ChoiceField(choices=User.Roles.choices, required=False)
+    joined_from = serializers.DateField(required=False)
+    joined_to = serializers.DateField(required=False)
+
+
+class BulkUserUpdateSerializer(serializers.Serializer):
+    """Кого менять (ids или filter) и что поставить (role и/или is_active)"""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False,
+                                allow_empty=False, max_length=10_000)
+    filter = UserFilterSerializer(required=False)
+    role = serializers.ChoiceField(choices=User.Roles.choices, required=False)
+    is_active = serializers.BooleanField(required=False)
+
+    def validate_role(self, value):
+        # роль ADMIN даёт доступ уровня IsAdminOrManager — раздаёт её только суперпользователь
+        request = self.context.get("request")
+        if value == User.Roles.ADMIN and not (request and request.user.is_superuser):
+            raise serializers.ValidationError("Назначать роль ADMIN может только суперпользователь.")
+        return value
+
+    def validate(self, attrs):
+        if "ids" not in attrs and not attrs.get("filter"):
+            raise serializers.ValidationError("Укажите ids или непустой filter.")
+        if "role" not in attrs and "is_active" not in attrs:
+            raise serializers.ValidationError("Укажите role и/или is_active.")
+        return attrs
@@ -0,0 +1,133 @@
+# accounts/synthetic.py
+"""
+Синтетические пользователи для нагрузочных прогонов и проверки планов запросов
+на объёмах как в проде (сотни тысяч абитуриентов).
+
+create_user() считает хеш на каждую строку — миллион пользователей так не
+создать. Здесь паролей немного (PASSWORD_POOL), их хеши считаются один раз
+настоящим хешером и раздаются строкам по кругу: пароль строки i известен
+(password_for), так что под любым синтетическим пользователем можно войти.
+
+Строки детерминированы: при одном seed и одной дате until получаются те же
+email, ФИО, роли и даты регистрации. Email — synthetic-<seed>-<номер>@<домен>,
+так что прогоны с разными seed или start не пересекаются. Пишем пачками
+через bulk_create, каждая пачка — своя транзакция.
+
+Пароли известны всем, кто видел этот файл, поэтому по умолчанию (privileged=False)
+ролей ADMIN нет вовсе, а MANAGER — без is_staff. ADMIN создаются только по
+privileged=True и без мест AdminSlot: bulk_create не вызывает post_save
+(accounts/admin_slots.py), так что это просто суперпользователи для нагрузки.
+"""
+import datetime
+import random
+
+from django.db import router, transaction
+from django.utils import timezone
+
+from . import hashing
+from .models import User
+
+DOMAIN = "synthetic.test"
+PASSWORD_POOL = 4
+PASSWORD_TEMPLATE = "Synthetic-{}-Pass"
+# примерная доля ролей в базе школы
+ROLE_WEIGHTS = {
+    User.Roles.APPLICANT: 700,
+    User.Roles.STUDENT: 250,
+    User.Roles.TEACHER: 40,
+    User.Roles.MANAGER: 9,
+    User.Roles.ADMIN: 1,
+}
+INACTIVE_SHARE = 0.02
+
+SURNAMES = (
+    "Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов",
+    "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семёнов", "Егоров",
+    "Павлов", "Козлов", "Степанов", "Николаев", "Орлов", "Андреев", "Макаров", "Никитин",
+)
+MALE_NAMES = (
+    "Александр", "Дмитрий", "Максим", "Сергей", "Андрей", "Алексей", "Артём", "Илья",
+    "Кирилл", "Михаил", "Никита", "Матвей", "Роман", "Егор", "Иван", "Олег",
+)
+FEMALE_NAMES = (
+    "Анна", "Мария", "Елена", "Дарья", "Алина", "Ирина", "Екатерина", "Полина",
+    "Ольга", "Татьяна", "Наталья", "Виктория", "Софья", "Ксения", "Юлия", "Вера",
+)
+PATRONYMICS = (
+    "Александров", "Дмитриев", "Сергеев", "Андреев", "Алексеев", "Михайлов", "Иванов", "Олегов",
+)
+
+
+def password_for(index):
+    """Пароль синтетического пользователя с номером index"""
+    return PASSWORD_TEMPLATE.format(index % PASSWORD_POOL)
+
+
+def password_hashes():
+    """Хеши пула паролей: считаются один раз на прогон, в пуле хеширования"""
+    return hashing.make_passwords(*(password_for(i) for i in range(PASSWORD_POOL)))
+
+
+def _full_name(rng, surname, female):
+    if female:
+        return f"{surname}а {rng.choice(FEMALE_NAMES)} {rng.choice(PATRONYMICS)}на"
+    return f"{surname} {rng.choice(MALE_NAMES)} {rng.choice(PATRONYMICS)}ич"
+
+
+def iter_users(count, hashes, seed=0, start=0, until=None, days=365, domain=DOMAIN, privileged=False):
+    """
+    Несохранённые пользователи с номерами start..start+count-1.
+    Даты регистрации — за days (>= 1) дней по день until включительно (по умолчанию — сегодня).
+    privileged — есть и ADMIN (с is_staff и is_superuser), MANAGER получают is_staff.
+    """
+    if days < 1:
+        raise ValueError("days должно быть не меньше 1")
+    until = until or timezone.localdate()
+    end = timezone.make_aware(
+        datetime.datetime.combine(until + datetime.timedelta(days=1), datetime.time.min),
+    )
+    role_weights = {
+        role: weight for role, weight in ROLE_WEIGHTS.items() if privileged or role != User.Roles.ADMIN
+    }
+    roles, weights = list(role_weights), list(role_weights.values())
+    span = days * 24 * 3600
+    for index in range(start, start + count):
+        # у каждой строки свой генератор: строка не зависит от того, с какого start начали
+        rng = random.Random(f"{seed}:{index}")
+        surname = rng.choice(SURNAMES)
+        role = rng.choices(roles, weights)[0]
+        email = f"synthetic-{seed}-{index}@{domain}"
+        password = hashes[index % len(hashes)]
+        yield User(
+            email=email,
+            username=email,
+            password=password,
+            parent_password_hash=password if role in (User.Roles.APPLICANT, User.Roles.STUDENT) else "",
+            phone=f"+79{rng.randrange(10 ** 9):09d}",
+            student_full_name=_full_name(rng, surname, rng.random() < 0.5),
+            parent_full_name=_full_name(rng, surname, rng.random() < 0.7),
+            role=role,
+            is_staff=privileged and role in (User.Roles.ADMIN, User.Roles.MANAGER),
+            is_superuser=privileged and role == User.Roles.ADMIN,
+            is_active=rng.random() >= INACTIVE_SHARE,
+            date_joined=end - datetime.timedelta(seconds=rng.randrange(1, span + 1)),
+        )
+
+
+def create_users(count, seed=0, start=0, chunk_size=5000, progress=None, **options):
+    """
+    Создать count пользователей пачками по chunk_size. progress(создано) — после каждой пачки.
+    IntegrityError — такие email уже есть (тот же seed и пересекающийся start).
+    """
+    hashes = password_hashes()
+    using = router.db_for_write(User)
+    created = 0
+    users = iter_users(count, hashes, seed=seed, start=start, **options)
+    while created < count:
+        chunk = [user for _, user in zip(range(chunk_size), users)]
+        with transaction.atomic(using=using):
+            User.objects.using(using).bulk_create(chunk)
+        created += len(chunk)
+        if progress is not None:
+            progress(created)
+    return created
@@ -1,3 +1,1300 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import password_validation as django_password_validation
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth import authenticate
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from . import hashing
+from .api_views import issue_tokens_for_user
+from .authentication import CachedJWTAuthentication
+from . import (
+    admin_slots, audit, benchmarks, bulk, exporting, instrumentation, jwt_cache, password_validation,
+    revocation, routing, synthetic, throttling,
+)
+from .forms import LoginForm, RegistrationForm
+from .importing import ApplicantImporter, iter_records
+from .models import AdminSlot, AuthEvent, RevokedToken, User
+from .tokens import add_user_claims, get_token_version
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# журнал входов в тестах без фонового потока: события пишет audit.get_writer().flush()
+_audit_override = override_settings(AUDIT_LOG={'BACKGROUND': False})
+
+
+def setUpModule():
+    _audit_override.enable()
+
+
+def tearDownModule():
+    _audit_override.disable()
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class HashingPoolTests(TestCase):
+    def test_make_and_check_password(self):
+        completed = hashing.stats()['completed']
+        encoded = hashing.make_password('s3cret-pass')
+        self.assertTrue(hashing.check_password('s3cret-pass', encoded))
+        self.assertFalse(hashing.check_password('wrong', encoded))
+        self.assertEqual(hashing.stats()['completed'], completed + 3)
+
+    @override_settings(PASSWORD_HASHERS=FAST_HASHERS + ['django.contrib.auth.hashers.SHA1PasswordHasher'])
+    def test_outdated_hash_upgraded_on_check(self):
+        user = User.objects.create(
+            email='a@example.com', password=make_password('pass12345', hasher='sha1'),
+        )
+        self.assertTrue(user.check_password('pass12345'))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('md5$'))
+
+    def test_saturated_pool_rejects(self):
+        pool = hashing.HashingPool(backend='inline', workers=1, queue_size=0, retry_after=7)
+        pool._slots.acquire()
+        with self.assertRaises(hashing.HashingPoolSaturated) as ctx:
+            pool.run(hashing._make_password, 'x')
+        self.assertEqual(ctx.exception.wait, 7)
+        self.assertEqual(pool.stats()['rejected'], 1)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class AuthAPITests(APITestCase):
+    def register(self, email='student@example.com'):
+        return self.client.post(reverse('accounts_api:register'), {
+            'email': email,
+            'phone': '+70000000000',
+            'student_full_name': 'Иванов Иван',
+            'parent_full_name': 'Иванов Пётр',
+            'password': 'Xk29-lqP!mz',
+            'parent_password': 'Parent-9931',
+        }, format='json')
+
+    def test_register_and_login(self):
+        self.assertEqual(self.register().status_code, 201)
+        user = User.objects.get(email='student@example.com')
+        self.assertTrue(user.check_password('Xk29-lqP!mz'))
+        self.assertTrue(hashing.check_password('Parent-9931', user.parent_password_hash))
+
+        resp = self.client.post(reverse('accounts_api:login'), {
+            'email': 'Student@example.com', 'password': 'Xk29-lqP!mz',
+        }, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('access', resp.data['tokens'])
+
+    def test_register_duplicate_email_is_validation_error(self):
+        self.register()
+        with self.assertNumQueries(4):  # один INSERT + точка сохранения тестовой транзакции
+            resp = self.register(email='Student@example.com')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('email', resp.data)
+
+    @override_settings(PASSWORD_HASHING={'BACKEND': 'inline', 'WORKERS': 1, 'QUEUE_SIZE': 0, 'RETRY_AFTER': 3})
+    def test_login_returns_503_when_pool_saturated(self):
+        hashing.get_pool()._slots.acquire()
+        resp = self.client.post(reverse('accounts_api:login'), {
+            'email': 'student@example.com', 'password': 'whatever',
+        }, format='json')
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp['Retry-After'], '3')
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class AsyncAuthAPITests(TestCase):
+    payload = {
+        'email': 'Async@example.com', 'phone': '+70000000000',
+        'student_full_name': 'Асинхронов Иван', 'parent_full_name': 'Асинхронов Пётр',
+        'password': 'Xk29-lqP!mz', 'parent_password': 'Parent-9931',
+    }
+
+    def setUp(self):
+        cache.clear()
+
+    async def post(self, name, data, **extra):
+        return await self.async_client.post(reverse(f'accounts_async_api:{name}'), data,
+                                            content_type='application/json', **extra)
+
+    async def me(self, access, **extra):
+        return await self.async_client.get(reverse('accounts_async_api:me'),
+                                           AUTHORIZATION=f'Bearer {access}', **extra)
+
+    async def test_register_login_me_logout(self):
+        resp = await self.post('register', self.payload)
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json()['user']['email'], 'async@example.com')
+
+        resp = await self.post('login', {'email': 'ASYNC@example.com', 'password': 'Xk29-lqP!mz'})
+        self.assertEqual(resp.status_code, 200)
+        tokens = resp.json()['tokens']
+
+        resp = await self.me(tokens['access'])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['student_full_name'], 'Асинхронов Иван')
+        resp = await self.me(tokens['access'], IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(resp.status_code, 304)
+
+        self.assertEqual((await self.post('logout', {'refresh': tokens['refresh']})).status_code, 200)
+        self.assertTrue(await RevokedToken.objects.aexists())
+
+    async def test_errors_match_sync_api(self):
+        await self.post('register', self.payload)
+        resp = await self.post('register', {**self.payload, 'email': 'async@EXAMPLE.com'})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('email', resp.json())
+        resp = await self.post('login', {'email': 'async@example.com', 'password': 'wrong'})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual((await self.post('login', 'not json')).status_code, 400)
+
+        resp = await self.async_client.get(reverse('accounts_async_api:me'))
+        self.assertEqual(resp.status_code, 401)
+        self.assertIn('Bearer', resp['WWW-Authenticate'])
+        self.assertEqual((await self.async_client.post(reverse('accounts_async_api:me'))).status_code, 405)
+
+    @override_settings(PASSWORD_HASHING={'BACKEND': 'thread', 'WORKERS': 1, 'QUEUE_SIZE': 0, 'RETRY_AFTER': 3})
+    async def test_me_is_served_while_hash_is_in_flight(self):
+        user = await User.objects.acreate(email='async@example.com', username='async@example.com',
+                                          password=make_password('Xk29-lqP!mz'))
+        access = issue_tokens_for_user(user)['access']
+
+        release = threading.Event()
+        verify = hashing._verify_password
+
+        def slow_verify(password, encoded):
+            release.wait(5)
+            return verify(password, encoded)
+
+        with mock.patch.object(hashing, '_verify_password', slow_verify):
+            login = asyncio.ensure_future(self.post('login', {'email': 'async@example.com', 'password': 'Xk29-lqP!mz'}))
+            while hashing.stats()['in_flight'] == 0:
+                await asyncio.sleep(0.001)
+            self.assertEqual((await self.me(access)).status_code, 200)
+            # единственный слот пула занят — второй вход сразу получает 503
+            resp = await self.post('login', {'email': 'async@example.com', 'password': 'Xk29-lqP!mz'})
+            self.assertEqual(resp.status_code, 503)
+            self.assertEqual(resp['Retry-After'], '3')
+            self.assertFalse(login.done())
+            release.set()
+            self.assertEqual((await login).status_code, 200)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class RegistrationFormTests(TestCase):
+    data = {
+        'email': 'Form@Example.com',
+        'phone': '',
+        'student_full_name': 'Петров Пётр',
+        'parent_full_name': 'Петрова Анна',
+        'password': 'Xk29-lqP!mz',
+        'parent_password': 'Parent-9931',
+    }
+
+    def test_save_hashes_both_passwords(self):
+        form = RegistrationForm(self.data)
+        self.assertTrue(form.is_valid())
+        user = form.save()
+        self.assertEqual(user.email, 'form@example.com')
+        self.assertTrue(user.check_password('Xk29-lqP!mz'))
+        self.assertTrue(hashing.check_password('Parent-9931', user.parent_password_hash))
+
+    def test_duplicate_email_reported_on_save(self):
+        first = RegistrationForm(self.data)
+        self.assertTrue(first.is_valid())
+        first.save()
+        form = RegistrationForm(self.data)
+        with self.assertNumQueries(0):
+            self.assertTrue(form.is_valid())
+        self.assertIsNone(form.save())
+        self.assertIn('email', form.errors)
+
+
+class PasswordValidationTests(TestCase):
+    def test_similarity_matches_django(self):
+        stock = django_password_validation.UserAttributeSimilarityValidator(
+            password_validation.UserAttributeSimilarityValidator.DEFAULT_USER_ATTRIBUTES,
+        )
+        ours = password_validation.UserAttributeSimilarityValidator()
+        rng = random.Random(7)
+        for i in range(300):
+            name = ''.join(rng.choice('abcdeиванов') for _ in range(rng.randint(2, 12)))
+            user = User(email=f'{name}@example.com', username=f'{name}@example.com',
+                        student_full_name=f'{name} {name[::-1]}')
+            password = rng.choice([name + str(i), name[::-1], f'{rng.getrandbits(32):x}', name[:3] * 3])
+            verdicts = []
+            for validator in (stock, ours):
+                try:
+                    validator.validate(password, user)
+                    verdicts.append(True)
+                except ValidationError:
+                    verdicts.append(False)
+            self.assertEqual(verdicts[0], verdicts[1], (password, user.email))
+
+    def test_common_password_list_loaded_once(self):
+        first, second = password_validation.CommonPasswordValidator(), password_validation.CommonPasswordValidator()
+        self.assertIs(first.passwords, second.passwords)
+        self.assertIsInstance(first.passwords, frozenset)
+        with self.assertRaises(ValidationError):
+            first.validate('Qwerty123')
+
+    @override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+    def test_registration_and_import_rules_unchanged(self):
+        # регистрация и импорт, как и раньше, проверяют пароль без пользователя:
+        # похожесть на email/ФИО не проверяется, частые пароли — да
+        row = {
+            'email': 'sidorov@example.com', 'phone': '', 'student_full_name': 'Sidorov Oleg',
+            'parent_full_name': 'Sidorova Anna', 'password': 'sidorov2010', 'parent_password': 'Parent-9931',
+        }
+        report = ApplicantImporter(processes=1).run(iter_records([json.dumps(row)], 'jsonl'))
+        self.assertEqual((report['created'], report['failed']), (1, 0))
+        resp = self.client.post(reverse('accounts_api:register'), {
+            **row, 'email': 'sidorov2@example.com', 'password': 'qwerty123',
+        }, content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('password', resp.json())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ApplicantImportTests(APITestCase):
+    csv_data = (
+        'email,phone,student_full_name,parent_full_name,password,parent_password\n'
+        'One@example.com,,Первый,Родитель,Xk29-lqP!mz,Parent-9931\n'
+        'bad-email,,Второй,Родитель,Xk29-lqP!mz,Parent-9931\n'
+        'one@example.com,,Дубль,Родитель,Xk29-lqP!mz,Parent-9931\n'
+        'two@example.com,,Третий,Родитель,Xk29-lqP!mz,Parent-9931\n'
+    )
+
+    def test_api_requires_staff(self):
+        resp = self.client.post(reverse('accounts_api:users_import'), {})
+        self.assertEqual(resp.status_code, 401)
+
+    def test_api_imports_csv_with_row_errors(self):
+        admin = User.objects.create_user(
+            email='boss@example.com', username='boss@example.com', password='x', is_staff=True,
+        )
+        self.client.force_authenticate(admin)
+        upload = SimpleUploadedFile('applicants.csv', self.csv_data.encode('utf-8'))
+        resp = self.client.post(reverse('accounts_api:users_import'), {'file': upload})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['created'], 2)
+        self.assertEqual([e['line'] for e in resp.data['errors']], [3, 4])
+        user = User.objects.get(email='one@example.com')
+        self.assertEqual(user.role, User.Roles.APPLICANT)
+        self.assertTrue(user.check_password('Xk29-lqP!mz'))
+
+    def test_api_rejects_concurrent_import(self):
+        admin = User.objects.create_user(
+            email='boss@example.com', username='boss@example.com', password='x', is_staff=True,
+        )
+        self.client.force_authenticate(admin)
+        upload = SimpleUploadedFile('applicants.csv', self.csv_data.encode('utf-8'))
+        with hashing.shared_bulk_executor():
+            resp = self.client.post(reverse('accounts_api:users_import'), {'file': upload})
+        self.assertEqual(resp.status_code, 409)
+        self.assertFalse(User.objects.filter(email='one@example.com').exists())
+
+    def test_errors_are_capped(self):
+        lines = [f'{i},not-a-record' for i in range(5)]
+        importer = ApplicantImporter(processes=1, max_errors=2)
+        report = importer.run(iter_records(['email,phone'] + lines, 'csv'))
+        self.assertEqual(report['failed'], 5)
+        self.assertEqual(len(report['errors']), 2)
+        self.assertTrue(report['errors_truncated'])
+
+    def test_command_imports_jsonl(self):
+        User.objects.create_user(email='taken@example.com', username='taken@example.com', password='x')
+        rows = [
+            {'email': 'taken@example.com', 'password': 'Xk29-lqP!mz', 'parent_password': 'Parent-9931'},
+            {'email': 'new@example.com', 'password': 'Xk29-lqP!mz', 'parent_password': 'Parent-9931'},
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', encoding='utf-8') as f:
+            f.write('\n'.join(json.dumps(row) for row in rows) + '\nnot json\n')
+            f.flush()
+            out, err = StringIO(), StringIO()
+            call_command('import_applicants', f.name, '--chunk-size', '1', '--processes', '1',
+                         stdout=out, stderr=err)
+        self.assertIn('Создано: 1, с ошибками: 2', out.getvalue())
+        self.assertTrue(User.objects.filter(email='new@example.com').exists())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ClaimsAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='me@example.com', username='me@example.com', password='pass12345',
+            student_full_name='Сидоров Сидор',
+        )
+
+    def me(self, tokens):
+        return self.client.get(reverse('accounts_api:me'), HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+    def test_me_served_from_claims_without_queries(self):
+        tokens = issue_tokens_for_user(self.user)
+        self.me(tokens)  # версия попала в кеш
+        with self.assertNumQueries(0):
+            resp = self.me(tokens)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['email'], 'me@example.com')
+        self.assertEqual(resp.data['student_full_name'], 'Сидоров Сидор')
+        self.assertEqual(resp.data['role'], User.Roles.APPLICANT)
+
+    def test_role_change_revokes_tokens(self):
+        tokens = issue_tokens_for_user(self.user)
+        user = User.objects.get(pk=self.user.pk)
+        user.role = User.Roles.STUDENT
+        user.save()
+        self.assertEqual(self.me(tokens).status_code, 401)
+        self.assertEqual(self.me(issue_tokens_for_user(user)).data['role'], User.Roles.STUDENT)
+
+    def test_password_change_revokes_tokens(self):
+        tokens = issue_tokens_for_user(self.user)
+        self.user.set_password('new-pass-123')
+        self.user.save()
+        self.assertEqual(self.me(tokens).status_code, 401)
+
+    def test_last_login_update_keeps_tokens(self):
+        tokens = issue_tokens_for_user(self.user)
+        user = User.objects.get(pk=self.user.pk)
+        user.save(update_fields=['last_login'])
+        self.assertEqual(self.me(tokens).status_code, 200)
+
+    def test_rolled_back_save_keeps_cached_version(self):
+        tokens = issue_tokens_for_user(self.user)
+        self.assertEqual(self.me(tokens).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                user = User.objects.get(pk=self.user.pk)
+                user.role = User.Roles.ADMIN
+                user.save()
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(get_token_version(self.user.pk), 0)
+        self.assertEqual(self.me(tokens).status_code, 200)
+
+    def test_me_not_modified_by_etag(self):
+        tokens = issue_tokens_for_user(self.user)
+        etag = self.me(tokens)['ETag']
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse('accounts_api:me'), HTTP_AUTHORIZATION=f"Bearer {tokens['access']}",
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp['ETag'], etag)
+
+        user = User.objects.get(pk=self.user.pk)
+        user.phone = '+79990000000'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        resp = self.me(issue_tokens_for_user(user))
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+
+
+class VerifiedTokenCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        jwt_cache.reset()
+        self.admin = User.objects.create(email='staff@example.com', username='staff@example.com',
+                                         role=User.Roles.ADMIN, is_staff=True)
+        self.auth = f"Bearer {issue_tokens_for_user(self.admin)['access']}"
+
+    def stats(self):
+        return self.client.get(reverse('accounts_api:hashing_stats'), HTTP_AUTHORIZATION=self.auth)
+
+    def test_repeat_request_skips_verification_and_user_lookup(self):
+        self.assertEqual(self.stats().status_code, 200)
+        with mock.patch.object(CachedJWTAuthentication, 'get_validated_token') as verify, \
+                self.assertNumQueries(0):
+            self.assertEqual(self.stats().status_code, 200)
+        verify.assert_not_called()
+        self.assertEqual(jwt_cache.stats()['hits'], 1)
+        self.assertEqual(jwt_cache.stats()['misses'], 1)
+
+    def test_version_change_rejects_cached_token(self):
+        self.stats()
+        self.admin.role = User.Roles.MANAGER
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.save()
+        self.assertEqual(self.stats().status_code, 401)
+        self.assertEqual(jwt_cache.stats()['rejected'], 1)
+        self.assertEqual(jwt_cache.stats()['items'], 0)
+
+    def test_same_token_on_claims_and_default_auth(self):
+        # /me/ кладёт в кеш TokenUser, остальные API — User: записи у классов раздельные
+        for _ in range(2):
+            self.assertEqual(self.client.get(reverse('accounts_api:me'), HTTP_AUTHORIZATION=self.auth).status_code, 200)
+            resp = self.stats()
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.wsgi_request.user.pk, self.admin.pk)
+        self.assertEqual(jwt_cache.stats()['items'], 2)
+
+    def test_expired_and_evicted(self):
+        token_cache = jwt_cache.VerifiedTokenCache(size=1)
+        token_cache.put(b'old', {'exp': time.time() - 1}, None)
+        self.assertIsNone(token_cache.get(b'old'))
+        token_cache.put(b'a', {'exp': time.time() + 60}, 'a')
+        token_cache.put(b'b', {'exp': time.time() + 60}, 'b')
+        self.assertIsNone(token_cache.get(b'a'))
+        self.assertEqual(token_cache.get(b'b')[1], 'b')
+        self.assertEqual(token_cache.stats()['expired'], 1)
+        self.assertEqual(token_cache.stats()['evicted'], 1)
+
+    @override_settings(JWT_AUTH_CACHE={'ENABLED': False})
+    def test_disabled(self):
+        self.assertEqual(self.stats().status_code, 200)
+        self.assertEqual(self.stats().status_code, 200)
+        self.assertEqual(jwt_cache.stats(), {})
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class RevocationTests(APITestCase):
+    def setUp(self):
+        revocation.reset()
+        self.user = User.objects.create_user(email='out@example.com', username='out@example.com', password='x')
+
+    def test_bloom_filter(self):
+        bloom = revocation.BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(1000)))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_logout_revokes_refresh_token(self):
+        refresh = issue_tokens_for_user(self.user)['refresh']
+        revocation.RevocableRefreshToken(refresh)  # не отозван
+        resp = self.client.post(reverse('accounts_api:logout'), {'refresh': refresh}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(RevokedToken.objects.count(), 1)
+        with self.assertNumQueries(0):
+            with self.assertRaises(TokenError):
+                revocation.RevocableRefreshToken(refresh)
+
+    def test_unrevoked_check_is_in_memory(self):
+        refresh = issue_tokens_for_user(self.user)['refresh']
+        revocation.is_revoked('warm-up')
+        with self.assertNumQueries(0):
+            revocation.RevocableRefreshToken(refresh)
+
+    def test_revocations_from_other_processes_are_picked_up(self):
+        revocations = revocation.RevocationList(refresh_interval=0)
+        self.assertFalse(revocations.is_revoked('foreign'))
+        RevokedToken.objects.create(jti='foreign', expires_at=timezone.now() + timedelta(days=1))
+        self.assertTrue(revocations.is_revoked('foreign'))
+
+    def test_late_commit_of_lower_id_is_picked_up(self):
+        revocations = revocation.RevocationList(refresh_interval=0)
+        expires = timezone.now() + timedelta(days=1)
+        late = RevokedToken.objects.create(jti='late', expires_at=expires)
+        RevokedToken.objects.create(jti='early', expires_at=expires)
+        # строки с меньшим id ещё "нет": её транзакция закоммитится позже
+        late_row = {'pk': late.pk, 'jti': late.jti, 'expires_at': late.expires_at}
+        late.delete()
+        self.assertTrue(revocations.is_revoked('early'))
+        self.assertFalse(revocations.is_revoked('late'))
+        RevokedToken.objects.create(**late_row)
+        self.assertTrue(revocations.is_revoked('late'))
+        self.assertEqual(revocations.stats()['bloom_items'], 2)
+
+    def test_purge_removes_only_expired(self):
+        now = timezone.now()
+        for i in range(5):
+            RevokedToken.objects.create(jti=f'old-{i}', expires_at=now - timedelta(days=1))
+        RevokedToken.objects.create(jti='live', expires_at=now + timedelta(days=1))
+        call_command('purge_revoked_tokens', '--chunk-size', '2', '--sleep', '0', stdout=StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class TokenRefreshTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        revocation.reset()
+        self.user = User.objects.create_user(email='refresh@example.com', username='refresh@example.com',
+                                             password='x')
+
+    def refresh(self, token, **extra):
+        return self.client.post(reverse('accounts_api:refresh'), {'refresh': token}, format='json', **extra)
+
+    def verify(self, token):
+        return self.client.post(reverse('accounts_api:verify'), {'token': token}, format='json')
+
+    def test_rotation_issues_new_pair_once(self):
+        tokens = issue_tokens_for_user(self.user)
+        # истёкший access в заголовке не мешает обновлению
+        resp = self.refresh(tokens['refresh'], HTTP_AUTHORIZATION='Bearer expired')
+        self.assertEqual(resp.status_code, 200)
+        fresh = resp.data['tokens']
+        self.assertNotEqual(fresh['refresh'], tokens['refresh'])
+        me = self.client.get(reverse('accounts_api:me'), HTTP_AUTHORIZATION=f"Bearer {fresh['access']}")
+        self.assertEqual(me.data['email'], 'refresh@example.com')
+
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+        self.assertEqual(self.refresh(fresh['refresh']).status_code, 200)
+
+    def test_sliding_lifetime_capped_by_session(self):
+        old = revocation.RevocableRefreshToken(issue_tokens_for_user(self.user)['refresh'])
+        with override_settings(TOKEN_SESSION_MAX_LIFETIME=timedelta(hours=1)):
+            resp = self.refresh(str(old))
+        new = revocation.RevocableRefreshToken(resp.data['tokens']['refresh'])
+        self.assertEqual(new['auth_time'], old['auth_time'])
+        self.assertLessEqual(new['exp'], old['auth_time'] + 3600)
+
+        stale = revocation.RevocableRefreshToken.for_user(self.user)
+        add_user_claims(stale, self.user)
+        stale['auth_time'] = stale['iat'] - 31 * 24 * 3600
+        self.assertEqual(self.refresh(str(stale)).status_code, 401)
+
+    def test_version_bump_blocks_refresh(self):
+        tokens = issue_tokens_for_user(self.user)
+        self.user.role = User.Roles.MANAGER
+        self.user.save()
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+        self.assertEqual(self.verify(tokens['access']).status_code, 401)
+
+    def test_verify(self):
+        tokens = issue_tokens_for_user(self.user)
+        self.assertEqual(self.verify(tokens['access']).status_code, 200)
+        self.assertEqual(self.verify(tokens['refresh']).status_code, 200)
+        self.assertEqual(self.verify('garbage').status_code, 401)
+        self.refresh(tokens['refresh'])
+        self.assertEqual(self.verify(tokens['refresh']).status_code, 401)
+
+    def test_refresh_and_login_counted(self):
+        before = audit.counts()
+        self.refresh(issue_tokens_for_user(self.user)['refresh'])
+        self.refresh('garbage')
+        after = audit.counts()
+        self.assertEqual(after[audit.Kinds.REFRESH, True] - before.get((audit.Kinds.REFRESH, True), 0), 1)
+        self.assertEqual(after[audit.Kinds.REFRESH, False] - before.get((audit.Kinds.REFRESH, False), 0), 1)
+
+
+class UserListAPITests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        base = timezone.now()
+        roles = [User.Roles.STUDENT, User.Roles.APPLICANT]
+        User.objects.bulk_create([
+            User(email=f'user{i:02}@example.com', username=f'user{i:02}@example.com',
+                 student_full_name=f'Ученик {i:02}', role=roles[i % 2],
+                 date_joined=base - timedelta(minutes=i // 2))  # по два на минуту: проверяем связку с id
+            for i in range(25)
+        ])
+        self.manager = User.objects.create(
+            email='manager@example.com', username='manager@example.com', role=User.Roles.MANAGER,
+            date_joined=base - timedelta(days=1),
+        )
+        self.auth = f"Bearer {issue_tokens_for_user(self.manager)['access']}"
+
+    def get(self, url, **params):
+        return self.client.get(url, params, HTTP_AUTHORIZATION=self.auth)
+
+    def test_applicant_is_forbidden(self):
+        applicant = User.objects.get(email='user01@example.com')
+        resp = self.client.get(
+            reverse('accounts_api:users'),
+            HTTP_AUTHORIZATION=f"Bearer {issue_tokens_for_user(applicant)['access']}",
+        )
+        self.assertEqual(resp.status_code, 403)
+
+    def test_walks_all_pages_without_gaps_or_count(self):
+        self.get(reverse('accounts_api:users'))  # версия токена попала в кеш
+        seen = []
+        url, params = reverse('accounts_api:users'), {'limit': 4}
+        while url:
+            with self.assertNumQueries(1):
+                resp = self.get(url, **params)
+            self.assertEqual(resp.status_code, 200)
+            seen += [row['email'] for row in resp.data['results']]
+            url, params = resp.data['next'], {}
+        expected = list(User.objects.order_by('-date_joined', '-id').values_list('email', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_filters(self):
+        resp = self.get(reverse('accounts_api:users'), role='STUDENT', limit=100)
+        self.assertEqual(len(resp.data['results']), 13)
+        self.assertEqual(self.get(reverse('accounts_api:users'), role='NOPE').status_code, 400)
+        resp = self.get(reverse('accounts_api:users'), search='USER1')
+        self.assertEqual(len(resp.data['results']), 10)
+        resp = self.get(reverse('accounts_api:users'), search='Ученик 2')
+        self.assertEqual(len(resp.data['results']), 5)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.get(reverse('accounts_api:users'), cursor='garbage').status_code, 404)
+
+
+class UserExportTests(APITestCase):
+    setUp = UserListAPITests.setUp
+    get = UserListAPITests.get
+
+    def export(self, fmt, **params):
+        resp = self.get(reverse('accounts_api:users_export', args=[fmt]), **params)
+        self.assertTrue(resp.streaming)
+        return b''.join(resp.streaming_content).decode()
+
+    def test_csv_in_join_order(self):
+        lines = self.export('csv').splitlines()
+        self.assertEqual(lines[0], ','.join(exporting.FIELDS))
+        expected = list(User.objects.order_by('date_joined', 'id').values_list('email', flat=True))
+        self.assertEqual([line.split(',')[1] for line in lines[1:]], expected)
+
+    def test_csv_neutralizes_formulas(self):
+        User.objects.filter(email='manager@example.com').update(
+            student_full_name='=HYPERLINK("http://evil.example","x")', phone='+79990000000',
+        )
+        rows = list(csv.DictReader(self.export('csv').splitlines()))
+        row = next(row for row in rows if row['email'] == 'manager@example.com')
+        self.assertEqual(row['student_full_name'], '\'=HYPERLINK("http://evil.example","x")')
+        self.assertEqual(row['phone'], "'+79990000000")
+        # в JSONL значения как есть
+        jsonl = [json.loads(line) for line in self.export('jsonl').splitlines()]
+        self.assertIn('+79990000000', {row['phone'] for row in jsonl})
+
+    def test_jsonl_filters(self):
+        rows = [json.loads(line) for line in self.export('jsonl', role='STUDENT').splitlines()]
+        self.assertEqual(len(rows), 13)
+        self.assertEqual({row['role'] for row in rows}, {'STUDENT'})
+        day = (timezone.now() - timedelta(days=1)).date().isoformat()
+        rows = self.export('jsonl', joined_from=day, joined_to=day).splitlines()
+        self.assertEqual([json.loads(line)['email'] for line in rows], ['manager@example.com'])
+
+    def test_bad_params(self):
+        self.assertEqual(self.get(reverse('accounts_api:users_export', args=['xml'])).status_code, 400)
+        url = reverse('accounts_api:users_export', args=['csv'])
+        self.assertEqual(self.get(url, role='NOPE').status_code, 400)
+        self.assertEqual(self.get(url, joined_from='вчера').status_code, 400)
+
+    def test_rows_read_in_keyset_chunks(self):
+        with self.assertNumQueries(3):  # 26 строк пачками по 10
+            rows = list(exporting.iter_rows(User.objects.all(), chunk_size=10))
+        self.assertEqual([row[0] for row in rows],
+                         list(User.objects.order_by('date_joined', 'id').values_list('id', flat=True)))
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile(suffix='.jsonl') as f:
+            call_command('export_users', format='jsonl', role='APPLICANT', chunk_size=5,
+                         output=f.name, stderr=StringIO())
+            self.assertEqual(len(f.read().splitlines()), 12)
+
+
+class BulkUserUpdateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.bulk_create([
+            User(email=f'cohort{i}@example.com', username=f'cohort{i}@example.com',
+                 role=User.Roles.STUDENT if i < 2 else User.Roles.APPLICANT)
+            for i in range(7)
+        ])
+        self.admin = User.objects.create(email='boss@example.com', username='boss@example.com',
+                                         role=User.Roles.ADMIN, is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def post(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('accounts_api:users_bulk_update'), data, format='json')
+
+    def me(self, tokens):
+        # отдельный клиент: у self.client принудительно вошёл админ
+        return self.client_class().get(reverse('accounts_api:me'), HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+    def test_promote_cohort_by_filter(self):
+        applicant = User.objects.get(email='cohort5@example.com')
+        old_tokens = issue_tokens_for_user(applicant)
+        self.assertEqual(self.me(old_tokens).status_code, 200)  # версия попала в кеш
+
+        resp = self.post(filter={'role': 'APPLICANT'}, role='STUDENT')
+        self.assertEqual(resp.data, {'matched': 5, 'updated': 5, 'unchanged': 0})
+        self.assertEqual(User.objects.filter(role=User.Roles.STUDENT).count(), 7)
+
+        self.assertEqual(self.me(old_tokens).status_code, 401)
+        applicant.refresh_from_db()
+        self.assertEqual(applicant.token_version, 1)
+        with self.assertNumQueries(0):  # новая версия уже в кеше
+            resp = self.me(issue_tokens_for_user(applicant))
+        self.assertEqual(resp.data['role'], User.Roles.STUDENT)
+
+    def test_counts_unchanged_and_skips_self(self):
+        ids = list(User.objects.values_list('pk', flat=True))
+        resp = self.post(ids=ids, role='STUDENT')
+        self.assertEqual(resp.data, {'matched': 7, 'updated': 5, 'unchanged': 2})
+        self.assertEqual(User.objects.get(pk=self.admin.pk).role, User.Roles.ADMIN)
+        self.assertEqual(User.objects.filter(token_version=1).count(), 5)
+
+    def test_staff_cannot_grant_admin_or_touch_superusers(self):
+        root = User.objects.create(email='root@example.com', username='root@example.com',
+                                   role=User.Roles.ADMIN, is_staff=True, is_superuser=True)
+        other_admin = User.objects.create(email='a2@example.com', username='a2@example.com',
+                                          role=User.Roles.ADMIN, is_staff=True)
+        resp = self.post(ids=[User.objects.get(email='cohort0@example.com').pk], role='ADMIN')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('role', resp.data)
+
+        resp = self.post(ids=[root.pk, other_admin.pk], is_active=False)
+        self.assertEqual(resp.data['matched'], 0)
+        self.assertTrue(User.objects.get(pk=root.pk).is_active)
+        self.assertTrue(User.objects.get(pk=other_admin.pk).is_active)
+
+        # суперпользователь назначает ADMIN, но других суперпользователей тоже не меняет
+        self.client.force_authenticate(root)
+        resp = self.post(ids=[User.objects.get(email='cohort0@example.com').pk, root.pk], role='ADMIN')
+        self.assertEqual(resp.data, {'matched': 1, 'updated': 1, 'unchanged': 0})
+
+    def test_deactivate_revokes_tokens(self):
+        user = User.objects.get(email='cohort0@example.com')
+        tokens = issue_tokens_for_user(user)
+        self.assertEqual(self.me(tokens).status_code, 200)
+        self.assertEqual(self.post(ids=[user.pk], is_active=False).data['updated'], 1)
+        self.assertEqual(self.me(tokens).status_code, 401)
+
+    def test_chunks(self):
+        # 4 пачки по 2 id: выборка id, затем в точке сохранения SELECT изменяемых, UPDATE, новые версии
+        with self.assertNumQueries(4 * (1 + 2 + 3)):
+            report = bulk.update_users(User.objects.exclude(pk=self.admin.pk), role=User.Roles.TEACHER,
+                                       chunk_size=2)
+        self.assertEqual(report['updated'], 7)
+
+    def test_validation(self):
+        self.assertEqual(self.post(role='STUDENT').status_code, 400)
+        self.assertEqual(self.post(filter={}, role='STUDENT').status_code, 400)
+        self.assertEqual(self.post(ids=[1]).status_code, 400)
+        self.assertEqual(self.post(ids=[1], role='KING').status_code, 400)
+        self.client.force_authenticate(User.objects.get(email='cohort0@example.com'))
+        self.assertEqual(self.post(ids=[1], role='STUDENT').status_code, 403)
+
+
+@skipUnlessDBFeature('supports_expression_indexes')
+class UserIndexTests(TestCase):
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor not in ('sqlite', 'mysql'):
+            self.skipTest('план запроса проверяем только на SQLite и MySQL')
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_role_listing_uses_role_joined_index(self):
+        qs = User.objects.filter(role=User.Roles.STUDENT).order_by('-date_joined', '-id')
+        self.assertUsesIndex(qs, 'accounts_user_role_joined_idx')
+
+    def test_whitelist_superuser_lookup_uses_email_index(self):
+        # отдельный индекс (is_superuser, email) не нужен: поиск по нескольким email
+        # идёт по уникальному индексу email, is_superuser проверяется на найденных строках
+        qs = User.objects.filter(email__in=['a1@example.com', 'a2@example.com'], is_superuser=True)
+        if connection.vendor == 'sqlite':
+            # индекс UNIQUE-поля в SQLite безымянный: sqlite_autoindex_<таблица>_<N>
+            self.assertRegex(qs.explain(), r'USING INDEX sqlite_autoindex_accounts_user_\d+ \(email=\?\)')
+        else:
+            self.assertUsesIndex(qs, 'email')
+
+    def test_case_insensitive_lookup_uses_lower_email_index(self):
+        self.assertUsesIndex(User.objects.filter(email__lower='x@example.com'), 'accounts_user_email_lower_uniq')
+
+    def test_email_case_is_normalized(self):
+        user = User.objects.create_user(email='Mixed@Example.COM', username='Mixed@Example.COM', password='x')
+        self.assertEqual((user.email, user.username), ('mixed@example.com', 'mixed@example.com'))
+        self.assertEqual(User.objects.get_by_natural_key('MIXED@example.com'), user)
+        with self.assertRaises(IntegrityError):
+            User.objects.bulk_create([User(email='MIXED@EXAMPLE.COM', username='other')])
+
+    @override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+    def test_authenticate_ignores_email_case(self):
+        User.objects.create_user(email='case@example.com', username='case@example.com', password='pass12345')
+        self.assertIsNotNone(authenticate(username='Case@Example.com', password='pass12345'))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SyntheticUsersTests(TestCase):
+    def rows(self, count, start=0):
+        until = timezone.localdate()
+        return [
+            (u.email, u.student_full_name, u.role, u.date_joined, u.password)
+            for u in synthetic.iter_users(count, ['h0', 'h1'], seed=5, start=start, until=until)
+        ]
+
+    def test_rows_are_deterministic(self):
+        self.assertEqual(self.rows(8), self.rows(8))
+        self.assertEqual(self.rows(5, start=3), self.rows(8)[3:])
+        self.assertEqual([row[4] for row in self.rows(3)], ['h0', 'h1', 'h0'])
+
+    @override_settings(DEBUG=True)
+    def test_command_creates_users_in_chunks(self):
+        out = StringIO()
+        call_command('generate_users', '300', '--seed', '1', '--chunk-size', '100', stdout=out)
+        self.assertEqual(User.objects.count(), 300)
+        self.assertGreater(len(set(User.objects.values_list('role', flat=True))), 2)
+        user = User.objects.get(email='synthetic-1-7@synthetic.test')
+        self.assertTrue(user.check_password(synthetic.password_for(7)))
+        self.assertFalse(user.check_password(synthetic.password_for(8)))
+
+        with self.assertRaises(CommandError):
+            call_command('generate_users', '10', '--seed', '1', '--start', '295', stdout=out)
+        call_command('generate_users', '10', '--seed', '1', '--start', '300', stdout=out)
+        self.assertEqual(User.objects.count(), 310)
+        self.assertTrue(User.objects.filter(role=User.Roles.MANAGER).exists())
+        self.assertFalse(User.objects.filter(is_staff=True).exists())
+
+    def test_command_refuses_without_debug(self):
+        with self.assertRaisesMessage(CommandError, '--i-know'):
+            call_command('generate_users', '10', stdout=StringIO())
+        self.assertFalse(User.objects.exists())
+        call_command('generate_users', '10', '--i-know', stdout=StringIO())
+        self.assertEqual(User.objects.count(), 10)
+
+    @override_settings(DEBUG=True)
+    def test_command_validates_days(self):
+        with self.assertRaisesMessage(CommandError, '--days'):
+            call_command('generate_users', '10', '--days', '0', stdout=StringIO())
+
+    def test_superusers_only_on_request(self):
+        users = list(synthetic.iter_users(2000, ['h'], privileged=True))
+        self.assertTrue(any(u.is_superuser for u in users))
+        self.assertTrue(all(u.is_staff for u in users if u.role == User.Roles.MANAGER))
+        plain = list(synthetic.iter_users(2000, ['h']))
+        self.assertFalse(any(u.is_superuser or u.is_staff for u in plain))
+        self.assertNotIn(User.Roles.ADMIN, {u.role for u in plain})
+        self.assertIn(User.Roles.ADMIN, {u.role for u in users})
+
+
+class BenchmarkSummaryTests(TestCase):
+    def test_percentiles_and_compare(self):
+        summary = benchmarks.summarize([i / 1000 for i in range(1, 101)], [2] * 100, 1, 2.0, 4)
+        self.assertEqual(summary['latency_ms']['p50'], 50)
+        self.assertEqual(summary['latency_ms']['p99'], 99)
+        self.assertEqual(summary['throughput_rps'], 50)
+        self.assertEqual(summary['queries_per_request'], 2)
+
+        slower = json.loads(json.dumps(summary))
+        slower['latency_ms']['p50'] = 100
+        lines = benchmarks.compare({'scenarios': {'api_me': summary}}, {'scenarios': {'api_me': slower}})
+        self.assertIn('+100.0%', lines[0])
+
+
+class SlidingWindowCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.counter = throttling.SlidingWindowCounter(cache, 'test', window=100)
+
+    def test_previous_window_decays(self):
+        for _ in range(10):
+            self.counter.hit('k', now=1050)
+        self.assertEqual(self.counter.count('k', now=1050), 10)
+        self.assertEqual(self.counter.count('k', now=1125), 7.5)  # 10 * (1 - 0.25)
+        self.assertEqual(self.counter.count('k', now=1250), 0)
+
+    def test_wait(self):
+        for _ in range(10):
+            self.counter.hit('k', now=1050)
+        # оценка станет < 5, когда от прошлого окна останется меньше половины
+        self.assertAlmostEqual(self.counter.wait('k', 5, now=1050), 100)
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS,
+    LOGIN_THROTTLE={'CACHE': 'default', 'WINDOW': 60, 'IP_LIMIT': 100, 'EMAIL_LIMIT': 3},
+)
+class LoginThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(email='victim@example.com', username='victim@example.com', password='pass12345')
+
+    def login(self, password='wrong', email='Victim@example.com', **extra):
+        return self.client.post(reverse('accounts_api:login'), {'email': email, 'password': password},
+                                format='json', **extra)
+
+    def test_rejects_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 400)
+        completed = hashing.stats()['completed']
+        rejected = throttling.get_login_throttle().stats()['rejected']['email']
+        resp = self.login(password='pass12345')
+        self.assertEqual(resp.status_code, 429)
+        self.assertIn('Retry-After', resp)
+        self.assertEqual(hashing.stats()['completed'], completed)
+        self.assertEqual(throttling.get_login_throttle().stats()['rejected']['email'], rejected + 1)
+        # другой email с того же IP пускаем
+        self.assertEqual(self.login(email='other@example.com').status_code, 400)
+
+    @override_settings(LOGIN_THROTTLE={'CACHE': 'default', 'WINDOW': 60, 'IP_LIMIT': 3, 'EMAIL_LIMIT': 100})
+    def test_forged_forwarded_for_does_not_reset_ip_counter(self):
+        for i in range(3):
+            resp = self.login(email=f'user{i}@example.com', HTTP_X_FORWARDED_FOR=f'203.0.113.{i}')
+            self.assertEqual(resp.status_code, 400)
+        resp = self.login(email='user9@example.com', HTTP_X_FORWARDED_FOR='198.51.100.7')
+        self.assertEqual(resp.status_code, 429)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1})
+    def test_forwarded_for_trusted_behind_configured_proxy(self):
+        request = self.client.request(HTTP_X_FORWARDED_FOR='198.51.100.7, 203.0.113.1').wsgi_request
+        self.assertEqual(throttling.client_ip(request), '203.0.113.1')
+        self.assertEqual(audit._ip(request), '203.0.113.1')
+
+    def test_forwarded_for_ignored_without_proxies(self):
+        request = self.client.request(HTTP_X_FORWARDED_FOR='198.51.100.7').wsgi_request
+        self.assertEqual(throttling.client_ip(request), '127.0.0.1')
+        self.assertEqual(audit._ip(request), '127.0.0.1')
+
+    def test_form_reports_throttling_as_error(self):
+        request = self.client.request().wsgi_request
+        for _ in range(3):
+            LoginForm({'email': 'victim@example.com', 'password': 'x'}, request=request).is_valid()
+        form = LoginForm({'email': 'victim@example.com', 'password': 'pass12345'}, request=request)
+        self.assertFalse(form.is_valid())
+        self.assertIn('Слишком много попыток', form.non_field_errors()[0])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, METRICS={'ENABLED': True, 'ALLOWED_IPS': ['127.0.0.1']})
+class MetricsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        for histogram in instrumentation.HISTOGRAMS:
+            histogram.clear()
+        User.objects.create_user(email='m@example.com', username='m@example.com', password='pass12345')
+
+    def test_login_is_measured(self):
+        self.client.post(reverse('accounts_api:login'), {'email': 'm@example.com', 'password': 'pass12345'},
+                         format='json')
+        resp = self.client.get(reverse('metrics'))
+        self.assertEqual(resp.status_code, 200)
+        body = resp.content.decode()
+        self.assertIn('school_request_duration_seconds_count{view="accounts_api:login"} 1', body)
+        self.assertIn('school_hashing_queue_depth 0', body)
+        series = instrumentation.HASH_SECONDS._series['accounts_api:login']
+        self.assertGreater(series['sum'], 0)
+        self.assertGreaterEqual(instrumentation.QUERIES._series['accounts_api:login']['sum'], 1)
+        self.assertGreater(instrumentation.SERIALIZER_SECONDS._series['accounts_api:login']['sum'], 0)
+        self.assertIn('school_db_requests_reused_total{database="default"}', body)
+
+    def test_metrics_forbidden_for_other_hosts(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.5').status_code, 403)
+
+    @override_settings(METRICS={'ENABLED': True, 'ALLOWED_IPS': ['127.0.0.1'], 'TOKEN': 'scrape-secret'})
+    def test_token_required_when_configured(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        resp = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(resp.status_code, 200)
+
+    @override_settings(PASSWORD_HASHING={'BACKEND': 'thread', 'WORKERS': 2, 'QUEUE_SIZE': 16})
+    def test_hash_time_excludes_queue_wait(self):
+        metrics, token = instrumentation.start_request()
+        with mock.patch.object(hashing, '_make_password', side_effect=lambda password: time.sleep(0.02)):
+            started = time.perf_counter()
+            hashing.make_passwords('a', 'b', 'c', 'd')  # 4 задачи на 2 воркера: две ждут очереди
+            elapsed = time.perf_counter() - started
+        instrumentation.finish_request(token, metrics, 'test', elapsed)
+        self.assertGreater(metrics.hash_wait, 0.015)
+        self.assertGreaterEqual(metrics.hash, 0.08)
+        self.assertIn('school_request_hash_wait_seconds_count{view="test"} 1', instrumentation.render_prometheus())
+
+    @override_settings(METRICS={'ENABLED': False})
+    def test_disabled(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+
+CALIBRATED_HASHERS = ['accounts.hashers.CalibratedPBKDF2PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=CALIBRATED_HASHERS, PASSWORD_PBKDF2_ITERATIONS=1000)
+class CalibratedHasherTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=500):
+            self.user = User.objects.create_user(
+                email='old@example.com', username='old@example.com', password='pass12345',
+            )
+            self.user.parent_password_hash = hashing.make_password('parent-pass')
+            self.user.save()
+
+    def test_iterations_come_from_settings(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$500$'))
+        self.assertTrue(hashing.make_password('x').startswith('pbkdf2_sha256$1000$'))
+
+    def test_login_rehashes_with_new_parameters(self):
+        version = User.objects.get(pk=self.user.pk).token_version
+        resp = self.client.post(reverse('accounts_api:login'),
+                                {'email': 'old@example.com', 'password': 'pass12345'}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertEqual(user.token_version, version)  # перехеширование — не смена пароля
+
+    def test_parent_password_rehashed_on_check(self):
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(user.check_parent_password('wrong'))
+        self.assertTrue(user.check_parent_password('parent-pass'))
+        user.refresh_from_db()
+        self.assertTrue(user.parent_password_hash.startswith('pbkdf2_sha256$1000$'))
+
+    def test_calibrate_command_never_goes_below_django_defaults(self):
+        out, err = StringIO(), StringIO()
+        call_command('calibrate_hashers', '--algorithm', 'pbkdf2', '--target-ms', '1', '--rounds', '1',
+                     stdout=out, stderr=err)
+        self.assertIn(f'PASSWORD_PBKDF2_ITERATIONS={PBKDF2PasswordHasher.iterations}', out.getvalue())
+        self.assertIn('не уложиться', err.getvalue())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SessionStorageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(email='form@example.com', username='form@example.com', password='pass12345')
+
+    def login(self):
+        return self.client.post(reverse('accounts:login'), {'email': 'form@example.com', 'password': 'pass12345'})
+
+    def test_flash_message_stored_in_cookie(self):
+        resp = self.login()
+        self.assertEqual(resp.status_code, 302)
+        self.assertIn('messages', resp.cookies)
+
+    @override_settings(SESSION_ENGINE=settings.SESSION_ENGINES['signed_cookies'])
+    def test_signed_cookie_sessions_skip_session_table(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.login().status_code, 302)
+            # уже вошли — view читает только пользователя
+            self.assertEqual(self.client.get(reverse('accounts:login')).status_code, 302)
+        self.assertFalse([q for q in captured if 'django_session' in q['sql']])
+
+    @override_settings(SESSION_ENGINE=settings.SESSION_ENGINES['cached_db'])
+    def test_cached_db_sessions_read_from_cache(self):
+        self.login()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse('accounts:login')).status_code, 302)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class PagesOnlyMiddlewareTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='pages@example.com', username='pages@example.com',
+                                             password='pass12345')
+
+    def test_api_skips_session_layers(self):
+        # cookie сессии браузер шлёт и в API — её не читаем
+        self.client.force_login(self.user)
+        token = issue_tokens_for_user(self.user)['access']
+        with CaptureQueriesContext(connection) as captured:
+            resp = self.client.get(reverse('accounts_api:me'), HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse([q for q in captured if 'django_session' in q['sql']])
+        self.assertFalse(hasattr(resp.wsgi_request, 'session'))
+        self.assertFalse(hasattr(resp.wsgi_request, '_messages'))
+        self.assertNotIn(settings.CSRF_COOKIE_NAME, resp.cookies)
+
+    def test_api_post_needs_no_csrf_token(self):
+        client = self.client_class(enforce_csrf_checks=True)
+        resp = client.post(reverse('accounts_api:login'), {'email': 'pages@example.com', 'password': 'pass12345'},
+                           format='json')
+        self.assertEqual(resp.status_code, 200)
+
+    def test_pages_keep_session_and_csrf(self):
+        data = {'email': 'pages@example.com', 'password': 'pass12345'}
+        resp = self.client_class(enforce_csrf_checks=True).post(reverse('accounts:login'), data)
+        self.assertEqual(resp.status_code, 403)
+        resp = self.client_class().post(reverse('accounts:login'), data)
+        self.assertEqual(resp.status_code, 302)
+        self.assertTrue(resp.wsgi_request.user.is_authenticated)
+        self.assertIn(settings.SESSION_COOKIE_NAME, resp.cookies)
+        self.assertIn('messages', resp.cookies)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, DATABASE_ROUTING={'REPLICAS': ['replica']})
+class ReplicaRouterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = routing.PrimaryReplicaRouter()
+
+    def test_reads_go_to_replica_until_write(self):
+        with routing.request_scope():
+            self.assertEqual(self.router.db_for_read(User), 'replica')
+            self.assertEqual(self.router.db_for_write(User), 'default')
+            self.assertEqual(self.router.db_for_read(User), 'default')
+        with routing.request_scope():
+            self.assertEqual(self.router.db_for_read(User), 'replica')
+            self.assertEqual(self.router.db_for_read(RevokedToken), 'default')
+
+    @override_settings(DATABASE_ROUTING={'REPLICAS': []})
+    def test_no_replicas_means_primary(self):
+        with routing.request_scope():
+            self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_registered_user_sticks_to_primary(self):
+        resp = self.client.post(reverse('accounts_api:register'), {
+            'email': 'fresh@example.com', 'phone': '', 'student_full_name': 'Новиков Олег',
+            'parent_full_name': 'Новикова Анна', 'password': 'Xk29-lqP!mz', 'parent_password': 'Parent-9931',
+        }, format='json')
+        self.assertEqual(resp.status_code, 201)
+        with routing.request_scope():
+            routing.pin_if_sticky(resp.data['user']['id'])
+            self.assertEqual(self.router.db_for_read(User), 'default')
+        with routing.request_scope():
+            routing.pin_if_sticky(resp.data['user']['id'] + 1)
+            self.assertEqual(self.router.db_for_read(User), 'replica')
+
+
+    def test_token_version_read_from_primary(self):
+        user = User.objects.create_user(email='v@example.com', username='v@example.com', password='pass12345')
+        cache.clear()
+        with routing.request_scope():
+            # алиаса replica в тестах нет: запрос к реплике упал бы
+            self.assertEqual(get_token_version(user.pk), 0)
+            self.assertFalse(routing.is_pinned())
+
+    def test_version_bump_sticks_to_primary(self):
+        user = User.objects.create_user(email='v@example.com', username='v@example.com', password='pass12345')
+        other = User.objects.create_user(email='w@example.com', username='w@example.com', password='pass12345')
+        cache.clear()
+        user.role = User.Roles.STUDENT
+        user.save()
+        bulk.update_users(User.objects.filter(pk=other.pk), is_active=False)
+        for user_id in (user.pk, other.pk):
+            with routing.request_scope():
+                routing.pin_if_sticky(user_id)
+                self.assertEqual(self.router.db_for_read(User), 'default')
+
+
+@override_settings(JWT_AUTH_CACHE={'ENABLED': False})
+class DatabaseStatsTests(APITestCase):
+    def test_requests_reuse_open_connection(self):
+        cache.clear()
+        admin = User.objects.create_superuser(email='db@example.com', username='db@example.com', password='pass12345')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {issue_tokens_for_user(admin)['access']}")
+        before = self.client.get(reverse('accounts_api:db_stats')).data['databases']['default']
+        after = self.client.get(reverse('accounts_api:db_stats')).data['databases']['default']
+        # соединение тестовой БД открыто заранее — оба запроса (поиск пользователя) на нём
+        self.assertEqual(after['requests_reused'], before['requests_reused'] + 1)
+        self.assertEqual(after['opened'], before['opened'])
+        self.assertGreaterEqual(after['open'], 1)
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS,
+    ADMIN_SEED_EMAILS=['a1@example.com', 'a2@example.com', 'a3@example.com'],
+)
+class AdminSlotTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def admin_login(self, email, password='pass12345'):
+        return self.client.post(reverse('accounts_api:admin_login'), {'email': email, 'password': password},
+                                format='json')
+
+    def test_only_two_slots(self):
+        self.assertEqual(self.admin_login('a1@example.com').status_code, 200)
+        self.assertEqual(self.admin_login('a2@example.com').status_code, 200)
+        self.assertEqual(self.admin_login('a3@example.com').status_code, 403)
+        self.assertFalse(User.objects.filter(email='a3@example.com').exists())
+        self.assertEqual(sorted(AdminSlot.objects.values_list('number', flat=True)), [1, 2])
+
+    def test_admin_login_single_query(self):
+        self.admin_login('a1@example.com')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.admin_login('a1@example.com').status_code, 200)
+        self.assertEqual(self.admin_login('a1@example.com', 'wrong').status_code, 400)
+
+    def test_exhausted_rejected_from_cache(self):
+        self.admin_login('a1@example.com')
+        self.admin_login('a2@example.com')
+        User.objects.create_user(email='a3@example.com', username='a3@example.com', password='pass12345')
+        admin_slots.taken_count()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.admin_login('a3@example.com').status_code, 403)
+
+    def test_stale_count_does_not_oversubscribe(self):
+        self.admin_login('a1@example.com')
+        self.admin_login('a2@example.com')
+        User.objects.create_user(email='a3@example.com', username='a3@example.com', password='pass12345')
+        cache.set(admin_slots.CACHE_KEY, 0)
+        self.assertEqual(self.admin_login('a3@example.com').status_code, 403)
+        self.assertFalse(User.objects.get(email='a3@example.com').is_superuser)
+
+    def _race_same_email(self, password):
+        real_promote = admin_slots._promote
+
+        def promote(user):
+            if user.pk is None:
+                # параллельный первый вход с тем же email успел сохранить пользователя
+                real_promote(User(email=user.email, username=user.email, password=make_password(password)))
+            real_promote(user)
+        return mock.patch.object(admin_slots, '_promote', side_effect=promote)
+
+    def test_concurrent_first_login_same_email(self):
+        with self._race_same_email('pass12345'):
+            resp = self.admin_login('a1@example.com')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(User.objects.filter(email='a1@example.com').count(), 1)
+        self.assertEqual(AdminSlot.objects.count(), 1)
+
+    def test_concurrent_first_login_same_email_checks_password(self):
+        with self._race_same_email('other-pass'):
+            resp = self.admin_login('a1@example.com')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_demotion_frees_slot(self):
+        self.admin_login('a1@example.com')
+        self.admin_login('a2@example.com')
+        user = User.objects.get(email='a1@example.com')
+        user.is_superuser = False
+        user.save()
+        self.assertEqual(self.admin_login('a3@example.com').status_code, 200)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, AUDIT_LOG={'BACKGROUND': False, 'MAX_QUEUE': 2})
+class AuditLogTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        audit.reset()
+        self.user = User.objects.create_user(email='au@example.com', username='au@example.com', password='pass12345')
+
+    def login(self, password):
+        return self.client.post(reverse('accounts_api:login'), {'email': 'au@example.com', 'password': password},
+                                format='json', HTTP_USER_AGENT='tests')
+
+    def test_login_events_written_in_batch(self):
+        self.login('wrong')
+        with self.assertNumQueries(1):  # только чтение пользователя, журнал не пишется
+            self.login('pass12345')
+        self.assertFalse(AuthEvent.objects.exists())
+        with self.assertNumQueries(1):
+            audit.get_writer().flush()
+        events = list(AuthEvent.objects.order_by('id').values_list('kind', 'success', 'user_id', 'user_agent'))
+        self.assertEqual(events, [
+            ('LOGIN', False, None, 'tests'),
+            ('LOGIN', True, self.user.pk, 'tests'),
+        ])
+
+    def test_full_queue_drops_events(self):
+        for _ in range(3):
+            self.login('wrong')
+        stats = audit.stats()
+        self.assertEqual((stats['queued'], stats['dropped']), (2, 1))
+
+
+class AuditWriterThreadTests(TransactionTestCase):
+    def test_background_flush_and_stop(self):
+        writer = audit.AuditWriter(batch_size=2, flush_interval=0.05)
+        for i in range(3):
+            writer.add(AuthEvent(kind=AuthEvent.Kinds.LOGIN, email=f'{i}@example.com'))
+        deadline = time.monotonic() + 5
+        while writer.stats()['written'] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        writer.add(AuthEvent(kind=AuthEvent.Kinds.LOGOUT))
+        writer.stop()
+        self.assertEqual(AuthEvent.objects.count(), 4)
+        self.assertEqual(writer.stats()['failed'], 0)
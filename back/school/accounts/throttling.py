@@ -0,0 +1,181 @@
+# accounts/throttling.py
+"""
+Ограничение попыток входа до вызова authenticate().
+
+Каждая попытка входа стоит полного PBKDF2, поэтому перебор паролей душим раньше:
+счётчики скользящего окна по IP и по email (в нижнем регистре). Окно
+приближается двумя соседними фиксированными окнами: prev * (1 - доля прошедшего) + curr —
+две операции с кешем на проверку, без хранения журнала попыток.
+
+Настройки (settings.LOGIN_THROTTLE):
+    CACHE       — алиас кеша из CACHES (по умолчанию "default", т.е. память процесса)
+    WINDOW      — длина окна, секунды
+    IP_LIMIT    — попыток с одного IP за окно
+    EMAIL_LIMIT — попыток на один email за окно
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+
+DEFAULTS = {
+    "CACHE": "default",
+    "WINDOW": 300,
+    "IP_LIMIT": 50,
+    "EMAIL_LIMIT": 10,
+}
+
+
+class SlidingWindowCounter:
+    def __init__(self, cache, prefix, window):
+        self.cache = cache
+        self.prefix = prefix
+        self.window = window
+
+    def _keys(self, key, now):
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        index = int(now // self.window)
+        return (
+            f"{self.prefix}:{digest}:{index}",
+            f"{self.prefix}:{digest}:{index - 1}",
+            (now % self.window) / self.window,
+        )
+
+    def _counts(self, key, now):
+        current_key, previous_key, elapsed = self._keys(key, now)
+        values = self.cache.get_many([current_key, previous_key])
+        return values.get(current_key, 0), values.get(previous_key, 0), elapsed
+
+    def count(self, key, now=None):
+        current, previous, elapsed = self._counts(key, time.time() if now is None else now)
+        return previous * (1 - elapsed) + current
+
+    def hit(self, key, now=None):
+        current_key, _, _ = self._keys(key, time.time() if now is None else now)
+        # ключ нужен ещё одно окно после своего — как "предыдущий"
+        self.cache.add(current_key, 0, timeout=self.window * 2)
+        try:
+            self.cache.incr(current_key)
+        except ValueError:
+            # ключ успел истечь между add и incr
+            self.cache.set(current_key, 1, timeout=self.window * 2)
+
+    def wait(self, key, limit, now=None):
+        """Через сколько секунд оценка опустится ниже limit"""
+        now = time.time() if now is None else now
+        current, previous, elapsed = self._counts(key, now)
+        if current >= limit:
+            # в следующем окне текущие попытки станут "предыдущими"
+            return self.window * (1 - elapsed) + self.window * (1 - limit / current)
+        if previous:
+            return max(self.window * (1 - (limit - current) / previous) - self.window * elapsed, 0)
+        return 0
+
+
+def normalize_email(email):
+    return (email or "").strip().lower()
+
+
+def client_ip(request):
+    """
+    Адрес клиента. X-Forwarded-For присылает сам клиент, поэтому ему верим, только
+    если задан REST_FRAMEWORK["NUM_PROXIES"]: берём адрес, который дописал самый
+    дальний из наших прокси. Без настройки (у DRF тогда ключом становится вся
+    строка XFF, и каждая выдуманная строка — новый счётчик) — только REMOTE_ADDR.
+    """
+    remote_addr = request.META.get("REMOTE_ADDR") or ""
+    num_proxies = api_settings.NUM_PROXIES
+    xff = request.META.get("HTTP_X_FORWARDED_FOR")
+    if not num_proxies or not xff:
+        return remote_addr
+    addrs = [addr.strip() for addr in xff.split(",")]
+    return addrs[-min(num_proxies, len(addrs))] or remote_addr
+
+
+class LoginThrottle:
+    def __init__(self, cache, window=300, ip_limit=50, email_limit=10):
+        self.window = window
+        self.limits = {"ip": ip_limit, "email": email_limit}
+        self.counters = {
+            scope: SlidingWindowCounter(cache, f"login_throttle:{scope}", window)
+            for scope in self.limits
+        }
+        self._lock = threading.Lock()
+        self._allowed = 0
+        self._rejected = {scope: 0 for scope in self.limits}
+
+    def attempt(self, ip, email):
+        """Учесть попытку входа. None — можно проверять пароль, иначе — сколько секунд ждать"""
+        keys = {"ip": ip, "email": normalize_email(email)}
+        for scope, key in keys.items():
+            if key and self.counters[scope].count(key) >= self.limits[scope]:
+                with self._lock:
+                    self._rejected[scope] += 1
+                return max(math.ceil(self.counters[scope].wait(key, self.limits[scope])), 1)
+        for scope, key in keys.items():
+            if key:
+                self.counters[scope].hit(key)
+        with self._lock:
+            self._allowed += 1
+        return None
+
+    def current(self, ip=None, email=None):
+        result = {}
+        if ip:
+            result["ip"] = {"key": ip, "count": self.counters["ip"].count(ip), "limit": self.limits["ip"]}
+        if email:
+            email = normalize_email(email)
+            result["email"] = {
+                "key": email, "count": self.counters["email"].count(email), "limit": self.limits["email"],
+            }
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "window": self.window,
+                "limits": dict(self.limits),
+                "allowed": self._allowed,
+                "rejected": dict(self._rejected),
+            }
+
+
+_throttle = None
+_throttle_lock = threading.Lock()
+
+
+def get_login_throttle():
+    global _throttle
+    if _throttle is None:
+        with _throttle_lock:
+            if _throttle is None:
+                conf = {**DEFAULTS, **getattr(settings, "LOGIN_THROTTLE", {})}
+                _throttle = LoginThrottle(
+                    caches[conf["CACHE"]],
+                    window=conf["WINDOW"],
+                    ip_limit=conf["IP_LIMIT"],
+                    email_limit=conf["EMAIL_LIMIT"],
+                )
+    return _throttle
+
+
+@receiver(setting_changed)
+def reset_login_throttle(*, setting, **kwargs):
+    global _throttle
+    if setting in ("LOGIN_THROTTLE", "CACHES"):
+        with _throttle_lock:
+            _throttle = None
+
+
+def check_login_attempt(request, email):
+    """Вызывать до authenticate(). При превышении лимита — Throttled (429 + Retry-After)"""
+    wait = get_login_throttle().attempt(client_ip(request), email)
+    if wait is not None:
+        raise Throttled(wait=wait)
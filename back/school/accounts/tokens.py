@@ -0,0 +1,81 @@
+# accounts/tokens.py
+"""
+Версия токенов пользователя.
+
+В access-токен кладутся поля MeSerializer и номер версии (claim "ver").
+При смене роли/пароля/прав User.save() (или массовая смена в accounts/bulk.py)
+увеличивает token_version — все выданные ранее токены перестают приниматься.
+Текущая версия читается из кеша, так что проверка токена обходится без запроса к БД.
+
+Та же версия служит ETag для MeAPI: все поля профиля лежат в claims, и при
+смене любого из них версия растёт, так что "304 Not Modified" не бывает устаревшим.
+
+TOKEN_VERSION_CACHE_TIMEOUT — сколько секунд версия живёт в кеше. С локальным
+кешем (по умолчанию) смена версии в другом воркере будет замечена не позже
+этого срока; с общим кешем (redis/memcached) — сразу.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from . import routing
+
+VERSION_CLAIM = "ver"
+# поля пользователя, которые кладём в access-токен (как в MeSerializer)
+CLAIM_FIELDS = (
+    "email", "phone", "student_full_name", "parent_full_name",
+    "role", "is_staff", "is_superuser",
+)
+
+
+def _cache_key(user_id):
+    return f"accounts:token_version:{user_id}"
+
+
+def _timeout():
+    return getattr(settings, "TOKEN_VERSION_CACHE_TIMEOUT", 30)
+
+
+def remember_token_version(user_id, version):
+    cache.set(_cache_key(user_id), version, _timeout())
+
+
+def remember_token_versions(versions):
+    """versions — {id пользователя: версия}"""
+    cache.set_many({_cache_key(user_id): version for user_id, version in versions.items()}, _timeout())
+
+
+def forget_token_versions(user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def get_token_version(user_id):
+    """Текущая версия токенов; None — пользователь удалён или отключён"""
+    version = cache.get(_cache_key(user_id))
+    if version is None:
+        User = get_user_model()
+        # с основной БД: реплика может отдать версию до отзыва, и она снова попала бы в кеш.
+        # Не через db_for_write — тот привязал бы к основной БД весь запрос
+        version = (
+            User.objects.using(routing.get_config()["PRIMARY"]).filter(pk=user_id, is_active=True)
+            .values_list("token_version", flat=True)
+            .first()
+        )
+        if version is not None:
+            remember_token_version(user_id, version)
+    return version
+
+
+def add_user_claims(token, user):
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    token[VERSION_CLAIM] = user.token_version
+    return token
+
+
+def version_of(user):
+    """Версия, с которой собраны поля user: claim токена (TokenUser) или строка БД (User)"""
+    token = getattr(user, "token", None)
+    if token is not None:
+        return token[VERSION_CLAIM]
+    return user.token_version
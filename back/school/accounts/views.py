@@ -1,13 +1,15 @@
 # accounts/views.py
-from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth import login, logout, authenticate
+from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.hashers import check_password
+from django.http import Http404, HttpResponse, HttpResponseForbidden
 from django.shortcuts import render, redirect
 from django.db.models import Q
+from django.utils.crypto import constant_time_compare
 from django.contrib.auth import get_user_model
 
+from . import admin_slots, audit, instrumentation
 from .forms import RegistrationForm, LoginForm, AdminLoginForm
 
 User = get_user_model()
@@ -18,8 +20,9 @@ def register_view(request):
 
     if request.method == 'POST':
         form = RegistrationForm(request.POST)
-        if form.is_valid():
-            user = form.save()
+        # form.save() вернёт None, если email оказался занят (ошибка уже в форме)
+        if form.is_valid() and form.save() is not None:
+            audit.record(request, audit.Kinds.REGISTER, user=form.instance)
             messages.success(request, 'Регистрация успешна. Теперь войдите в систему.')
             return redirect('accounts:login')
     else:
@@ -33,12 +36,14 @@ def login_view(request):
         return redirect('accounts:login')  # можно перекинуть на дашборд
 
     if request.method == 'POST':
-        form = LoginForm(request.POST)
+        form = LoginForm(request.POST, request=request)
         if form.is_valid():
             user = form.get_user()
             login(request, user)
+            audit.record(request, audit.Kinds.LOGIN, user=user)
             messages.success(request, 'Вы успешно вошли.')
             return redirect('accounts:login')  # смените на нужную страницу после входа
+        audit.record(request, audit.Kinds.LOGIN, email=request.POST.get('email', ''), success=False)
     else:
         form = LoginForm()
 
@@ -53,53 +58,25 @@ def admin_login_view(request):
     Допускаем только первых ДВОИХ (суперпользователей) из белого списка.
     """
     if request.method == 'POST':
-        form = AdminLoginForm(request.POST)
+        form = AdminLoginForm(request.POST, request=request)
         if form.is_valid():
             email, password = form.get_credentials()
 
-            # Пытаемся найти пользователя
-            user = User.objects.filter(email=email).first()
-
-            # Подсчёт уже существующих суперпользователей из белого списка
-            whitelist = getattr(settings, 'ADMIN_SEED_EMAILS', [])
-            current_whitelist_superusers = User.objects.filter(
-                email__in=whitelist, is_superuser=True
-            ).count()
-
-            # Если пользователя ещё нет — создаём и назначаем ADMIN (но только если ещё есть "слоты")
+            # создание/повышение и захват места — одной транзакцией
+            try:
+                user = admin_slots.admin_login(email, password)
+            except admin_slots.AdminSlotsExhausted:
+                audit.record(request, audit.Kinds.ADMIN_LOGIN, email=email, success=False)
+                form.add_error(None, 'Лимит админов из белого списка исчерпан.')
+                return render(request, 'accounts/admin_login.html', {'form': form})
             if user is None:
-                if current_whitelist_superusers >= 2:
-                    form.add_error(None, 'Лимит админов из белого списка исчерпан.')
-                    return render(request, 'accounts/admin_login.html', {'form': form})
-
-                # Создаём заготовку (требуется валидный пароль для входа)
-                user = User.objects.create_user(
-                    email=email,
-                    username=email,
-                    password=password,
-                    role=User.Roles.ADMIN,
-                    is_staff=True,
-                    is_superuser=True,
-                )
-            else:
-                # Если пользователь есть — проверяем пароль
-                user_auth = authenticate(username=email, password=password)
-                if not user_auth:
-                    form.add_error(None, 'Неверный пароль.')
-                    return render(request, 'accounts/admin_login.html', {'form': form})
-
-                # Если он из белого списка и ещё есть лимит — повышаем при необходимости
-                if user.email in whitelist and not user.is_superuser:
-                    if current_whitelist_superusers >= 2:
-                        form.add_error(None, 'Лимит админов из белого списка исчерпан.')
-                        return render(request, 'accounts/admin_login.html', {'form': form})
-                    user.is_superuser = True
-                    user.is_staff = True
-                    user.role = User.Roles.ADMIN
-                    user.save()
+                audit.record(request, audit.Kinds.ADMIN_LOGIN, email=email, success=False)
+                form.add_error(None, 'Неверный пароль.')
+                return render(request, 'accounts/admin_login.html', {'form': form})
 
             # Авторизуем
             login(request, user)
+            audit.record(request, audit.Kinds.ADMIN_LOGIN, user=user)
             messages.success(request, 'Админ-вход выполнен.')
             return redirect('accounts:login')  # направьте на админ-панель/дашборд
     else:
@@ -109,6 +86,28 @@ def admin_login_view(request):
 
 
 def logout_view(request):
+    if request.user.is_authenticated:
+        audit.record(request, audit.Kinds.LOGOUT, user=request.user)
     logout(request)
     messages.info(request, 'Вы вышли из системы.')
     return redirect('accounts:login')
+
+
+def metrics_view(request):
+    """
+    Метрики в текстовом формате Prometheus (включаются settings.METRICS).
+    Если задан TOKEN — нужен заголовок Authorization: Bearer <TOKEN>.
+    """
+    config = instrumentation.get_config()
+    if not config['ENABLED']:
+        raise Http404
+    allowed = config['ALLOWED_IPS']
+    if allowed and request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    token = config['TOKEN']
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        instrumentation.render_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
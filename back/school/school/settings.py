@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 import os
 
@@ -45,17 +46,23 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'accounts.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',  
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    # Page*: только для страниц, запросы к API_PATH_PREFIXES идут мимо (accounts/middleware.py)
+    'accounts.middleware.PageSessionMiddleware',
+    'accounts.middleware.ReplicaRoutingMiddleware',
+    'accounts.middleware.PageCsrfViewMiddleware',
+    'accounts.middleware.PageAuthenticationMiddleware',
+    'accounts.middleware.PageMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'accounts.middleware.HashingBackpressureMiddleware',
 ]
 
+# JWT API: без сессий, CSRF и flash-сообщений
+API_PATH_PREFIXES = ('/api/',)
+
 ROOT_URLCONF = 'school.urls'
 
 CORS_ALLOWED_ORIGINS = [
@@ -69,11 +76,15 @@ CORS_ALLOW_CREDENTIALS = True
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    # Сколько своих прокси (nginx и т.п.) стоит перед приложением. Только тогда
+    # X-Forwarded-For используется как адрес клиента (лимиты входа, журнал);
+    # по умолчанию — REMOTE_ADDR, заголовку клиента не верим.
+    "NUM_PROXIES": int(os.environ['NUM_PROXIES']) if os.environ.get('NUM_PROXIES') else None,
 }
 
 TEMPLATES = [
@@ -98,37 +109,178 @@ WSGI_APPLICATION = 'school.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Параметры БД — из окружения (значения по умолчанию — для локального MySQL).
+# DB_CONN_MAX_AGE — сколько секунд держать соединение между запросами (0 — новое
+# на каждый запрос, как раньше); DB_CONN_HEALTH_CHECKS=1 — перед повторным
+# использованием проверить, что соединение живо (MySQL мог закрыть его по wait_timeout).
+# Держите DB_CONN_MAX_AGE меньше wait_timeout сервера. Статистика — /api/db-stats/.
+_CONN_REUSE = {
+    'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+    'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'shkila',
-        'USER': 'school_user',
-        'PASSWORD': '052308911a_Z',
-        'HOST': '127.0.0.1',
-        'PORT': '3306',
-        
+        'NAME': os.environ.get('MYSQL_DATABASE', 'shkila'),
+        'USER': os.environ.get('MYSQL_USER', 'school_user'),
+        'PASSWORD': os.environ.get('MYSQL_PASSWORD', '052308911a_Z'),
+        'HOST': os.environ.get('MYSQL_HOST', '127.0.0.1'),
+        'PORT': os.environ.get('MYSQL_PORT', '3306'),
+        **_CONN_REUSE,
     }
 }
 
+# без MySQL (тесты, бенчмарки на ноутбуке): SCHOOL_DB=sqlite
+if os.environ.get('SCHOOL_DB') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / os.environ.get('SQLITE_NAME', 'db.sqlite3'),
+            **_CONN_REUSE,
+        }
+    }
+
+# Реплики для чтения (accounts/routing.py): MYSQL_REPLICA_HOSTS=10.0.0.2,10.0.0.3
+# или для проверки на ноутбуке — вторая SQLite-база: SCHOOL_DB_REPLICA=replica.sqlite3
+# (копия основной, например cp db.sqlite3 replica.sqlite3). В тестах реплика —
+# зеркало основной БД.
+_replicas = {}
+if os.environ.get('SCHOOL_DB') == 'sqlite':
+    if os.environ.get('SCHOOL_DB_REPLICA'):
+        _replicas['replica'] = {**DATABASES['default'], 'NAME': BASE_DIR / os.environ['SCHOOL_DB_REPLICA']}
+else:
+    for _i, _host in enumerate(filter(None, os.environ.get('MYSQL_REPLICA_HOSTS', '').split(',')), 1):
+        _replicas[f'replica{_i}'] = {**DATABASES['default'], 'HOST': _host.strip()}
+for _alias, _conf in _replicas.items():
+    DATABASES[_alias] = {**_conf, 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['accounts.routing.PrimaryReplicaRouter']
+DATABASE_ROUTING = {
+    'PRIMARY': 'default',
+    'REPLICAS': list(_replicas),
+    # с запасом на отставание репликации
+    'STICKY_SECONDS': int(os.environ.get('DB_STICKY_SECONDS', 10)),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
+# похожесть на email/ФИО и частые пароли — версии с кешем и отсевом (accounts/password_validation.py)
 AUTH_PASSWORD_VALIDATORS = [
     {
-        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+        'NAME': 'accounts.password_validation.UserAttributeSimilarityValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+        'NAME': 'accounts.password_validation.CommonPasswordValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
 
+# Кеш. По умолчанию — память процесса; с REDIS_URL — общий для всех воркеров
+# (нужен пакет redis). Общий кеш нужен для SESSION_MODE=cached_db и чтобы
+# версии токенов/счётчики попыток входа были едины для всех воркеров.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+
+# Хранение сессий (SESSION_MODE):
+#   db             — таблица django_session (по умолчанию)
+#   cached_db      — чтение из кеша, запись в кеш и БД; только с общим кешем,
+#                    иначе другие воркеры увидят разлогиненную сессию живой
+#   signed_cookies — сессия целиком в подписанной cookie, без БД
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('SESSION_MODE', 'db')]
+
+# Флеш-сообщения только в cookie — показ "Вы успешно вошли" не трогает сессию
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Хешеры паролей с параметрами под наше железо (подбираются manage.py calibrate_hashers).
+# PASSWORD_HASHER — основной алгоритм: pbkdf2 или scrypt. Хеши со старыми
+# параметрами/алгоритмом обновляются при следующем успешном входе.
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 600_000))
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14))
+_CALIBRATED_HASHERS = {
+    'pbkdf2': 'accounts.hashers.CalibratedPBKDF2PasswordHasher',
+    'scrypt': 'accounts.hashers.CalibratedScryptPasswordHasher',
+}
+_PREFERRED_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHERS = [
+    _CALIBRATED_HASHERS[_PREFERRED_HASHER],
+    *[path for name, path in _CALIBRATED_HASHERS.items() if name != _PREFERRED_HASHER],
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+# Хеширование паролей идёт через ограниченный пул (accounts/hashing.py)
+PASSWORD_HASHING = {
+    'BACKEND': os.environ.get('PASSWORD_HASHING_BACKEND', 'thread'),  # thread | process | inline
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', 2)),
+    'QUEUE_SIZE': int(os.environ.get('PASSWORD_HASHING_QUEUE_SIZE', 16)),
+    'RETRY_AFTER': 2,
+    # общий пул импорта абитуриентов через API (один на процесс, один импорт за раз)
+    'BULK_WORKERS': int(os.environ.get('PASSWORD_HASHING_BULK_WORKERS', 2)),
+}
+
+# Сколько ошибок по строкам отдаёт импорт через API (счётчик failed — по всем)
+IMPORT_MAX_ERRORS = 1000
+
+# Отзыв refresh-токенов: фильтр Блума + LRU в каждом процессе (accounts/revocation.py)
+TOKEN_REVOCATION = {
+    'REFRESH_INTERVAL': 5,
+    'RESCAN_SECONDS': 60,
+    'BLOOM_CAPACITY': 100_000,
+    'BLOOM_ERROR_RATE': 0.001,
+    'LRU_SIZE': 10_000,
+}
+
+# access живёт недолго; клиент продлевает его через /api/auth/refresh/ без пароля.
+# REFRESH_TOKEN_LIFETIME — срок простоя: каждое обновление выдаёт новый refresh на этот
+# срок, но не дольше TOKEN_SESSION_MAX_LIFETIME от входа по паролю (accounts/refresh.py)
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.environ.get('JWT_ACCESS_MINUTES', 5))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.environ.get('JWT_REFRESH_DAYS', 1))),
+}
+TOKEN_SESSION_MAX_LIFETIME = timedelta(days=int(os.environ.get('JWT_SESSION_MAX_DAYS', 30)))
+
+# Кеш проверенных access-токенов в каждом процессе (accounts/jwt_cache.py)
+JWT_AUTH_CACHE = {
+    'ENABLED': os.environ.get('JWT_AUTH_CACHE', '1') == '1',
+    'SIZE': 10_000,
+}
+
+# Ограничение попыток входа до проверки пароля (accounts/throttling.py)
+LOGIN_THROTTLE = {
+    'CACHE': 'default',
+    'WINDOW': 300,
+    'IP_LIMIT': 50,
+    'EMAIL_LIMIT': 10,
+}
+
+# Метрики запросов для Prometheus на /metrics (accounts/instrumentation.py).
+# Выключены — middleware не подключается и ничего не стоит.
+# За локальным nginx все запросы приходят с 127.0.0.1, и ALLOWED_IPS пропустит
+# кого угодно: задайте TOKEN (Prometheus: authorization/credentials в scrape_config)
+# или закройте /metrics на прокси.
+METRICS = {
+    'ENABLED': os.environ.get('SCHOOL_METRICS') == '1',
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],  # пусто — без ограничения
+    'TOKEN': os.environ.get('SCHOOL_METRICS_TOKEN', ''),  # Authorization: Bearer <TOKEN>
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -153,6 +305,14 @@ LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'accounts:login'   
 LOGOUT_REDIRECT_URL = 'accounts:login'
 
+# Журнал входов (accounts/audit.py): пишется пачками из фонового потока
+AUDIT_LOG = {
+    'ENABLED': os.environ.get('AUDIT_LOG', '1') == '1',
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 1.0,
+    'MAX_QUEUE': 10000,
+}
+
 ADMIN_SEED_EMAILS = [
     'kazak_jenya@mail.ru',
     'admin2@example.com',
@@ -2,8 +2,12 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from accounts.views import metrics_view
+
 urlpatterns = [
     path('django-admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
+    path('api/async/', include('accounts.async_api_urls', namespace='accounts_async_api')),
     path('api/', include('accounts.api_urls', namespace='accounts_api')),
     path('', include('accounts.urls', namespace='accounts')),
 ]